@@ -0,0 +1,179 @@
+"""
+Ordered batches of cart operations (POST /api/cart/batch/).
+
+A batch is validated as a whole before anything is written: one query
+loads every juice it adds, one loads the cart's current lines, and the
+operations are folded over that in memory. The result is then written
+inside one transaction with at most one DELETE, one bulk INSERT and one
+bulk UPDATE, so a rejected batch leaves the cart exactly as it was.
+"""
+from django.db import transaction
+
+from coupons.models import Coupon
+from products.availability import is_available
+from products.models import Juice
+
+from .models import Cart, CartItem
+
+MAX_OPERATIONS = 50
+
+JUICE_OPERATIONS = ('add', 'increment', 'decrement', 'remove', 'set_quantity')
+OPERATIONS = JUICE_OPERATIONS + ('apply_coupon', 'remove_coupon')
+
+
+class BatchError(Exception):
+    """A batch that cannot be applied; ``index`` is the offending operation"""
+
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.message = message
+        self.index = index
+
+
+def _quantity(operation, index, default=1, minimum=1):
+    try:
+        quantity = int(operation.get('quantity', default))
+    except (TypeError, ValueError):
+        raise BatchError("Quantity must be a number", index)
+    if quantity < minimum:
+        raise BatchError(f"Quantity must be at least {minimum}", index)
+    return quantity
+
+
+def parse_operations(operations):
+    """Check the shape of every operation and normalise juice ids to int"""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("Provide a non-empty list of operations")
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"A batch can hold at most {MAX_OPERATIONS} operations")
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise BatchError(f"Unknown operation, expected one of: {', '.join(OPERATIONS)}", index)
+        operation = dict(operation)
+        if operation['op'] in JUICE_OPERATIONS:
+            try:
+                operation['juice_id'] = int(operation.get('juice_id'))
+            except (TypeError, ValueError):
+                raise BatchError("juice_id is required", index)
+        if operation['op'] == 'apply_coupon':
+            operation['code'] = str(operation.get('code') or '').upper()
+            if not operation['code']:
+                raise BatchError("Coupon code is required", index)
+        parsed.append(operation)
+    return parsed
+
+
+def _apply_coupon(code, subtotal, index):
+    try:
+        coupon = Coupon.objects.get(code=code)
+    except Coupon.DoesNotExist:
+        raise BatchError("Invalid coupon code", index)
+    is_valid, message = coupon.is_valid()
+    if not is_valid:
+        raise BatchError(message, index)
+    if subtotal < coupon.min_order_value:
+        raise BatchError(f"Minimum order value of ₹{coupon.min_order_value} required", index)
+    return coupon
+
+
+def apply_operations(cart, operations, branch_id=None):
+    """
+    Apply parsed ``operations`` to ``cart`` in order, all or nothing.
+
+    Raises BatchError without writing anything if any operation is invalid.
+    """
+    if branch_id:
+        try:
+            branch_id = int(branch_id)
+        except (TypeError, ValueError):
+            raise BatchError("Invalid branch_id")
+
+    adds = {op['juice_id'] for op in operations if op['op'] == 'add'}
+    juices = {
+        juice_id: (name, price)
+        for juice_id, name, price in Juice.objects.filter(
+            id__in=adds, is_active=True
+        ).values_list('id', 'name', 'price')
+    } if adds else {}
+
+    with transaction.atomic():
+        # Serialise concurrent batches for the same cart (a no-op on SQLite)
+        Cart.objects.select_for_update().filter(pk=cart.pk).exists()
+
+        existing = {
+            juice_id: (pk, quantity, price)
+            for pk, juice_id, quantity, price in CartItem.objects.filter(
+                cart=cart
+            ).values_list('id', 'juice_id', 'quantity', 'price_at_added')
+        }
+        lines = {juice_id: [quantity, price] for juice_id, (_, quantity, price) in existing.items()}
+        coupon_id = cart.applied_coupon_id
+
+        for index, op in enumerate(operations):
+            name = op['op']
+            juice_id = op.get('juice_id')
+
+            if name == 'add':
+                if juice_id not in juices:
+                    raise BatchError("Juice not found", index)
+                juice_name, price = juices[juice_id]
+                if branch_id and not is_available(branch_id, juice_id):
+                    raise BatchError(f"{juice_name} is not available at this branch", index)
+                quantity = _quantity(op, index)
+                if juice_id in lines:
+                    lines[juice_id][0] += quantity
+                else:
+                    lines[juice_id] = [quantity, price]
+            elif name in ('increment', 'decrement'):
+                if juice_id not in lines:
+                    raise BatchError("Item not in cart", index)
+                step = _quantity(op, index)
+                lines[juice_id][0] += step if name == 'increment' else -step
+                if lines[juice_id][0] <= 0:
+                    del lines[juice_id]
+            elif name == 'remove':
+                if lines.pop(juice_id, None) is None:
+                    raise BatchError("Item not found in cart", index)
+            elif name == 'set_quantity':
+                if juice_id not in lines:
+                    raise BatchError("Item not in cart", index)
+                quantity = _quantity(op, index, default=None, minimum=0)
+                if quantity:
+                    lines[juice_id][0] = quantity
+                else:
+                    del lines[juice_id]
+            elif name == 'apply_coupon':
+                subtotal = sum(price * quantity for quantity, price in lines.values())
+                coupon_id = _apply_coupon(op['code'], subtotal, index).pk
+            else:
+                coupon_id = None
+
+        _write_lines(cart, existing, lines)
+        if coupon_id != cart.applied_coupon_id:
+            cart.applied_coupon_id = coupon_id
+            cart.save(update_fields=['applied_coupon', 'updated_at'])
+
+
+def _write_lines(cart, existing, lines):
+    """Turn the difference between ``existing`` and ``lines`` into bulk statements"""
+    removed = [juice_id for juice_id in existing if juice_id not in lines]
+    created = [
+        CartItem(cart=cart, juice_id=juice_id, quantity=quantity, price_at_added=price)
+        for juice_id, (quantity, price) in lines.items()
+        if juice_id not in existing
+    ]
+    # A line removed and re-added in the same batch keeps its row but takes the new price
+    changed = [
+        CartItem(id=existing[juice_id][0], quantity=quantity, price_at_added=price)
+        for juice_id, (quantity, price) in lines.items()
+        if juice_id in existing and existing[juice_id][1:] != (quantity, price)
+    ]
+
+    if removed:
+        CartItem.objects.filter(cart=cart, juice_id__in=removed).delete()
+    if created:
+        CartItem.objects.bulk_create(created)
+    if changed:
+        CartItem.objects.bulk_update(changed, ['quantity', 'price_at_added'])
@@ -0,0 +1,114 @@
+"""
+Write-through cache of each user's serialized cart.
+
+GET /api/cart/ is answered from here without touching the database. The
+entry is the full CartSerializer output, pricing breakdown included.
+
+Two requests on the same cart (a double tap) can finish in either order,
+so an entry is only trusted while the cart's version is the one it was
+built under:
+
+- every committed write sets a new random version first;
+- a body is stored under the version read *before* the database was read,
+  so a write that commits after that read has bumped the version by the
+  time anyone looks, and the entry is ignored instead of served.
+
+Writes that answer with the whole cart re-read it after bumping and store
+it (write-through). Single-line delta writes only bump the version; the
+next read rebuilds the entry.
+
+Entries also carry the catalog revision they were built from, so renaming
+a juice or changing its image rebuilds them on the next read; editing a
+coupon bumps the carts it is applied to (see cart/signals.py).
+
+Entries are only read and stored when CART_CACHE_ENABLED is set, which it
+is by default only with a shared cache (REDIS_URL): a per-process cache
+would never see writes made by the worker processes.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from products.cache import CATALOG_REVISION_KEY, get_catalog_revision
+
+from .models import Cart
+from .serializers import CartSerializer
+from .utils import get_or_create_cart, prefetch_cart
+
+
+def _key(user_id):
+    return f'cart:{user_id}'
+
+
+def _version_key(user_id):
+    return f'cart:{user_id}:version'
+
+
+def _current_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, settings.CART_CACHE_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def _bump(user_ids):
+    versions = {user_id: uuid.uuid4().hex for user_id in user_ids}
+    cache.set_many(
+        {_version_key(user_id): version for user_id, version in versions.items()},
+        settings.CART_CACHE_TIMEOUT
+    )
+    return versions
+
+
+def _store(user_id, version, data):
+    if not settings.CART_CACHE_ENABLED:
+        return
+    cache.set(_key(user_id), (get_catalog_revision(), version, data), settings.CART_CACHE_TIMEOUT)
+
+
+def get_cached_cart(user_id):
+    """The cached cart body for ``user_id``, or None on a miss"""
+    if not settings.CART_CACHE_ENABLED:
+        return None
+    key = _key(user_id)
+    version_key = _version_key(user_id)
+    found = cache.get_many([CATALOG_REVISION_KEY, key, version_key])
+    entry = found.get(key)
+    if entry is None or entry[:2] != (found.get(CATALOG_REVISION_KEY), found.get(version_key)):
+        return None
+    return entry[2]
+
+
+def rebuild_cart(user):
+    """Serialize the user's cart from the database on a cache miss and store it; returns the body"""
+    version = _current_version(user.id)
+    data = CartSerializer(prefetch_cart(get_or_create_cart(user))).data
+    _store(user.id, version, data)
+    return data
+
+
+def refresh_cart(cart):
+    """
+    Re-read ``cart`` after a committed write, store it and return the body.
+
+    The instance passed in is only used for its ids: it may predate a
+    concurrent write or hold stale prefetched items.
+    """
+    version = _bump([cart.user_id])[cart.user_id]
+    fresh = Cart.objects.select_related('applied_coupon').prefetch_related('items__juice').get(pk=cart.pk)
+    data = CartSerializer(fresh).data
+    _store(cart.user_id, version, data)
+    return data
+
+
+def for_request(data, request):
+    """Trim a cached cart body to the request's ?fields= / ?expand= selection"""
+    return {name: data[name] for name in CartSerializer.requested_field_names(request)}
+
+
+def invalidate_carts(user_ids):
+    """Mark the cached carts of ``user_ids`` stale; the next read rebuilds them"""
+    _bump(user_ids)
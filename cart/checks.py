@@ -0,0 +1,26 @@
+"""
+System checks for the cart read model.
+
+Run with ``manage.py check --deploy``.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from products.checks import PER_PROCESS_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def check_cart_cache(app_configs, **kwargs):
+    """Cached carts must live where every process that writes a cart can reach them"""
+    if not settings.CART_CACHE_ENABLED or settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS:
+        return []
+    return [
+        Error(
+            "CART_CACHE_ENABLED is set but the default cache is per-process.",
+            hint=(
+                "Set REDIS_URL, or unset CART_CACHE_ENABLED. The worker and webhooks processes "
+                "write carts too, and a per-process cache would keep serving the web process's copy."
+            ),
+            id='cart.E001',
+        )
+    ]
@@ -0,0 +1,117 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+from django.test.utils import CaptureQueriesContext
+
+from cart.models import Cart, CartItem
+from cart.pricing import price_cart
+from cart.serializers import CartSerializer
+from coupons.models import Coupon
+from products.models import Category, Juice
+
+
+def _legacy_totals(cart):
+    # What CartSerializer used to do: one items walk and Decimal(str()) round trip per field
+    total = lambda: Decimal(str(cart.total_amount))
+    delivery = lambda: Decimal('0.00') if total() >= Decimal('99.00') else Decimal('20.00')
+    values = [
+        float(cart.applied_coupon.calculate_discount(cart.total_amount)) if cart.applied_coupon else 0.0,
+        float((total() * Decimal('0.05')).quantize(Decimal('0.01'))),
+        float(delivery()),
+        float((delivery() * Decimal('0.18')).quantize(Decimal('0.01'))),
+        float((total() * Decimal('0.05')).quantize(Decimal('0.01')) + (delivery() * Decimal('0.18')).quantize(Decimal('0.01'))),
+        total() >= Decimal('99.00'),
+    ]
+    discount = cart.applied_coupon.calculate_discount(total()) if cart.applied_coupon else Decimal('0.00')
+    discounted = total() - discount
+    values.append(float(
+        discounted + (discounted * Decimal('0.05')).quantize(Decimal('0.01')) +
+        delivery() + (delivery() * Decimal('0.18')).quantize(Decimal('0.01')) + Decimal('10.00')
+    ))
+    return values
+
+
+class Command(BaseCommand):
+    help = (
+        'Microbenchmark cart pricing and cart serialization over large carts. '
+        'Fixtures are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _time(self, repeat, func):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        largest = max(options['sizes'])
+
+        self.stdout.write(f'Database: {connection.vendor}')
+        self.stdout.write(
+            f'{"items":>6}{"legacy ms":>11}{"legacy queries":>16}{"engine ms":>11}'
+            f'{"serialize ms":>14}{"queries":>9}'
+        )
+
+        with transaction.atomic():
+            category = Category.objects.create(name=f'Benchmark {time.time()}')
+            Juice.objects.bulk_create([
+                Juice(
+                    category=category, name=f'Benchmark Juice {i}', description='-',
+                    price=rng.randint(40, 250), image='juices/benchmark.png',
+                )
+                for i in range(largest)
+            ])
+            juices = list(Juice.objects.filter(category=category).order_by('id'))
+            coupon = Coupon.objects.create(
+                code=f'BENCH{int(time.time())}', discount_type='percentage',
+                discount_value=10, max_discount=500,
+            )
+            user_model = get_user_model()
+
+            for size in options['sizes']:
+                user = user_model.objects.create_user(
+                    email=f'benchmark-{size}-{time.time()}@example.com',
+                    phone_number=str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+                    password=None,
+                )
+                cart = Cart.objects.create(user=user, applied_coupon=coupon)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, juice=juice, quantity=rng.randint(1, 3), price_at_added=juice.price)
+                    for juice in juices[:size]
+                ])
+
+                # The old serializer ran on a cart without prefetched items
+                with CaptureQueriesContext(connection) as legacy_queries:
+                    _legacy_totals(Cart.objects.get(pk=cart.pk))
+
+                cart = Cart.objects.select_related('applied_coupon').get(pk=cart.pk)
+                prefetch_related_objects([cart], 'items__juice')
+
+                legacy_ms = self._time(repeat, lambda: _legacy_totals(cart))
+                engine_ms = self._time(repeat, lambda: price_cart(cart))
+                serialize_ms = self._time(repeat, lambda: CartSerializer(cart).data)
+                with CaptureQueriesContext(connection) as queries:
+                    CartSerializer(cart).data
+
+                self.stdout.write(
+                    f'{size:>6}{legacy_ms:11.3f}{len(legacy_queries.captured_queries):16d}'
+                    f'{engine_ms:11.3f}{serialize_ms:14.3f}'
+                    f'{len(queries.captured_queries):9d}'
+                )
+
+            transaction.set_rollback(True)
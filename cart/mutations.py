@@ -0,0 +1,108 @@
+"""
+Single-statement cart line writes.
+
+Each helper changes one CartItem with one atomic statement, so concurrent
+taps on the same line add up instead of overwriting each other. With
+PostgreSQL and SQLite (3.35+) the statement also returns the new line via
+RETURNING; other backends fall back to F() updates plus a read.
+
+Helpers return ``(quantity, price_at_added)`` for the line after the
+write, ``(0, None)`` when the write removed it, or None when there was
+no such line.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from .cache import refresh_cart
+from .models import CartItem
+from .pricing import PAISE
+
+TABLE = CartItem._meta.db_table
+
+
+def _returning_supported():
+    return (
+        connection.vendor in ('postgresql', 'sqlite') and
+        connection.features.can_return_columns_from_insert
+    )
+
+
+def _line(row):
+    # Raw rows skip the field converters (SQLite hands back a float)
+    quantity, price = row
+    return quantity, Decimal(str(price)).quantize(PAISE)
+
+
+def _read_line(cart_id, juice_id):
+    return CartItem.objects.filter(cart_id=cart_id, juice_id=juice_id).values_list(
+        'quantity', 'price_at_added'
+    ).first()
+
+
+def add_to_line(cart_id, juice_id, quantity, price):
+    """Insert the line at ``price``, or add ``quantity`` to the existing line"""
+    if _returning_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {TABLE} (cart_id, juice_id, quantity, price_at_added) "
+                f"VALUES (%s, %s, %s, %s) "
+                f"ON CONFLICT (cart_id, juice_id) "
+                f"DO UPDATE SET quantity = {TABLE}.quantity + excluded.quantity "
+                f"RETURNING quantity, price_at_added",
+                [cart_id, juice_id, quantity, price]
+            )
+            return _line(cursor.fetchone())
+
+    lines = CartItem.objects.filter(cart_id=cart_id, juice_id=juice_id)
+    if not lines.update(quantity=F('quantity') + quantity):
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(
+                    cart_id=cart_id, juice_id=juice_id, quantity=quantity, price_at_added=price
+                )
+        except IntegrityError:
+            # Lost the race to insert: the other request's row is there now
+            lines.update(quantity=F('quantity') + quantity)
+    return _read_line(cart_id, juice_id)
+
+
+def change_line(cart_id, juice_id, delta):
+    """Add ``delta`` (may be negative) to a line; a line that would reach zero is deleted"""
+    if _returning_supported():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {TABLE} SET quantity = quantity + %s "
+                f"WHERE cart_id = %s AND juice_id = %s AND quantity + %s > 0 "
+                f"RETURNING quantity, price_at_added",
+                [delta, cart_id, juice_id, delta]
+            )
+            row = cursor.fetchone()
+        if row:
+            return _line(row)
+    else:
+        lines = CartItem.objects.filter(cart_id=cart_id, juice_id=juice_id, quantity__gt=-delta)
+        if lines.update(quantity=F('quantity') + delta):
+            return _read_line(cart_id, juice_id)
+
+    if delta < 0:
+        lines = CartItem.objects.filter(cart_id=cart_id, juice_id=juice_id, quantity__lte=-delta)
+        if lines.delete()[0]:
+            return 0, None
+    return None
+
+
+def remove_line(cart_id, juice_id):
+    """Delete a line"""
+    deleted, _ = CartItem.objects.filter(cart_id=cart_id, juice_id=juice_id).delete()
+    return (0, None) if deleted else None
+
+
+def clear_cart(cart):
+    """Empty the cart and drop its coupon, e.g. once an order has been placed"""
+    CartItem.objects.filter(cart=cart).delete()
+    cart.applied_coupon = None
+    cart.save()
+    # Write the empty cart through only once the order itself is committed
+    transaction.on_commit(lambda: refresh_cart(cart))
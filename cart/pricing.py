@@ -0,0 +1,137 @@
+"""
+Pricing engine shared by the cart, checkout, orders and emails.
+
+Everything the customer pays is computed in one pass into an immutable
+PricingBreakdown, so the cart page, the order row and the confirmation
+email can never disagree.
+
+Rules:
+- Coupon discount is taken off the food subtotal (rounded to paise).
+- Food GST is 5% of the discounted subtotal.
+- Delivery is free from a food subtotal of 99, else 20 + 18% GST.
+- Platform fee is a flat 10 (GST inclusive).
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+PAISE = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+FOOD_GST_RATE = Decimal('0.05')
+DELIVERY_GST_RATE = Decimal('0.18')
+DELIVERY_FEE = Decimal('20.00')
+FREE_DELIVERY_THRESHOLD = Decimal('99.00')
+PLATFORM_FEE = Decimal('10.00')
+
+
+@dataclass(frozen=True, slots=True)
+class PricingBreakdown:
+    food_subtotal: Decimal
+    discount: Decimal
+    food_gst: Decimal
+    delivery_fee_base: Decimal
+    delivery_gst: Decimal
+    platform_fee: Decimal
+    grand_total: Decimal
+
+    @property
+    def discounted_subtotal(self):
+        return self.food_subtotal - self.discount
+
+    @property
+    def total_gst(self):
+        return self.food_gst + self.delivery_gst
+
+    @property
+    def free_delivery(self):
+        return self.food_subtotal >= FREE_DELIVERY_THRESHOLD
+
+    @property
+    def original_delivery_fee(self):
+        """The fee that was waived, shown struck through when delivery is free"""
+        return DELIVERY_FEE if self.free_delivery else None
+
+    def as_order_fields(self):
+        """Keyword arguments for the money columns of an Order"""
+        return {
+            'food_subtotal': self.food_subtotal,
+            'discount': self.discount,
+            'food_gst': self.food_gst,
+            'delivery_fee_base': self.delivery_fee_base,
+            'delivery_gst': self.delivery_gst,
+            'platform_fee': self.platform_fee,
+            'total_amount': self.grand_total,
+        }
+
+
+def compute_pricing(food_subtotal, discount=ZERO, delivery_fee_base=None, platform_fee=PLATFORM_FEE):
+    """Price a food subtotal; the delivery fee follows the free-delivery rule unless given"""
+    food_subtotal = Decimal(food_subtotal)
+    discount = Decimal(discount).quantize(PAISE)
+    if delivery_fee_base is None:
+        delivery_fee_base = ZERO if food_subtotal >= FREE_DELIVERY_THRESHOLD else DELIVERY_FEE
+    delivery_fee_base = Decimal(delivery_fee_base)
+    platform_fee = Decimal(platform_fee)
+
+    discounted_subtotal = food_subtotal - discount
+    food_gst = (discounted_subtotal * FOOD_GST_RATE).quantize(PAISE)
+    delivery_gst = (delivery_fee_base * DELIVERY_GST_RATE).quantize(PAISE)
+
+    return PricingBreakdown(
+        food_subtotal=food_subtotal,
+        discount=discount,
+        food_gst=food_gst,
+        delivery_fee_base=delivery_fee_base,
+        delivery_gst=delivery_gst,
+        platform_fee=platform_fee,
+        grand_total=(
+            discounted_subtotal + food_gst + delivery_fee_base + delivery_gst + platform_fee
+        ).quantize(PAISE),
+    )
+
+
+def price_subtotal(food_subtotal, coupon=None):
+    """Price a food subtotal with the cart's coupon, if any"""
+    discount = coupon.calculate_discount(food_subtotal) if coupon is not None else ZERO
+    return compute_pricing(food_subtotal, discount=discount)
+
+
+def price_items(items, coupon=None):
+    """Price cart items (anything with price_at_added and quantity) in a single pass"""
+    food_subtotal = sum((item.price_at_added * item.quantity for item in items), ZERO)
+    return price_subtotal(food_subtotal, coupon=coupon)
+
+
+def price_cart(cart):
+    """Price a cart; uses prefetched items when available"""
+    return price_items(cart.items.all(), coupon=cart.applied_coupon)
+
+
+def price_cart_in_db(cart):
+    """
+    Price a cart with one aggregate query instead of loading its items.
+
+    Returns ``(pricing, line_count)``.
+    """
+    line_total = ExpressionWrapper(
+        F('price_at_added') * F('quantity'),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+    totals = cart.items.aggregate(food_subtotal=Sum(line_total), lines=Count('id'))
+    food_subtotal = (totals['food_subtotal'] or ZERO).quantize(PAISE)
+    return price_subtotal(food_subtotal, coupon=cart.applied_coupon), totals['lines']
+
+
+def order_pricing(order):
+    """The breakdown stored on an order, without recomputing it"""
+    return PricingBreakdown(
+        food_subtotal=order.food_subtotal,
+        discount=order.discount,
+        food_gst=order.food_gst,
+        delivery_fee_base=order.delivery_fee_base,
+        delivery_gst=order.delivery_gst,
+        platform_fee=order.platform_fee,
+        grand_total=order.total_amount,
+    )
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
 from coupons.serializers import CouponSerializer
-from decimal import Decimal
+from config.serializers import SparseFieldsetMixin
+from products.images import THUMBNAIL_WIDTH, image_url
+from .pricing import price_cart, price_cart_in_db
 
 class CartItemSerializer(serializers.ModelSerializer):
     juice_name = serializers.CharField(source='juice.name', read_only=True)
@@ -21,26 +23,16 @@ class CartItemSerializer(serializers.ModelSerializer):
         ]
     
     def get_juice_image(self, obj):
-        if obj.juice and obj.juice.image:
-            # Get the image name/path
-            image_path = str(obj.juice.image)
-            # Remove 'media/' prefix if present
-            if image_path.startswith('media/'):
-                image_path = image_path.replace('media/', '', 1)
-            # Return proper Cloudinary URL
-            return f"https://res.cloudinary.com/dxizjczfh/image/upload/{image_path}"
+        if obj.juice:
+            return image_url(obj.juice.image, THUMBNAIL_WIDTH)
         return None
 
     def get_subtotal(self, obj):
         return obj.price_at_added * obj.quantity
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total_amount = serializers.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        read_only=True
-    )
+    total_amount = serializers.SerializerMethodField()
     applied_coupon = CouponSerializer(read_only=True)
     coupon_discount = serializers.SerializerMethodField()
     food_gst = serializers.SerializerMethodField()
@@ -69,57 +61,75 @@ class CartSerializer(serializers.ModelSerializer):
             'free_delivery',
             'original_delivery_fee'
         ]
-    
+
+    def to_representation(self, instance):
+        # Price the cart once; every money field below reads this breakdown
+        self.pricing = price_cart(instance)
+        return super().to_representation(instance)
+
+    def get_total_amount(self, obj):
+        return f"{self.pricing.food_subtotal:.2f}"
+
     def get_coupon_discount(self, obj):
-        if obj.applied_coupon:
-            return float(obj.applied_coupon.calculate_discount(obj.total_amount))
-        return 0.00
-    
+        return self.pricing.discount
+
     def get_food_gst(self, obj):
-        return float((Decimal(str(obj.total_amount)) * Decimal('0.05')).quantize(Decimal('0.01')))
-    
+        return self.pricing.food_gst
+
     def get_delivery_fee_base(self, obj):
-        if Decimal(str(obj.total_amount)) >= Decimal('99.00'):
-            return 0.00
-        return 20.00
-    
+        return self.pricing.delivery_fee_base
+
     def get_delivery_gst(self, obj):
-        delivery_base = self.get_delivery_fee_base(obj)
-        return float((Decimal(str(delivery_base)) * Decimal('0.18')).quantize(Decimal('0.01')))
-    
+        return self.pricing.delivery_gst
+
     def get_total_gst(self, obj):
-        food_gst = (Decimal(str(obj.total_amount)) * Decimal('0.05')).quantize(Decimal('0.01'))
-        delivery_base = Decimal(str(self.get_delivery_fee_base(obj)))
-        delivery_gst = (delivery_base * Decimal('0.18')).quantize(Decimal('0.01'))
-        return float(food_gst + delivery_gst)
-    
+        return self.pricing.total_gst
+
     def get_platform_fee(self, obj):
-        return 10.00
-    
+        return self.pricing.platform_fee
+
     def get_free_delivery(self, obj):
-        # Return True if subtotal >= ₹99
-        return Decimal(str(obj.total_amount)) >= Decimal('99.00')
-    
+        return self.pricing.free_delivery
+
     def get_original_delivery_fee(self, obj):
         # Show original price only when free delivery is active
-        if self.get_free_delivery(obj):
-            return 20.00
-        return None
-    
+        return self.pricing.original_delivery_fee
+
     def get_grand_total(self, obj):
-        food_subtotal = Decimal(str(obj.total_amount))
-        
-        # Apply coupon discount to subtotal
-        coupon_discount = Decimal('0.00')
-        if obj.applied_coupon:
-            coupon_discount = obj.applied_coupon.calculate_discount(food_subtotal)
-        
-        discounted_subtotal = food_subtotal - coupon_discount
-        
-        food_gst = (discounted_subtotal * Decimal('0.05')).quantize(Decimal('0.01'))
-        delivery_base = Decimal(str(self.get_delivery_fee_base(obj)))
-        delivery_gst = (delivery_base * Decimal('0.18')).quantize(Decimal('0.01'))
-        platform_fee = Decimal('10.00')
-        
-        total = discounted_subtotal + food_gst + delivery_base + delivery_gst + platform_fee
-        return float(total)
+        return self.pricing.grand_total
+
+
+def pricing_data(pricing):
+    """CartSerializer's money fields for a PricingBreakdown"""
+    return {
+        'total_amount': f"{pricing.food_subtotal:.2f}",
+        'coupon_discount': pricing.discount,
+        'food_gst': pricing.food_gst,
+        'delivery_fee_base': pricing.delivery_fee_base,
+        'delivery_gst': pricing.delivery_gst,
+        'total_gst': pricing.total_gst,
+        'platform_fee': pricing.platform_fee,
+        'grand_total': pricing.grand_total,
+        'free_delivery': pricing.free_delivery,
+        'original_delivery_fee': pricing.original_delivery_fee,
+    }
+
+
+def cart_delta(cart, juice_id, line):
+    """Body for ?response=delta: the changed line and the new cart totals, nothing else"""
+    pricing, item_count = price_cart_in_db(cart)
+    quantity, price = line
+    item = None
+    if quantity:
+        item = {
+            'juice': int(juice_id),
+            'quantity': quantity,
+            'price_at_added': f"{price:.2f}",
+            'subtotal': price * quantity,
+        }
+    return {
+        'item': item,
+        'removed': item is None,
+        'item_count': item_count,
+        **pricing_data(pricing),
+    }
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete
+
+from coupons.models import Coupon
+
+from .cache import invalidate_carts
+from .models import Cart
+
+
+def coupon_changed(sender, instance, **kwargs):
+    """Carts holding an edited or deleted coupon are re-priced on their next read"""
+    user_ids = list(Cart.objects.filter(applied_coupon=instance).values_list('user_id', flat=True))
+    if user_ids:
+        transaction.on_commit(lambda: invalidate_carts(user_ids))
+
+
+post_save.connect(coupon_changed, sender=Coupon, dispatch_uid='cart_cache_coupon_save')
+pre_delete.connect(coupon_changed, sender=Coupon, dispatch_uid='cart_cache_coupon_delete')
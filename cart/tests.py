@@ -1,3 +1,465 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from coupons.models import Coupon
+from orders.models import Order
+from products.models import Branch, Category, Juice
+from users.models import User
+
+from . import cache as cart_cache
+from .checks import check_cart_cache
+from .models import Cart, CartItem
+from .pricing import compute_pricing, price_items
+
+
+class ComputePricingGoldenTests(SimpleTestCase):
+    """Pinned outputs of the pricing rules, including rounding"""
+
+    # (food_subtotal, discount) -> (discount, food_gst, delivery_fee_base, delivery_gst, grand_total)
+    GOLDEN = [
+        (('50.00', '0'), ('0.00', '2.50', '20.00', '3.60', '86.10')),
+        (('98.99', '0'), ('0.00', '4.95', '20.00', '3.60', '137.54')),
+        (('99.00', '0'), ('0.00', '4.95', '0.00', '0.00', '113.95')),
+        (('200.00', '20'), ('20.00', '9.00', '0.00', '0.00', '199.00')),
+        # 10% of 123.45 is rounded to paise before GST is applied
+        (('123.45', '12.345'), ('12.34', '5.56', '0.00', '0.00', '126.67')),
+        # GST rounds half to even, as Decimal.quantize always has here
+        (('50.50', '0'), ('0.00', '2.52', '20.00', '3.60', '86.62')),
+        # Delivery is decided on the subtotal before the discount
+        (('100.00', '50'), ('50.00', '2.50', '0.00', '0.00', '62.50')),
+    ]
+
+    def test_golden_values(self):
+        for (subtotal, discount), expected in self.GOLDEN:
+            with self.subTest(subtotal=subtotal, discount=discount):
+                pricing = compute_pricing(Decimal(subtotal), discount=Decimal(discount))
+                self.assertEqual(
+                    (
+                        pricing.discount,
+                        pricing.food_gst,
+                        pricing.delivery_fee_base,
+                        pricing.delivery_gst,
+                        pricing.grand_total,
+                    ),
+                    tuple(Decimal(value) for value in expected)
+                )
+                self.assertEqual(pricing.platform_fee, Decimal('10.00'))
+
+    def test_derived_values(self):
+        pricing = compute_pricing(Decimal('120.00'), discount=Decimal('20.00'))
+        self.assertEqual(pricing.discounted_subtotal, Decimal('100.00'))
+        self.assertEqual(pricing.total_gst, Decimal('5.00'))
+        self.assertTrue(pricing.free_delivery)
+        self.assertEqual(pricing.original_delivery_fee, Decimal('20.00'))
+        self.assertIsNone(compute_pricing(Decimal('10.00')).original_delivery_fee)
+
+    def test_breakdown_is_immutable(self):
+        pricing = compute_pricing(Decimal('10.00'))
+        with self.assertRaises(AttributeError):
+            pricing.grand_total = Decimal('0')
+
+    def test_price_items_is_single_pass(self):
+        items = iter([
+            mock.Mock(price_at_added=Decimal('45.00'), quantity=2),
+            mock.Mock(price_at_added=Decimal('30.50'), quantity=1),
+        ])
+        self.assertEqual(price_items(items).food_subtotal, Decimal('120.50'))
+
+
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class PricingParityTests(TestCase):
+    """The cart page, the order row and Order.calculate_totals agree"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='parity@example.com', phone_number='9000000001', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        Branch.objects.create(
+            name='Main', address='a', city='c', state='s', pincode='500001',
+            phone='1', email='main@example.com', opening_time='08:00', closing_time='22:00'
+        )
+        category = Category.objects.create(name='Fresh')
+        cart = Cart.objects.create(user=self.user)
+        for price, quantity in [('45.50', 2), ('60.00', 1), ('33.33', 3)]:
+            juice = Juice.objects.create(
+                category=category, name=f'Juice {price}', description='d',
+                price=price, image='juices/a.png'
+            )
+            CartItem.objects.create(cart=cart, juice=juice, quantity=quantity, price_at_added=price)
+
+        self.coupon = Coupon.objects.create(
+            code='SAVE15', discount_type='percentage', discount_value='15', max_discount='40'
+        )
+        cart.applied_coupon = self.coupon
+        cart.save()
+
+    def test_cart_matches_checkout(self, send_email):
+        cart = self.client.get('/api/cart/').data
+
+        response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['order']['id'])
+
+        self.assertEqual(order.food_subtotal, Decimal(cart['total_amount']))
+        self.assertEqual(order.discount, cart['coupon_discount'])
+        self.assertEqual(order.food_gst, cart['food_gst'])
+        self.assertEqual(order.delivery_fee_base, cart['delivery_fee_base'])
+        self.assertEqual(order.delivery_gst, cart['delivery_gst'])
+        self.assertEqual(order.total_amount, cart['grand_total'])
+
+    def test_calculate_totals_reproduces_stored_order(self, send_email):
+        response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        order = Order.objects.get(pk=response.data['order']['id'])
+        stored = order.pricing
+
+        order.calculate_totals()
+        self.assertEqual(order.pricing, stored)
+
+
+class CartMutationTests(TestCase):
+    """Single-statement cart writes and ?response=delta bodies"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='mutations@example.com', phone_number='9000000002', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Fresh')
+        self.juice = Juice.objects.create(
+            category=category, name='Orange', description='d', price='45.50', image='juices/a.png'
+        )
+
+    def add(self, quantity=1, query=''):
+        return self.client.post(
+            f'/api/cart/add/{query}', {'juice_id': self.juice.id, 'quantity': quantity}, format='json'
+        )
+
+    def test_repeated_adds_accumulate(self):
+        self.add(2)
+        self.add(3)
+        line = CartItem.objects.get(cart__user=self.user, juice=self.juice)
+        self.assertEqual(line.quantity, 5)
+        self.assertEqual(line.price_at_added, Decimal('45.50'))
+
+    def test_add_delta_body(self):
+        self.add(1)
+        response = self.add(1, '?response=delta')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['item'], {
+            'juice': self.juice.id,
+            'quantity': 2,
+            'price_at_added': '45.50',
+            'subtotal': Decimal('91.00'),
+        })
+        self.assertFalse(response.data['removed'])
+        self.assertEqual(response.data['item_count'], 1)
+        self.assertEqual(response.data['total_amount'], '91.00')
+        self.assertNotIn('items', response.data)
+
+    def test_delta_totals_match_full_cart(self):
+        self.add(3)
+        delta = self.client.post(
+            '/api/cart/update/?response=delta',
+            {'juice_id': self.juice.id, 'action': 'decrement'}, format='json'
+        ).data
+        cart = self.client.get('/api/cart/').data
+        for field in ('total_amount', 'coupon_discount', 'food_gst', 'delivery_gst', 'grand_total'):
+            self.assertEqual(delta[field], cart[field])
+
+    def test_decrement_to_zero_removes_line(self):
+        self.add(1)
+        response = self.client.post(
+            '/api/cart/update/?response=delta',
+            {'juice_id': self.juice.id, 'action': 'decrement'}, format='json'
+        )
+        self.assertIsNone(response.data['item'])
+        self.assertTrue(response.data['removed'])
+        self.assertEqual(response.data['item_count'], 0)
+        self.assertFalse(CartItem.objects.filter(juice=self.juice).exists())
+
+        response = self.client.post(
+            '/api/cart/update/', {'juice_id': self.juice.id, 'action': 'increment'}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_branch_id_is_rejected(self):
+        response = self.client.post(
+            '/api/cart/add/', {'juice_id': self.juice.id, 'branch_id': 'main'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_malformed_juice_id_is_rejected(self):
+        self.add(2)
+        requests = [
+            ('post', '/api/cart/add/', {'juice_id': 'abc'}),
+            ('post', '/api/cart/update/', {'juice_id': 'abc', 'action': 'increment'}),
+            ('post', '/api/cart/update/', {'juice_id': [self.juice.id], 'action': 'decrement'}),
+            ('delete', '/api/cart/remove/', {'juice_id': 'abc'}),
+        ]
+        for method, url, data in requests:
+            with self.subTest(url=url, data=data):
+                response = getattr(self.client, method)(url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['message'], 'Invalid juice_id')
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_remove(self):
+        self.add(2)
+        response = self.client.delete('/api/cart/remove/', {'juice_id': self.juice.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete('/api/cart/remove/', {'juice_id': self.juice.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class CartBatchTests(TestCase):
+    """POST /api/cart/batch/ applies every operation or none"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='batch@example.com', phone_number='9000000003', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        category = Category.objects.create(name='Fresh')
+        self.orange, self.apple, self.mango = [
+            Juice.objects.create(
+                category=category, name=name, description='d', price=price, image='juices/a.png'
+            )
+            for name, price in [('Orange', '40.00'), ('Apple', '50.00'), ('Mango', '60.00')]
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, juice=self.orange, quantity=2, price_at_added='40.00')
+        CartItem.objects.create(cart=self.cart, juice=self.apple, quantity=1, price_at_added='50.00')
+        Coupon.objects.create(
+            code='BATCH10', discount_type='percentage', discount_value='10', min_order_value='200'
+        )
+
+    def batch(self, *operations):
+        return self.client.post('/api/cart/batch/', {'operations': list(operations)}, format='json')
+
+    def quantities(self):
+        return dict(self.cart.items.values_list('juice__name', 'quantity'))
+
+    def test_operations_apply_in_order(self):
+        response = self.batch(
+            {'op': 'increment', 'juice_id': self.orange.id, 'quantity': 3},
+            {'op': 'decrement', 'juice_id': self.orange.id},
+            {'op': 'remove', 'juice_id': self.apple.id},
+            {'op': 'add', 'juice_id': self.mango.id, 'quantity': 2},
+            {'op': 'set_quantity', 'juice_id': self.mango.id, 'quantity': 1},
+            {'op': 'apply_coupon', 'code': 'batch10'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {'Orange': 4, 'Mango': 1})
+        self.assertEqual(response.data['total_amount'], '220.00')
+        self.assertEqual(response.data['coupon_discount'], Decimal('22.00'))
+
+    def test_invalid_operation_rejects_whole_batch(self):
+        response = self.batch(
+            {'op': 'increment', 'juice_id': self.orange.id},
+            {'op': 'decrement', 'juice_id': self.mango.id},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['operation'], 1)
+        self.assertEqual(self.quantities(), {'Orange': 2, 'Apple': 1})
+
+    def test_coupon_minimum_checked_at_its_position(self):
+        response = self.batch({'op': 'apply_coupon', 'code': 'BATCH10'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Cart.objects.get(pk=self.cart.pk).applied_coupon_id)
+
+    def test_remove_and_readd_takes_current_price(self):
+        Juice.objects.filter(pk=self.orange.pk).update(price='45.00')
+        self.batch(
+            {'op': 'remove', 'juice_id': self.orange.id},
+            {'op': 'add', 'juice_id': self.orange.id},
+        )
+        line = CartItem.objects.get(cart=self.cart, juice=self.orange)
+        self.assertEqual((line.quantity, line.price_at_added), (1, Decimal('45.00')))
+
+    def test_query_count_does_not_grow_with_operations(self):
+        operations = [{'op': 'increment', 'juice_id': self.orange.id}] * 20
+        operations += [{'op': 'add', 'juice_id': self.mango.id}] * 20
+        with CaptureQueriesContext(connection) as few:
+            self.batch(operations[0], operations[-1])
+        CartItem.objects.filter(juice=self.mango).delete()
+        with CaptureQueriesContext(connection) as many:
+            self.batch(*operations)
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(self.quantities(), {'Orange': 23, 'Apple': 1, 'Mango': 20})
+
+    def test_malformed_batches(self):
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch({'op': 'explode'}).status_code, 400)
+        self.assertEqual(self.batch({'op': 'add'}).status_code, 400)
+        response = self.client.post(
+            '/api/cart/batch/',
+            {'operations': [{'op': 'add', 'juice_id': self.mango.id}], 'branch_id': 'main'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Invalid branch_id')
+
+
+@override_settings(CART_CACHE_ENABLED=True)
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class CartCacheTests(TestCase):
+    """GET /api/cart/ is served from the cache and never goes stale"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cached@example.com', phone_number='9000000004', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Branch.objects.create(
+            name='Main', address='a', city='c', state='s', pincode='500001',
+            phone='1', email='main@example.com', opening_time='08:00', closing_time='22:00'
+        )
+        category = Category.objects.create(name='Fresh')
+        self.orange, self.apple = [
+            Juice.objects.create(
+                category=category, name=name, description='d', price=price, image='juices/a.png'
+            )
+            for name, price in [('Orange', '40.00'), ('Apple', '75.00')]
+        ]
+        self.coupon = Coupon.objects.create(
+            code='CACHE10', discount_type='percentage', discount_value='10'
+        )
+
+    def assertCacheMatchesDatabase(self):
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/cart/').data
+        cache.clear()
+        self.assertEqual(cached, self.client.get('/api/cart/').data)
+        return cached
+
+    def test_cached_read_costs_no_queries(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        cart = self.assertCacheMatchesDatabase()
+        self.assertEqual(cart['items'][0]['quantity'], 1)
+
+    def test_every_mutation_keeps_cache_fresh(self, send_email):
+        # Whole-cart writes store the new body; line deltas mark it stale for the next read
+        steps = [
+            ('post', '/api/cart/add/', {'juice_id': self.orange.id, 'quantity': 2}, True),
+            ('post', '/api/cart/add/?response=delta', {'juice_id': self.orange.id}, False),
+            ('post', '/api/cart/add/?response=delta', {'juice_id': self.apple.id}, False),
+            ('post', '/api/cart/update/', {'juice_id': self.orange.id, 'action': 'decrement'}, False),
+            ('post', '/api/cart/update/?response=delta', {'juice_id': self.apple.id, 'action': 'increment'}, False),
+            ('post', '/api/cart/apply-coupon/', {'code': 'CACHE10'}, True),
+            ('post', '/api/cart/batch/', {'operations': [{'op': 'increment', 'juice_id': self.orange.id}]}, True),
+            ('delete', '/api/cart/remove/?response=delta', {'juice_id': self.apple.id}, False),
+            ('post', '/api/cart/remove-coupon/', {}, True),
+        ]
+        self.client.get('/api/cart/')
+        for method, path, body, writes_through in steps:
+            with self.subTest(path=path, body=body):
+                response = getattr(self.client, method)(path, body, format='json')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(cart_cache.get_cached_cart(self.user.id) is not None, writes_through)
+                self.client.get('/api/cart/')
+                self.assertCacheMatchesDatabase()
+
+    def test_snapshot_read_before_a_write_is_not_served(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        cache.clear()
+        prefetch_cart = cart_cache.prefetch_cart
+
+        def write_after_read(cart):
+            loaded = prefetch_cart(cart)
+            self.client.post('/api/cart/add/?response=delta', {'juice_id': self.apple.id}, format='json')
+            return loaded
+
+        with mock.patch('cart.cache.prefetch_cart', side_effect=write_after_read):
+            stale = self.client.get('/api/cart/').data
+        self.assertEqual(len(stale['items']), 1)
+        self.assertEqual(len(self.client.get('/api/cart/').data['items']), 2)
+
+    def test_older_write_stored_last_is_not_served(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        store = cart_cache._store
+        overtaken = []
+
+        def store_late(user_id, version, data):
+            if not overtaken:
+                # A double tap finishes entirely before this write stores its body
+                overtaken.append(True)
+                self.client.post('/api/cart/add/', {'juice_id': self.apple.id}, format='json')
+            store(user_id, version, data)
+
+        with mock.patch('cart.cache._store', side_effect=store_late):
+            self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        self.assertIsNone(cart_cache.get_cached_cart(self.user.id))
+        self.client.get('/api/cart/')
+        cart = self.assertCacheMatchesDatabase()
+        self.assertEqual(sorted(item['quantity'] for item in cart['items']), [1, 2])
+
+    def test_sparse_fields_apply_to_cached_body(self, send_email):
+        self.client.get('/api/cart/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/cart/?fields=id,grand_total')
+        self.assertEqual(set(response.data), {'id', 'grand_total'})
+
+    def test_checkout_writes_empty_cart(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.assertCacheMatchesDatabase()['items'], [])
+
+    def test_coupon_and_catalog_edits_invalidate(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.apple.id, 'quantity': 2}, format='json')
+        self.client.post('/api/cart/apply-coupon/', {'code': 'CACHE10'}, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.discount_value = 20
+            self.coupon.save()
+        self.assertEqual(self.client.get('/api/cart/').data['coupon_discount'], Decimal('30.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apple.name = 'Green Apple'
+            self.apple.save()
+        self.assertEqual(self.client.get('/api/cart/').data['items'][0]['juice_name'], 'Green Apple')
+
+    @override_settings(CART_CACHE_ENABLED=False)
+    def test_disabled_cache_reads_the_database(self, send_email):
+        self.client.post('/api/cart/add/', {'juice_id': self.orange.id}, format='json')
+        self.assertIsNone(cart_cache.get_cached_cart(self.user.id))
+        # A write from another process that never reaches this process's cache
+        CartItem.objects.filter(cart__user=self.user).update(quantity=5)
+        self.assertEqual(self.client.get('/api/cart/').data['items'][0]['quantity'], 5)
+
+
+class CartCacheCheckTests(SimpleTestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    REDIS = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    }}
+
+    @override_settings(CART_CACHE_ENABLED=True, CACHES=LOCMEM)
+    def test_cart_cache_on_a_per_process_cache_is_an_error(self):
+        self.assertEqual([error.id for error in check_cart_cache(None)], ['cart.E001'])
+
+    @override_settings(CART_CACHE_ENABLED=False, CACHES=LOCMEM)
+    def test_disabled_cart_cache_passes(self):
+        self.assertEqual(check_cart_cache(None), [])
+
+    @override_settings(CART_CACHE_ENABLED=True, CACHES=REDIS)
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_cart_cache(None), [])
@@ -1,11 +1,12 @@
 from django.urls import path
-from .views import AddToCartAPIView, ViewCartAPIView, UpdateCartItemAPIView, RemoveCartItemAPIView, ApplyCouponAPIView, RemoveCouponAPIView
+from .views import AddToCartAPIView, ViewCartAPIView, UpdateCartItemAPIView, RemoveCartItemAPIView, ApplyCouponAPIView, RemoveCouponAPIView, CartBatchAPIView
 
 urlpatterns = [
     path('', ViewCartAPIView.as_view(), name='view-cart'),
     path('add/', AddToCartAPIView.as_view(), name='add-to-cart'),
     path('update/', UpdateCartItemAPIView.as_view(), name='update-cart-item'),
     path('remove/', RemoveCartItemAPIView.as_view(), name='remove-cart-item'),
+    path('batch/', CartBatchAPIView.as_view(), name='cart-batch'),
     path('apply-coupon/', ApplyCouponAPIView.as_view(), name='apply-coupon'),
     path('remove-coupon/', RemoveCouponAPIView.as_view(), name='remove-coupon'),
 ]
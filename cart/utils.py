@@ -1,3 +1,5 @@
+from django.db.models import prefetch_related_objects
+
 from .models import Cart
 
 def get_or_create_cart(user):
@@ -12,3 +14,12 @@ def get_cart_total(cart):
         item.price_at_added * item.quantity
         for item in cart.items.all()
     )
+
+def prefetch_cart(cart):
+    """Load items and their juices once, shared by pricing and serialization"""
+    prefetch_related_objects([cart], 'items__juice')
+    return cart
+
+def wants_delta(request):
+    """?response=delta: reply with the changed line and totals instead of the whole cart"""
+    return request.query_params.get('response') == 'delta'
@@ -3,10 +3,14 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 
-from .models import Cart, CartItem
-from .serializers import CartSerializer
-from .utils import get_or_create_cart
+from .batch import BatchError, apply_operations, parse_operations
+from .cache import for_request, get_cached_cart, invalidate_carts, rebuild_cart, refresh_cart
+from .models import Cart
+from .mutations import add_to_line, change_line, remove_line
+from .serializers import cart_delta
+from .utils import get_or_create_cart, prefetch_cart, wants_delta
 from products.models import Juice
+from products.availability import is_available
 from coupons.models import Coupon
 
 class AddToCartAPIView(APIView):
@@ -22,6 +26,14 @@ class AddToCartAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            juice_id = int(juice_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "Invalid juice_id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             juice = Juice.objects.get(id=juice_id, is_active=True)
         except Juice.DoesNotExist:
@@ -30,31 +42,44 @@ class AddToCartAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Optional: reject items the customer's branch can't make
+        branch_id = request.data.get('branch_id')
+        if branch_id:
+            try:
+                branch_id = int(branch_id)
+            except (TypeError, ValueError):
+                return Response(
+                    {"message": "Invalid branch_id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if branch_id and not is_available(branch_id, juice.id):
+            return Response(
+                {"message": f"{juice.name} is not available at this branch"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         cart = get_or_create_cart(request.user)
 
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            juice=juice,
-            defaults={
-                'quantity': quantity,
-                'price_at_added': juice.price
-            }
-        )
+        # One INSERT ... ON CONFLICT DO UPDATE, safe against double taps
+        line = add_to_line(cart.id, juice.id, quantity, juice.price)
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        if wants_delta(request):
+            delta = cart_delta(cart, juice.id, line)
+            invalidate_carts([cart.user_id])
+            return Response(delta, status=status.HTTP_200_OK)
 
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = refresh_cart(cart)
+        return Response(for_request(data, request), status=status.HTTP_200_OK)
 
 class ViewCartAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        cart = get_or_create_cart(request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        # Normally served from the write-through cache without a query
+        data = get_cached_cart(request.user.id)
+        if data is None:
+            data = rebuild_cart(request.user)
+        return Response(for_request(data, request))
 
 class UpdateCartItemAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -68,6 +93,13 @@ class UpdateCartItemAPIView(APIView):
                 {"message": "Invalid request. Provide juice_id and action (increment/decrement)"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            juice_id = int(juice_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "Invalid juice_id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         cart = Cart.objects.filter(user=request.user, is_active=True).first()
         if not cart:
@@ -76,33 +108,29 @@ class UpdateCartItemAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        try:
-            item = CartItem.objects.get(cart=cart, juice_id=juice_id)
-        except CartItem.DoesNotExist:
+        line = change_line(cart.id, juice_id, 1 if action == 'increment' else -1)
+        if line is None:
             return Response(
                 {"message": "Item not in cart"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if action == 'increment':
-            item.quantity += 1
-            item.save()
+        delta = cart_delta(cart, juice_id, line)
+        invalidate_carts([cart.user_id])
+        if wants_delta(request):
+            return Response(delta, status=status.HTTP_200_OK)
 
-        elif action == 'decrement':
-            if item.quantity > 1:
-                item.quantity -= 1
-                item.save()
-            else:
-                item.delete()
-                return Response(
-                    {"message": "Item removed from cart"},
-                    status=status.HTTP_200_OK
-                )
+        quantity, _ = line
+        if not quantity:
+            return Response(
+                {"message": "Item removed from cart"},
+                status=status.HTTP_200_OK
+            )
 
         return Response(
             {
                 "message": "Cart updated successfully",
-                "item_quantity": item.quantity
+                "item_quantity": quantity
             },
             status=status.HTTP_200_OK
         )
@@ -118,6 +146,13 @@ class RemoveCartItemAPIView(APIView):
                 {"message": "Juice ID is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            juice_id = int(juice_id)
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "Invalid juice_id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         cart = Cart.objects.filter(user=request.user, is_active=True).first()
         if not cart:
@@ -126,22 +161,40 @@ class RemoveCartItemAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        deleted, _ = CartItem.objects.filter(
-            cart=cart,
-            juice_id=juice_id
-        ).delete()
-
-        if not deleted:
+        line = remove_line(cart.id, juice_id)
+        if line is None:
             return Response(
                 {"message": "Item not found in cart"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        delta = cart_delta(cart, juice_id, line)
+        invalidate_carts([cart.user_id])
+        if wants_delta(request):
+            return Response(delta, status=status.HTTP_200_OK)
+
         return Response(
             {"message": "Item removed successfully"},
             status=status.HTTP_200_OK
         )
 
+class CartBatchAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            operations = parse_operations(request.data.get('operations'))
+            cart = get_or_create_cart(request.user)
+            apply_operations(cart, operations, branch_id=request.data.get('branch_id'))
+        except BatchError as error:
+            return Response(
+                {"message": error.message, "operation": error.index},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = refresh_cart(cart)
+        return Response(for_request(data, request), status=status.HTTP_200_OK)
+
 class ApplyCouponAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -154,7 +207,7 @@ class ApplyCouponAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        cart = get_or_create_cart(request.user)
+        cart = prefetch_cart(get_or_create_cart(request.user))
         
         # Check if coupon exists
         try:
@@ -184,13 +237,10 @@ class ApplyCouponAPIView(APIView):
         cart.applied_coupon = coupon
         cart.save()
         
-        # Calculate discount
-        discount = coupon.calculate_discount(cart.total_amount)
-        
-        serializer = CartSerializer(cart)
+        data = refresh_cart(cart)
         return Response({
-            "message": f"Coupon applied! You saved ₹{discount}",
-            "cart": serializer.data
+            "message": f"Coupon applied! You saved ₹{data['coupon_discount']}",
+            "cart": for_request(data, request)
         }, status=status.HTTP_200_OK)
 
 class RemoveCouponAPIView(APIView):
@@ -208,8 +258,8 @@ class RemoveCouponAPIView(APIView):
         cart.applied_coupon = None
         cart.save()
         
-        serializer = CartSerializer(cart)
+        data = refresh_cart(cart)
         return Response({
             "message": "Coupon removed successfully",
-            "cart": serializer.data
+            "cart": for_request(data, request)
         }, status=status.HTTP_200_OK)
@@ -0,0 +1,75 @@
+"""
+Response compression for the JSON API.
+
+Brotli is used when the client accepts it and the ``brotli`` package is
+installed, gzip otherwise. Only JSON bodies above
+``RESPONSE_COMPRESSION_MIN_LENGTH`` bytes are compressed; small bodies
+gain nothing and responses that are already encoded (e.g. the
+pre-compressed branch menu) are passed through untouched.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Dynamic responses are compressed per request: favour speed over ratio
+BROTLI_QUALITY = 5
+
+_accepts_br = re.compile(r'\bbr\b')
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def preferred_encoding(request):
+    """Best content coding the client accepts, or None"""
+    accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and _accepts_br.search(accept):
+        return 'br'
+    if _accepts_gzip.search(accept):
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return compress_string(content)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_LENGTH:
+            return response
+
+        # The body depends on Accept-Encoding from here on, compressed or not
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = preferred_encoding(request)
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # The bytes differ from the identity representation (RFC 9110 8.8.3)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
@@ -0,0 +1,53 @@
+"""
+orjson-backed renderer and parser for the DRF API.
+
+orjson serializes datetime, date, time, UUID and dict/list subclasses
+natively. Decimal is rendered as a JSON number and lazy translation strings
+as text, matching DRF's stock JSONEncoder; anything else falls back to
+that encoder so the output stays compatible.
+"""
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    return _fallback_encoder.default(obj)
+
+
+def dumps(data, indent=False):
+    """Encode ``data`` to UTF-8 JSON bytes the way the API renders it"""
+    option = (ORJSON_OPTIONS | orjson.OPT_INDENT_2) if indent else ORJSON_OPTIONS
+    return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return dumps(data, indent=bool(indent))
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
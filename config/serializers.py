@@ -0,0 +1,53 @@
+"""
+Serializer helpers shared by the products, cart and orders APIs.
+"""
+from rest_framework import serializers
+
+
+def _split_names(value):
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients trim a response with ``?fields=a,b`` and grow it with ``?expand=c``.
+
+    ``Meta.default_fields`` (optional) is what gets rendered when no ``fields``
+    parameter is sent; the rest of ``Meta.fields`` is only included when named
+    in ``expand``. Only the top-level serializer looks at the query string,
+    nested serializers always render in full.
+    """
+
+    @classmethod
+    def requested_field_names(cls, request=None):
+        """Field names this serializer will render for ``request``, in Meta order"""
+        all_fields = list(cls.Meta.fields)
+        default_fields = getattr(cls.Meta, 'default_fields', all_fields)
+
+        if request is None:
+            return list(default_fields)
+
+        fields = _split_names(request.query_params.get('fields'))
+        expand = _split_names(request.query_params.get('expand'))
+        wanted = (fields or set(default_fields)) | expand
+
+        return [name for name in all_fields if name in wanted]
+
+    def _is_top_level(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        if self._is_top_level():
+            keep = set(self.requested_field_names(self.context.get('request')))
+            for name in list(fields):
+                if name not in keep:
+                    fields.pop(name)
+
+        return fields
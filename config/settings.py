@@ -73,6 +73,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # MUST be before CommonMiddleware
@@ -119,6 +120,103 @@ DATABASES = {
         conn_health_checks=True,
     )
 }
+
+# SQLite: take the write lock when a transaction starts. With the default
+# deferred mode two concurrent requests that read then write deadlock and one
+# fails at once with "database is locked" instead of waiting its turn
+# (seen under `manage.py loadtest_checkout`).
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+# Cache
+# Per-process memory cache by default, which is only correct for a single
+# process (runserver, tests). REDIS_URL is required as soon as more than one
+# process serves requests: the catalog revision lives here, and it is what
+# tells every worker to drop its cached catalog pages, availability index
+# (products/availability.py) and routing table (orders/routing.py). Without
+# it a dashboard change only reaches the worker that made it. Cart entries,
+# branch queue counters and idempotency replays are kept here as well.
+# `manage.py check --deploy` warns when it is missing (products/checks.py).
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Catalog response cache (see products/cache.py)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=60 * 60, cast=int)
+CATALOG_CACHE_WARMUP = config('CATALOG_CACHE_WARMUP', default=False, cast=bool)
+CATALOG_CACHE_WARMUP_HOST = config('CATALOG_CACHE_WARMUP_HOST', default='')
+
+# Write-through cart cache (see cart/cache.py). Off without REDIS_URL: carts
+# are also written by the worker and webhooks processes, which cannot reach
+# the web process's memory cache
+CART_CACHE_ENABLED = config('CART_CACHE_ENABLED', default=bool(REDIS_URL), cast=bool)
+CART_CACHE_TIMEOUT = config('CART_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Order numbers each worker reserves at a time (see orders/numbering.py).
+# Above 1, numbers left in a worker's block when it exits are skipped.
+ORDER_NUMBER_BLOCK_SIZE = config('ORDER_NUMBER_BLOCK_SIZE', default=1, cast=int)
+
+# Razorpay API client (see payments/razorpay_utils.py); one pooled session per process
+RAZORPAY_API_URL = config('RAZORPAY_API_URL', default='https://api.razorpay.com')
+RAZORPAY_POOL_SIZE = config('RAZORPAY_POOL_SIZE', default=10, cast=int)
+RAZORPAY_CONNECT_TIMEOUT = config('RAZORPAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+RAZORPAY_READ_TIMEOUT = config('RAZORPAY_READ_TIMEOUT', default=8, cast=float)
+RAZORPAY_BREAKER_THRESHOLD = config('RAZORPAY_BREAKER_THRESHOLD', default=5, cast=int)
+RAZORPAY_BREAKER_RESET = config('RAZORPAY_BREAKER_RESET', default=30, cast=int)
+
+# Razorpay webhook inbox worker (see payments/webhooks.py)
+WEBHOOK_WORKER_BATCH_SIZE = config('WEBHOOK_WORKER_BATCH_SIZE', default=100, cast=int)
+WEBHOOK_WORKER_POLL_INTERVAL = config('WEBHOOK_WORKER_POLL_INTERVAL', default=2, cast=float)
+
+# Payment gateway used by background payment jobs (see payments/gateway.py)
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='payments.gateway.RazorpayGateway')
+
+# `manage.py reconcile_payments` (see payments/reconcile.py)
+RECONCILE_STALE_AFTER = config('RECONCILE_STALE_AFTER', default=15 * 60, cast=int)
+RECONCILE_BATCH_SIZE = config('RECONCILE_BATCH_SIZE', default=200, cast=int)
+RECONCILE_CONCURRENCY = config('RECONCILE_CONCURRENCY', default=8, cast=int)
+
+# Branch routing at checkout (see orders/routing.py). Branches with this many
+# active orders are passed over while a less busy one can take the order.
+ROUTING_MAX_QUEUE_DEPTH = config('ROUTING_MAX_QUEUE_DEPTH', default=20, cast=int)
+ROUTING_QUEUE_RESYNC = config('ROUTING_QUEUE_RESYNC', default=5 * 60, cast=int)
+
+# Idempotency-Key replays (see orders/idempotency.py). Expired keys are
+# deleted by `manage.py purge_idempotency_keys`.
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=60 * 60 * 24, cast=int)
+# An unfinished claim older than this belongs to a dead worker and is taken
+# over; keep it above the longest request (gunicorn's timeout is 30s)
+IDEMPOTENCY_LEASE = config('IDEMPOTENCY_LEASE', default=60, cast=int)
+
+# Brevo HTTP API (see users/email_api.py); one pooled client per process
+BREVO_API_KEY = config('BREVO_API_KEY', default='')
+BREVO_API_URL = config('BREVO_API_URL', default='https://api.sendinblue.com/v3')
+BREVO_POOL_SIZE = config('BREVO_POOL_SIZE', default=10, cast=int)
+BREVO_CONNECT_TIMEOUT = config('BREVO_CONNECT_TIMEOUT', default=3.05, cast=float)
+BREVO_READ_TIMEOUT = config('BREVO_READ_TIMEOUT', default=10, cast=float)
+
+# Email outbox worker (see users/outbox.py, `manage.py run_email_worker`)
+EMAIL_WORKER_BATCH_SIZE = config('EMAIL_WORKER_BATCH_SIZE', default=50, cast=int)
+EMAIL_WORKER_CONCURRENCY = config('EMAIL_WORKER_CONCURRENCY', default=4, cast=int)
+EMAIL_WORKER_POLL_INTERVAL = config('EMAIL_WORKER_POLL_INTERVAL', default=5, cast=float)
+EMAIL_WORKER_LEASE = config('EMAIL_WORKER_LEASE', default=5 * 60, cast=int)
+EMAIL_MAX_ATTEMPTS = config('EMAIL_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_RETRY_BASE_DELAY = config('EMAIL_RETRY_BASE_DELAY', default=30, cast=int)
+EMAIL_RETRY_MAX_DELAY = config('EMAIL_RETRY_MAX_DELAY', default=60 * 60, cast=int)
+
 AUTH_USER_MODEL = 'users.User'
 AUTHENTICATION_BACKENDS = [
     # 'users.auth_backend.EmailPhoneAuthBackend',
@@ -131,8 +229,20 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'config.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# JSON responses smaller than this are sent uncompressed (see config/middleware.py)
+RESPONSE_COMPRESSION_MIN_LENGTH = config('RESPONSE_COMPRESSION_MIN_LENGTH', default=1024, cast=int)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -186,6 +296,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -15,3 +15,15 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 
 application = get_wsgi_application()
+
+# Optionally pre-build the catalog cache when a worker boots
+from django.conf import settings
+
+if settings.CATALOG_CACHE_WARMUP:
+    import logging
+    from products.cache import warm_catalog_cache
+
+    try:
+        warm_catalog_cache()
+    except Exception:
+        logging.getLogger(__name__).exception("Catalog cache warm-up failed")
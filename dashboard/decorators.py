@@ -1,4 +1,5 @@
 from functools import wraps
+from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
@@ -26,3 +27,21 @@ def superuser_required(view_func):
         
         return view_func(request, *args, **kwargs)
     return wrapper
+
+
+def superuser_required_json(view_func):
+    """
+    Decorator that restricts a JSON endpoint to superusers only.
+    Answers 401 for unauthenticated users and 403 for non-superusers
+    instead of redirecting a script to an HTML page.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+
+        if not request.user.is_superuser:
+            return JsonResponse({'success': False, 'error': 'Superuser privileges required'}, status=403)
+
+        return view_func(request, *args, **kwargs)
+    return wrapper
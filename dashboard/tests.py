@@ -1,3 +1,158 @@
+import json
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from products import availability
+from products.cache import get_catalog_revision
+from products.models import Branch, BranchProduct, Category, Juice
+from users.models import User
+
+
+def _branch(name):
+    return Branch.objects.create(
+        name=name, address='a', city='c', state='s', pincode='500001',
+        phone='1', email=f'{name.lower()}@example.com', opening_time='08:00', closing_time='22:00'
+    )
+
+
+def _juice(category, name):
+    return Juice.objects.create(
+        category=category, name=name, description='d', price='40.00', image='juices/a.png'
+    )
+
+
+class BranchAvailabilityTests(TestCase):
+    """The availability matrix and bulk writes behind the dashboard grid"""
+
+    matrix_url = '/dashboard/products/availability/'
+    bulk_url = '/dashboard/products/availability/bulk/'
+
+    def setUp(self):
+        cache.clear()
+        availability.clear()
+        admin = User.objects.create_superuser(
+            email='admin@example.com', phone_number='9000000101', password='pass'
+        )
+        self.client.force_login(admin)
+        self.fresh = Category.objects.create(name='Fresh')
+        self.smoothies = Category.objects.create(name='Smoothies')
+        self.orange = _juice(self.fresh, 'Orange')
+        self.apple = _juice(self.fresh, 'Apple')
+        self.banana = _juice(self.smoothies, 'Banana')
+        self.main = _branch('Main')
+        self.north = _branch('North')
+        BranchProduct.objects.create(branch=self.main, product=self.orange, is_available=False)
+        BranchProduct.objects.create(branch=self.north, product=self.apple)
+
+    def post(self, payload):
+        return self.client.post(self.bulk_url, json.dumps(payload), content_type='application/json')
+
+    def cells(self):
+        return set(BranchProduct.objects.values_list('branch_id', 'product_id', 'is_available'))
+
+    def test_matrix_lists_available_products_per_branch(self):
+        with self.assertNumQueries(5):
+            matrix = self.client.get(self.matrix_url).json()
+        self.assertEqual([branch['id'] for branch in matrix['branches']], [self.main.id, self.north.id])
+        self.assertEqual(len(matrix['products']), 3)
+        self.assertEqual(matrix['available'], {str(self.main.id): [], str(self.north.id): [self.apple.id]})
+
+    def test_product_list_filters_on_branch_availability(self):
+        BranchProduct.objects.create(branch=self.main, product=self.apple)
+        for value, expected in (('available', ['Apple']), ('not_available', ['Orange', 'Banana'])):
+            with self.subTest(availability=value):
+                response = self.client.get(
+                    '/dashboard/products/', {'branch': self.main.id, 'availability': value}
+                )
+                page = response.context['page_obj']
+                self.assertEqual([product.name for product in page], expected)
+                self.assertEqual([product.branch_available for product in page], [value == 'available'] * len(expected))
+
+    def test_changes_are_upserted_and_bump_the_revision(self):
+        self.assertFalse(availability.is_available(self.main.id, self.orange.id))
+        revision = get_catalog_revision()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post({'changes': [
+                {'branch_id': self.main.id, 'product_id': self.orange.id, 'is_available': True},
+                {'branch_id': self.north.id, 'product_id': self.banana.id, 'is_available': True},
+            ]})
+
+        self.assertEqual(response.json(), {'success': True, 'updated': 2})
+        self.assertEqual(self.cells(), {
+            (self.main.id, self.orange.id, True),
+            (self.north.id, self.apple.id, True),
+            (self.north.id, self.banana.id, True),
+        })
+        self.assertGreater(get_catalog_revision(), revision)
+        self.assertTrue(availability.is_available(self.main.id, self.orange.id))
+
+    def test_bulk_write_bumps_the_revision_once(self):
+        revision = get_catalog_revision()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post({
+                'category_id': self.fresh.id,
+                'is_available': True,
+                'changes': [{'branch_id': self.north.id, 'product_id': self.banana.id, 'is_available': True}],
+            })
+        self.assertEqual(response.json()['updated'], 5)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(get_catalog_revision(), revision + 1)
+
+    def test_category_applies_to_every_branch_with_explicit_overrides(self):
+        self.post({
+            'category_id': self.fresh.id,
+            'is_available': True,
+            'changes': [{'branch_id': self.north.id, 'product_id': self.apple.id, 'is_available': False}],
+        })
+
+        self.assertEqual(self.cells(), {
+            (self.main.id, self.orange.id, True),
+            (self.main.id, self.apple.id, True),
+            (self.north.id, self.orange.id, True),
+            (self.north.id, self.apple.id, False),
+        })
+
+    def test_category_can_be_limited_to_one_branch(self):
+        self.post({'category_id': self.smoothies.id, 'branch_id': self.main.id, 'is_available': True})
+        self.assertIn((self.main.id, self.banana.id, True), self.cells())
+        self.assertFalse(BranchProduct.objects.filter(branch=self.north, product=self.banana).exists())
+
+    def test_bad_requests_write_nothing(self):
+        before = self.cells()
+        self.assertEqual(self.post({'changes': [{'branch_id': self.main.id}]}).status_code, 400)
+        self.assertEqual(self.post({'changes': [
+            {'branch_id': 999, 'product_id': self.orange.id, 'is_available': True}
+        ]}).status_code, 404)
+        self.assertEqual(self.client.get(self.bulk_url).status_code, 405)
+        self.assertEqual(self.cells(), before)
+
+    def test_validation_errors(self):
+        before = self.cells()
+        for body in (
+            'not json',
+            json.dumps({'category_id': self.fresh.id}),
+            json.dumps({'category_id': 'fresh', 'is_available': True}),
+            json.dumps({'changes': 'all'}),
+            json.dumps({'changes': [{'branch_id': 'main', 'product_id': self.orange.id, 'is_available': True}]}),
+            json.dumps(['changes']),
+        ):
+            with self.subTest(body=body):
+                response = self.client.post(self.bulk_url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        self.assertEqual(self.cells(), before)
+
+    def test_only_superusers_get_in(self):
+        staff = User.objects.create_user(
+            email='staff@example.com', phone_number='9000000102', password='pass', is_staff=True
+        )
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.matrix_url).status_code, 403)
+        self.assertEqual(self.post({'category_id': self.fresh.id, 'is_available': True}).status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(self.matrix_url).status_code, 401)
+        self.assertEqual(self.post({'category_id': self.fresh.id, 'is_available': True}).status_code, 401)
+        self.assertFalse(BranchProduct.objects.filter(branch=self.main, product=self.apple).exists())
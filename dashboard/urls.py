@@ -12,6 +12,8 @@ urlpatterns = [
     path('products/<int:pk>/toggle/', views.product_toggle_status, name='dashboard_product_toggle'),
     path('products/<int:pk>/delete/', views.product_delete, name='dashboard_product_delete'),
     path('products/<int:product_id>/branch/<int:branch_id>/toggle/', views.toggle_branch_availability, name='dashboard_toggle_branch_availability'),
+    path('products/availability/', views.branch_availability_matrix, name='dashboard_branch_availability_matrix'),
+    path('products/availability/bulk/', views.bulk_branch_availability, name='dashboard_bulk_branch_availability'),
     
     # Orders
     path('orders/', views.order_list, name='dashboard_orders'),
@@ -7,6 +7,8 @@ from .products import (
     product_toggle_status,
     product_delete,
     toggle_branch_availability,
+    branch_availability_matrix,
+    bulk_branch_availability,
 )
 from .orders import (
     order_list,
@@ -28,6 +30,8 @@ __all__ = [
     'product_toggle_status',
     'product_delete',
     'toggle_branch_availability',
+    'branch_availability_matrix',
+    'bulk_branch_availability',
     # Orders
     'order_list',
     'order_update_status',
@@ -1,11 +1,16 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.http import JsonResponse
 
-from dashboard.decorators import superuser_required
+from dashboard.decorators import superuser_required, superuser_required_json
 from products.models import Juice, Category, Branch, BranchProduct
+from products.search import filter_by_search
+from products import availability
+from products.cache import bump_catalog_revision
 
 
 @superuser_required
@@ -54,28 +59,17 @@ def product_list(request):
     # Search
     search_query = request.GET.get('search', '')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = filter_by_search(products, search_query)
     
     # Availability filter (filter by branch availability)
     availability_filter = request.GET.get('availability', '')
     if availability_filter and selected_branch:
+        available_here = availability.available_at(selected_branch.id)
         if availability_filter == 'available':
-            # Get products that are available in the selected branch
-            available_product_ids = BranchProduct.objects.filter(
-                branch=selected_branch,
-                is_available=True
-            ).values_list('product_id', flat=True)
-            products = products.filter(id__in=available_product_ids)
+            products = products.filter(available_here)
         elif availability_filter == 'not_available':
-            # Get products that are not available or not in BranchProduct for this branch
-            available_product_ids = BranchProduct.objects.filter(
-                branch=selected_branch,
-                is_available=True
-            ).values_list('product_id', flat=True)
-            products = products.exclude(id__in=available_product_ids)
+            # Not available, or not in BranchProduct at all for this branch
+            products = products.exclude(available_here)
     
     # Pagination
     paginator = Paginator(products, 20)
@@ -84,12 +78,9 @@ def product_list(request):
     
     # Add branch availability status to each product
     if selected_branch:
+        available_product_ids = availability.available_product_ids(selected_branch.id)
         for product in page_obj:
-            branch_product = BranchProduct.objects.filter(
-                branch=selected_branch,
-                product=product
-            ).first()
-            product.branch_available = branch_product.is_available if branch_product else False
+            product.branch_available = product.id in available_product_ids
     
     categories = Category.objects.all()
     branches = Branch.objects.filter(is_active=True)
@@ -275,3 +266,96 @@ def toggle_branch_availability(request, product_id, branch_id):
             'success': False,
             'error': 'Branch or product not found'
         }, status=404)
+
+
+@superuser_required_json
+def branch_availability_matrix(request):
+    """All branches x products availability as JSON"""
+    branches = list(Branch.objects.order_by('id').values('id', 'name', 'is_active'))
+    products = list(Juice.objects.order_by('id').values('id', 'name', 'category_id', 'is_active'))
+
+    return JsonResponse({
+        'success': True,
+        'branches': branches,
+        'products': products,
+        # branch id -> ids of the products available there; anything else is unavailable
+        'available': {
+            str(branch['id']): sorted(availability.available_product_ids(branch['id']))
+            for branch in branches
+        },
+    })
+
+
+def _requested_availability(payload):
+    """
+    Turn a bulk request into {(branch_id, product_id): is_available}.
+
+    Accepts explicit ``changes`` and/or a whole ``category_id`` (optionally
+    limited to one ``branch_id``, otherwise every branch).
+    """
+    cells = {}
+
+    category_id = payload.get('category_id')
+    if category_id is not None:
+        is_available = bool(payload['is_available'])
+        branch_id = payload.get('branch_id')
+        branches = Branch.objects.filter(id=int(branch_id)) if branch_id else Branch.objects.all()
+        branch_ids = list(branches.order_by().values_list('id', flat=True))
+        product_ids = Juice.objects.filter(category_id=int(category_id)).values_list('id', flat=True)
+        for product_id in product_ids:
+            for branch_id in branch_ids:
+                cells[(branch_id, product_id)] = is_available
+
+    # Explicit cells win over the category-wide value
+    for change in payload.get('changes', []):
+        key = (int(change['branch_id']), int(change['product_id']))
+        cells[key] = bool(change['is_available'])
+
+    return cells
+
+
+@superuser_required_json
+def bulk_branch_availability(request):
+    """Apply many availability changes in one transaction"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST required'}, status=405)
+
+    try:
+        cells = _requested_availability(json.loads(request.body))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({
+            'success': False,
+            'error': 'Send "changes": [{branch_id, product_id, is_available}] '
+                     'and/or "category_id" with "is_available"'
+        }, status=400)
+
+    if not cells:
+        return JsonResponse({'success': True, 'updated': 0})
+
+    branch_ids = {branch_id for branch_id, _ in cells}
+    product_ids = {product_id for _, product_id in cells}
+    if (
+        Branch.objects.filter(id__in=branch_ids).count() != len(branch_ids) or
+        Juice.objects.filter(id__in=product_ids).count() != len(product_ids)
+    ):
+        return JsonResponse({
+            'success': False,
+            'error': 'Branch or product not found'
+        }, status=404)
+
+    with transaction.atomic():
+        # One upsert per batch instead of get_or_create + save per cell
+        BranchProduct.objects.bulk_create(
+            [
+                BranchProduct(branch_id=branch_id, product_id=product_id, is_available=is_available)
+                for (branch_id, product_id), is_available in cells.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['branch', 'product'],
+            update_fields=['is_available', 'updated_at'],
+            batch_size=500,
+        )
+        # bulk_create sends no post_save signals
+        bump_catalog_revision()
+
+    return JsonResponse({'success': True, 'updated': len(cells)})
@@ -8,6 +8,9 @@ export default function JuiceCard({ juice, onAddToCart }) {
   const imageUrl = juice.image 
     ? (juice.image.startsWith('http') ? juice.image : `${BASE_URL}${juice.image}`)
     : '/placeholder-juice.jpg';
+  const imageSrcSet = juice.image_srcset
+    ? Object.entries(juice.image_srcset).map(([width, url]) => `${url} ${width}`).join(', ')
+    : undefined;
 
   return (
     <div 
@@ -18,6 +21,9 @@ export default function JuiceCard({ juice, onAddToCart }) {
       <div className="relative overflow-hidden bg-gradient-to-br from-orange-50 to-pink-50">
         <img
           src={imageUrl}
+          srcSet={imageSrcSet}
+          sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+          loading="lazy"
           alt={juice.name}
           className="w-full h-56 object-contain group-hover:scale-110 transition-transform duration-300"
           onError={(e) => { e.target.src = '/placeholder-juice.jpg'; }}
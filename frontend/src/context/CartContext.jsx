@@ -1,12 +1,17 @@
-import { createContext, useState, useContext, useEffect, useCallback } from 'react';
+import { createContext, useState, useContext, useEffect, useCallback, useRef } from 'react';
 import api from '../services/api';
+import { useBranch } from './BranchContext';
 
 const CartContext = createContext(null);
 
+// Quantity taps closer together than this are sent as one /cart/batch/ request
+const QUANTITY_DEBOUNCE_MS = 300;
+
 export const CartProvider = ({ children }) => {
   const [cart, setCart] = useState(null);
   const [cartCount, setCartCount] = useState(0);
   const [loading, setLoading] = useState(true);
+  const { selectedBranch } = useBranch();
 
   const fetchCart = useCallback(async () => {
     try {
@@ -34,7 +39,7 @@ export const CartProvider = ({ children }) => {
 
   const addToCart = async (juiceId, quantity = 1) => {
     try {
-      await api.post('/cart/add/', { juice_id: juiceId, quantity });
+      await api.post('/cart/add/', { juice_id: juiceId, quantity, branch_id: selectedBranch?.id });
       await fetchCart();
       return { success: true };
     } catch (error) {
@@ -43,25 +48,76 @@ export const CartProvider = ({ children }) => {
     }
   };
 
-  const updateQuantity = async (juiceId, action) => {
-    try {
-      // Backend expects juice_id, not item_id
-      await api.post('/cart/update/', { juice_id: juiceId, action });
-      await fetchCart();
-      return { success: true };
-    } catch (error) {
-      console.error('Error updating cart:', error);
-      const errorMsg = error.response?.data?.message || 'Failed to update cart';
-      return { success: false, error, message: errorMsg };
+  // Patch the cart in place from a ?response=delta body instead of refetching it
+  const applyDelta = (juiceId, delta) => {
+    const { item, removed, item_count, ...totals } = delta;
+    setCart(prev => prev && {
+      ...prev,
+      ...totals,
+      items: removed
+        ? prev.items.filter(line => line.juice !== juiceId)
+        : prev.items.map(line => (line.juice === juiceId ? { ...line, ...item } : line)),
+    });
+    setCartCount(item_count);
+  };
+
+  const pendingSteps = useRef(new Map()); // juiceId -> net quantity change
+  const flushTimer = useRef(null);
+  const waiters = useRef([]);
+
+  const flushQuantities = async () => {
+    flushTimer.current = null;
+    const operations = [...pendingSteps.current.entries()]
+      .filter(([, step]) => step !== 0)
+      .map(([juiceId, step]) => ({
+        op: step > 0 ? 'increment' : 'decrement',
+        juice_id: juiceId,
+        quantity: Math.abs(step),
+      }));
+    pendingSteps.current.clear();
+    const resolvers = waiters.current;
+    waiters.current = [];
+
+    let result = { success: true };
+    if (operations.length) {
+      try {
+        const response = await api.post('/cart/batch/', { operations });
+        setCart(response.data);
+        setCartCount(response.data.items.length);
+      } catch (error) {
+        console.error('Error updating cart:', error);
+        const errorMsg = error.response?.data?.message || 'Failed to update cart';
+        result = { success: false, error, message: errorMsg };
+        await fetchCart();
+      }
     }
+    resolvers.forEach(resolve => resolve(result));
+  };
+
+  const updateQuantity = (juiceId, action) => {
+    const step = action === 'increment' ? 1 : -1;
+    pendingSteps.current.set(juiceId, (pendingSteps.current.get(juiceId) || 0) + step);
+
+    // Show the new quantity straight away; totals arrive with the batch response
+    setCart(prev => prev && {
+      ...prev,
+      items: prev.items
+        .map(line => (line.juice === juiceId ? { ...line, quantity: line.quantity + step } : line))
+        .filter(line => line.quantity > 0),
+    });
+
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flushQuantities, QUANTITY_DEBOUNCE_MS);
+    return new Promise(resolve => waiters.current.push(resolve));
   };
 
   const removeItem = async (juiceId) => {
     try {
       // Backend expects juice_id, not item_id
       console.log('Removing item with juice_id:', juiceId);
-      await api.delete('/cart/remove/', { data: { juice_id: juiceId } });
-      await fetchCart();
+      pendingSteps.current.delete(juiceId);
+      const response = await api.delete('/cart/remove/?response=delta', { data: { juice_id: juiceId } });
+      applyDelta(juiceId, response.data);
       return { success: true };
     } catch (error) {
       console.error('Error removing item:', error);
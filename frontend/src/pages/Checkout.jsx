@@ -1,10 +1,11 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { CreditCard, Banknote, MapPin, Plus } from 'lucide-react';
 import api from '../services/api';
 import addressAPI from '../services/addressAPI';
 import { useCart } from '../context/CartContext';
 import { useToast } from '../context/ToastContext';
+import { useBranch } from '../context/BranchContext';
 import AddressForm from '../components/AddressForm';
 
 export default function Checkout() {
@@ -17,11 +18,20 @@ export default function Checkout() {
   const navigate = useNavigate();
   const { clearCart } = useCart();
   const { showToast } = useToast();
+  const { selectedBranch } = useBranch();
+  // Sent as Idempotency-Key so a retried or double-submitted checkout replays
+  // the first order instead of placing a second one
+  const checkoutKey = useRef(null);
 
   useEffect(() => {
     fetchAddresses();
   }, []);
 
+  useEffect(() => {
+    // A different request needs a different key
+    checkoutKey.current = null;
+  }, [paymentMethod, selectedAddress, selectedBranch?.id]);
+
   const fetchAddresses = async () => {
     try {
       const response = await addressAPI.getAddresses();
@@ -57,10 +67,18 @@ export default function Checkout() {
     }
 
     setLoading(true);
+    if (!checkoutKey.current) {
+      checkoutKey.current = crypto.randomUUID();
+    }
     try {
+      // Online checkouts get the Razorpay order in the same response
       const response = await api.post('/orders/checkout/', {
         payment_method: paymentMethod,
-        address_id: selectedAddress
+        create_gateway_order: paymentMethod === 'online',
+        address_id: selectedAddress,
+        branch_id: selectedBranch?.id
+      }, {
+        headers: { 'Idempotency-Key': checkoutKey.current }
       });
 
       if (paymentMethod === 'online') {
@@ -72,15 +90,22 @@ export default function Checkout() {
         }
 
         const orderData = response.data.order;
-        const paymentRes = await api.post('/payments/razorpay/create-order/', {
-          order_id: orderData.id
-        });
+        let gatewayOrder = response.data.razorpay;
+        if (!gatewayOrder) {
+          // Razorpay did not answer during checkout; the order exists, so ask for it separately
+          const paymentRes = await api.post('/payments/razorpay/create-order/', {
+            order_id: orderData.id
+          }, {
+            headers: { 'Idempotency-Key': `${checkoutKey.current}:razorpay` }
+          });
+          gatewayOrder = paymentRes.data;
+        }
 
         const options = {
-          key: paymentRes.data.key_id,
-          amount: paymentRes.data.amount,
-          currency: paymentRes.data.currency,
-          order_id: paymentRes.data.razorpay_order_id,
+          key: gatewayOrder.key_id,
+          amount: gatewayOrder.amount,
+          currency: gatewayOrder.currency,
+          order_id: gatewayOrder.razorpay_order_id,
           name: "PeelOJuice",
           description: `Order #${orderData.id}`,
           handler: async function(paymentResponse) {
@@ -90,6 +115,7 @@ export default function Checkout() {
                 razorpay_payment_id: paymentResponse.razorpay_payment_id,
                 razorpay_signature: paymentResponse.razorpay_signature
               });
+              checkoutKey.current = null;
               clearCart();
               navigate(`/order-success?success=true&orderId=${orderData.id}&method=online`);
             } catch (error) {
@@ -116,11 +142,16 @@ export default function Checkout() {
       } else {
         // COD order
         const orderData = response.data.order;
+        checkoutKey.current = null;
         clearCart();
         navigate(`/order-success?success=true&orderId=${orderData.id}&method=cod`);
       }
     } catch (error) {
       console.error('Checkout error:', error);
+      if (error.response && error.response.status !== 409) {
+        // The server answered, so a retry is a new attempt; keep the key only for network errors
+        checkoutKey.current = null;
+      }
       const errorMessage = error.response?.data?.detail || 'Failed to place order';
       showToast(errorMessage, 'error');
       setLoading(false);
@@ -1,4 +1,4 @@
-import { useState, useEffect, useRef, useCallback } from 'react';
+import { useState, useEffect, useRef, useCallback, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api, { BASE_URL } from '../services/api';
 import { useCart } from '../context/CartContext';
@@ -6,6 +6,10 @@ import { useToast } from '../context/ToastContext';
 import { useBranch } from '../context/BranchContext';
 import CategoryFilter from '../components/CategoryFilter';
 
+// { '200w': url, ... } from the API -> "url 200w, ..."
+const srcSet = (variants) =>
+  variants ? Object.entries(variants).map(([width, url]) => `${url} ${width}`).join(', ') : undefined;
+
 export default function Menu() {
   const navigate = useNavigate();
   const { addToCart } = useCart();
@@ -19,20 +23,28 @@ export default function Menu() {
   const [hasMore, setHasMore] = useState(true);
   const [loadingMore, setLoadingMore] = useState(false);
   const observer = useRef();
+  const nextCursor = useRef('');
 
-  useEffect(() => {
-    fetchCategories();
-    // Fetch juices on initial load
-    fetchJuices(1, true);
-  }, []);
+  const [menuProducts, setMenuProducts] = useState(null);
 
   useEffect(() => {
+    // A selected branch loads its whole menu once and is filtered locally
+    if (selectedBranch) return;
+    setMenuProducts(null);
     setJuices([]);
     setPage(1);
     setHasMore(true);
     fetchJuices(1, true);
   }, [selectedCategory, selectedBranch]); // Added selectedBranch to dependencies
 
+  useEffect(() => {
+    if (selectedBranch) {
+      fetchMenu(selectedBranch.id);
+    } else {
+      fetchCategories();
+    }
+  }, [selectedBranch]);
+
   const fetchCategories = async () => {
     try {
       const response = await api.get('/products/categories/');
@@ -42,25 +54,41 @@ export default function Menu() {
     }
   };
 
+  const fetchMenu = async (branchId) => {
+    setLoadingMore(true);
+    try {
+      const response = await api.get(`/products/branches/${branchId}/menu/`);
+      const categoryById = Object.fromEntries(
+        response.data.categories.map(category => [category.id, category])
+      );
+      setCategories(response.data.categories);
+      setMenuProducts(response.data.products.map(product => ({
+        ...product,
+        category: categoryById[product.category_id],
+      })));
+      setHasMore(false);
+      setLoading(false);
+    } catch (error) {
+      console.error('Error fetching menu:', error);
+      showToast('Failed to load menu', 'error');
+      setLoading(false);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const fetchJuices = async (pageNum, reset = false) =>{
     if (!hasMore && !reset) return;
     
     setLoadingMore(true);
     try {
-      const params = { page: pageNum };
+      // Keyset pagination: an empty cursor starts at the first page
+      const params = { cursor: reset ? '' : nextCursor.current };
       if (selectedCategory !== 'all') {
         params.category_id = selectedCategory;
       }
       
-      let response;
-      // If branch is selected, use branch-specific endpoint
-      // Otherwise, fallback to general juices endpoint
-      if (selectedBranch) {
-        response = await api.get(`/products/branches/${selectedBranch.id}/products/`, { params });
-      } else {
-        response = await api.get(`/products/juices/`, { params });
-      }
+      const response = await api.get(`/products/juices/`, { params });
       
       const newJuices = response.data.results || response.data;
       
@@ -70,6 +98,9 @@ export default function Menu() {
         setJuices(prev => [...prev, ...newJuices]);
       }
       
+      nextCursor.current = response.data.next
+        ? new URL(response.data.next).searchParams.get('cursor')
+        : '';
       setHasMore(!!response.data.next);
       setLoading(false);
     } catch (error) {
@@ -98,6 +129,12 @@ export default function Menu() {
     if (node) observer.current.observe(node);
   }, [loadingMore, hasMore]);
 
+  const visibleJuices = useMemo(() => (
+    menuProducts
+      ? menuProducts.filter(juice => selectedCategory === 'all' || juice.category_id === selectedCategory)
+      : juices
+  ), [menuProducts, juices, selectedCategory]);
+
   // Scroll-based zoom animation
   useEffect(() => {
     const scrollObserver = new IntersectionObserver(
@@ -120,8 +157,7 @@ export default function Menu() {
     cards.forEach((card) => scrollObserver.observe(card));
 
     return () => scrollObserver.disconnect();
-  }, [juices]);
-
+  }, [visibleJuices]);
   const handleAddToCart = async (juice) => {
     const accessToken = sessionStorage.getItem('accessToken');
     if (!accessToken) {
@@ -168,8 +204,8 @@ export default function Menu() {
 
         {/* Products Grid */}
         <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6 mt-8">
-          {juices.map((juice, index) => {
-            const isLast = juices.length === index + 1;
+          {visibleJuices.map((juice, index) => {
+            const isLast = visibleJuices.length === index + 1;
             return (
               <div 
                 key={juice.id} 
@@ -181,6 +217,9 @@ export default function Menu() {
                 <div className="aspect-[4/3] bg-gray-100 overflow-hidden">
                   <img
                     src={juice.image ? (juice.image.startsWith('http') ? juice.image : `${BASE_URL}${juice.image}`) : '/carrot-juice.png'}
+                    srcSet={srcSet(juice.image_srcset)}
+                    sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
+                    loading="lazy"
                     alt={juice.name}
                     className="w-full h-full object-cover"
                     onError={(e) => {
@@ -227,7 +266,7 @@ export default function Menu() {
         )}
 
         {/* No Results */}
-        {!loading && juices.length === 0 && (
+        {!loading && visibleJuices.length === 0 && (
           <div className="text-center py-20">
             <div className="text-6xl mb-4">🥤</div>
             <h3 className="text-2xl font-semibold text-gray-800 mb-2">No juices found</h3>
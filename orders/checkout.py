@@ -0,0 +1,109 @@
+"""
+Checkout pipeline with a fixed query count, whatever the size of the cart.
+
+    load_cart       the cart, its coupon, items and juices (two SELECTs)
+    create_order    one INSERT carrying the final totals, after Order.save
+                    has looked up the next order number
+    create_items    one bulk INSERT for every line, then one SELECT that
+                    loads them back for the response and the email
+    create_payment  one INSERT
+    clear_cart      one DELETE and one UPDATE (COD only, see cart/mutations.py)
+
+An online checkout can also create the Razorpay order. The call is started
+before create_order and runs while the rows are written. It is only waited
+for once the checkout has committed, so no lock (the SQLite write lock, the
+order number counter row) is held across it; attach_gateway_order then
+records the gateway order id with one UPDATE.
+
+Cart items are read once and reused for pricing, availability checks and
+the order lines, so nothing is re-evaluated or lazily loaded per row.
+"""
+import logging
+
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from cart.models import Cart, CartItem
+from cart.pricing import price_items
+
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def load_cart(user):
+    """The user's cart with coupon, items and juices loaded, or None"""
+    return (
+        Cart.objects
+        .select_related('applied_coupon')
+        .prefetch_related(Prefetch('items', queryset=CartItem.objects.select_related('juice')))
+        .filter(user=user)
+        .first()
+    )
+
+
+def price_cart_items(cart, items):
+    """Price ``items`` as the cart page does; a broken coupon is dropped, not fatal"""
+    try:
+        return price_items(items, coupon=cart.applied_coupon)
+    except Exception as e:
+        logger.exception(f"Coupon discount calculation failed for cart {cart.id}: {e}")
+        return price_items(items)
+
+
+def create_order(user, branch, pricing, awaiting_payment=False):
+    return Order.objects.create(
+        user=user, branch=branch, awaiting_payment=awaiting_payment, **pricing.as_order_fields()
+    )
+
+
+def create_items(order, items):
+    """Copy cart lines onto ``order`` in one INSERT and prefetch ``order.items``"""
+    order_items = OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            juice=item.juice,
+            quantity=item.quantity,
+            price_per_item=item.price_at_added
+        )
+        for item in items
+    ])
+    prefetch_related_objects([order], Prefetch('items', queryset=OrderItem.objects.select_related('juice')))
+    return order_items
+
+
+def create_payment(order, method):
+    from payments.models import Payment
+
+    return Payment.objects.create(
+        order=order,
+        method=method,
+        amount=order.total_amount,
+        status='pending'
+    )
+
+
+def attach_gateway_order(payment, gateway_order):
+    """Wait for the Razorpay order started for ``payment`` and store its id; returns it, or None if the call failed"""
+    from payments.models import Payment
+    from payments.razorpay_utils import GatewayUnavailable
+
+    try:
+        razorpay_order = gateway_order.result()
+    except GatewayUnavailable as e:
+        logger.warning(f"No Razorpay order for payment {payment.id}, client falls back to create-order: {e}")
+        return None
+    except Exception:
+        logger.exception(f"Razorpay order for payment {payment.id} failed, client falls back to create-order")
+        return None
+
+    # A duplicate of this checkout replayed before we got here may have used the
+    # create-order fallback already; its gateway order stands
+    recorded = Payment.objects.filter(pk=payment.pk, razorpay_order_id__isnull=True).update(
+        razorpay_order_id=razorpay_order['id'], updated_at=timezone.now()
+    )
+    if not recorded:
+        logger.info(f"Razorpay order {razorpay_order['id']} unused: payment {payment.id} already has one")
+        return None
+    payment.razorpay_order_id = razorpay_order['id']
+    return razorpay_order
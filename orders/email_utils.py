@@ -6,7 +6,7 @@ from django.utils.html import strip_tags
 
 def send_order_confirmation_email(order, user):
     """
-    Send order confirmation email to customer using Brevo API
+    Queue the order confirmation email in the outbox (see users/outbox.py)
     """
     subject = f'Order Confirmation - #{order.order_number} | PeelOJuice'
     
@@ -16,7 +16,21 @@ def send_order_confirmation_email(order, user):
         payment_method = order.payment.get_method_display()
     
     # Format amounts with proper 2 decimal places
-    total_amount_formatted = f"₹{float(order.total_amount):.2f}"
+    pricing = order.pricing
+    total_amount_formatted = f"₹{pricing.grand_total:.2f}"
+    charges = [('Food Subtotal', f"₹{pricing.food_subtotal:.2f}")]
+    if pricing.discount:
+        charges.append(('Coupon Discount', f"-₹{pricing.discount:.2f}"))
+    charges += [
+        ('GST', f"₹{pricing.total_gst:.2f}"),
+        ('Delivery Fee', f"₹{pricing.delivery_fee_base:.2f}" if pricing.delivery_fee_base else 'FREE'),
+        ('Platform Fee', f"₹{pricing.platform_fee:.2f}"),
+    ]
+    charges_html = ''.join(
+        f'<div class="detail-row"><span class="label">{label}</span><span class="value">{value}</span></div>'
+        for label, value in charges
+    )
+    charges_text = '\n'.join(f"    - {label}: {value}" for label, value in charges)
     
     # Create HTML email content
     html_message = f"""
@@ -76,6 +90,7 @@ def send_order_confirmation_email(order, user):
                             <span class="label">Items</span>
                             <span class="value">{order.items.count()} items</span>
                         </div>
+                        {charges_html}
                         <div class="detail-row" style="border: none; padding-top: 15px;">
                             <span class="label" style="font-size: 18px;">Total Amount</span>
                             <span class="total">{total_amount_formatted}</span>
@@ -126,6 +141,7 @@ def send_order_confirmation_email(order, user):
     - Order Number: #{order.order_number}
     - Payment Method: {payment_method}
     - Status: Confirmed
+{charges_text}
     - Total Amount: {total_amount_formatted}
     - Placed on: {order.created_at.strftime('%B %d, %Y at %I:%M %p')}
     
@@ -137,26 +153,14 @@ def send_order_confirmation_email(order, user):
     PeelOJuice Team
     """
     
-    try:
-        # Use Brevo API instead of SMTP
-        from users.email_api import send_email_via_brevo_api
-        
-        success, message = send_email_via_brevo_api(
-            to_email=user.email,
-            subject=subject,
-            text_content=plain_message,
-            html_content=html_message
-        )
-        
-        if success:
-            print(f"[SUCCESS] Order confirmation email sent to {user.email}")
-            return True
-        else:
-            print(f"[ERROR] Failed to send order confirmation email: {message}")
-            return False
-            
-    except Exception as e:
-        print(f"[ERROR] Exception sending order confirmation email: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    # Delivered by the email worker once the order is committed
+    from users.outbox import enqueue_email
+
+    enqueue_email(
+        to_email=user.email,
+        subject=subject,
+        text_content=plain_message,
+        html_content=html_message,
+        kind='order_confirmation'
+    )
+    return True
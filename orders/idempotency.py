@@ -0,0 +1,209 @@
+"""
+Idempotency-Key support for POST endpoints that create orders and payments.
+
+A client sends the same ``Idempotency-Key`` header with every retry of one
+logical request. The first request claims the key (one INSERT), runs the
+view and stores the status code and body it answered with. Any duplicate
+from the same user gets that stored response back instead of running the
+view again. One that arrives while the first is still running gets 409 with
+Retry-After straight away rather than holding a worker while it waits.
+
+Finished responses are cached as well, so a retry storm costs one cache
+lookup. Reusing a key for a different request is answered with 422, and a
+server error releases the key so the client can try again. Keys stop
+counting after IDEMPOTENCY_KEY_TTL and are deleted by
+``manage.py purge_idempotency_keys``.
+
+A worker killed mid-request (a gunicorn timeout, OOM, a deploy) never gets
+to store or release its claim. Such a claim is only honoured for
+IDEMPOTENCY_LEASE seconds; after that the next duplicate takes it over and
+runs the view again. A view whose writes commit before it returns calls
+remember_response() inside its transaction, so once those writes are in,
+the key already holds the response and is replayed, never re-run.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from config import renderers
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def _cache_key(user_id, key):
+    # Keys are chosen by the client, so hash them into something cache-safe
+    return f'idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _entry(record):
+    """(fingerprint, status_code, body) of a stored key; status_code is None while in flight"""
+    return record.fingerprint, record.status_code, record.response_body
+
+
+def _is_abandoned(record, fingerprint, now):
+    return (
+        record.status_code is None
+        and record.fingerprint == fingerprint
+        and record.claimed_at <= now - timedelta(seconds=settings.IDEMPOTENCY_LEASE)
+    )
+
+
+def _claim(user_id, key, fingerprint):
+    """
+    Claim ``key`` for this request.
+
+    Returns None once the key is claimed, else the entry to answer from. A
+    key that cannot be settled in three attempts is reported as in flight:
+    the view must never run without a claim.
+    """
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                )
+            return None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+            if record is None:
+                continue  # Released in the meantime
+            now = timezone.now()
+            if record.expires_at <= now:
+                # Expired but not purged yet: the key is free again
+                record.delete()
+                continue
+            if not _is_abandoned(record, fingerprint, now):
+                return _entry(record)
+            # Its worker died before storing or releasing it; take the claim over.
+            # Losing the race to another duplicate finds its fresh claim next time round
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at
+            ).update(claimed_at=now)
+            if taken:
+                return None
+    return fingerprint, None, None
+
+
+def _save_response(user_id, key, response):
+    # Stored as the API rendered it, so a replay is byte-for-byte the same body
+    body = orjson.loads(renderers.dumps(response.data))
+    IdempotencyKey.objects.filter(user_id=user_id, key=key).update(
+        status_code=response.status_code,
+        response_body=body
+    )
+    return body
+
+
+def _store(user_id, key, fingerprint, response):
+    body = _save_response(user_id, key, response)
+    cache.set(
+        _cache_key(user_id, key),
+        (fingerprint, response.status_code, body),
+        settings.IDEMPOTENCY_KEY_TTL
+    )
+
+
+def remember_response(request, response):
+    """
+    Store ``response`` for the request's claimed key, inside the caller's transaction.
+
+    It commits or rolls back with the view's own writes. The decorator still
+    stores whatever the view finally returns.
+    """
+    claim = getattr(request, 'idempotency_claim', None)
+    if claim is not None:
+        _save_response(*claim, response)
+
+
+def _release(user_id, key):
+    IdempotencyKey.objects.filter(user_id=user_id, key=key).delete()
+
+
+def _replay(fingerprint, entry):
+    if entry[0] != fingerprint:
+        return Response(
+            {"detail": f"This {HEADER} was already used for a different request"},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    if entry[1] is None:
+        return Response(
+            {"detail": "A request with this Idempotency-Key is still being processed"},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': '1'}
+        )
+
+    _, status_code, body = entry
+    return Response(body, status=status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def idempotent(view_method):
+    """
+    Make an APIView handler replay its response for a repeated Idempotency-Key.
+
+    Requests without the header run as before. Apply it outside
+    ``transaction.atomic`` so the claim is visible to concurrent duplicates.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user_id = request.user.id
+        fingerprint = _fingerprint(request)
+        entry = cache.get(_cache_key(user_id, key))
+        if entry is None:
+            entry = _claim(user_id, key, fingerprint)
+            if entry is None:
+                request.idempotency_claim = (user_id, key)
+                try:
+                    response = view_method(self, request, *args, **kwargs)
+                except BaseException:
+                    # Including SystemExit from a worker timeout
+                    _release(user_id, key)
+                    raise
+                if response.status_code >= 500:
+                    _release(user_id, key)
+                else:
+                    _store(user_id, key, fingerprint, response)
+                return response
+
+        return _replay(fingerprint, entry)
+
+    return wrapper
+
+
+def purge_expired_keys():
+    """Delete expired keys; returns how many were deleted"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
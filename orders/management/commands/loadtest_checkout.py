@@ -0,0 +1,345 @@
+import json
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from coupons.models import Coupon
+from products.models import Branch, BranchProduct, Category, Juice
+from users.models import OutboundEmail, User
+
+# Steps of one customer's flow, in order
+STEPS = (
+    'register', 'verify_email', 'verify_phone', 'login', 'add_address',
+    'add_to_cart', 'apply_coupon', 'checkout', 'verify_order',
+)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _is_lock_error(message):
+    message = message.lower()
+    return any(text in message for text in ('locked', 'deadlock', 'lock wait', 'could not obtain lock'))
+
+
+class _StepFailed(Exception):
+    pass
+
+
+class _InProcess:
+    """Calls the views through the Django test client; can count queries"""
+    counts_queries = True
+
+    def __init__(self):
+        self.client = APIClient()
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def call(self, method, path, data=None, headers=None):
+        response = getattr(self.client, method)(path, data, format='json', headers=headers)
+        return response.status_code, response.content
+
+
+class _Live:
+    """Calls a running server over HTTP"""
+    counts_queries = False
+
+    def __init__(self, url):
+        import requests
+
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def authenticate(self, token):
+        self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def call(self, method, path, data=None, headers=None):
+        response = self.session.request(method, self.url + path, json=data, headers=headers, timeout=60)
+        return response.status_code, response.content
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test checkout: concurrent customers register, verify, log in, add an address, '
+        'fill a cart, apply a coupon, check out (COD) and read the order back. Reports '
+        'p50/p95/p99 latency, throughput, queries per request and lock-wait errors per step, '
+        'and can write a JSON report and compare it with an earlier one. Runs in this process '
+        'through the test client, or against a live server with --url (which must use the '
+        'same database). Rows created are deleted afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Customer flows to run')
+        parser.add_argument('--concurrency', type=int, default=8, help='Flows running at once (threads)')
+        parser.add_argument('--items', type=int, default=3, help='Distinct products added per cart')
+        parser.add_argument('--products', type=int, default=20, help='Products seeded for the run')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed flows run first')
+        parser.add_argument('--url', help='Base URL of a running server instead of the test client')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier JSON report to compare against')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users, orders and catalog')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('This writes to the configured database; pass --force to run with DEBUG off.')
+        if options['users'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--users and --concurrency must be at least 1')
+
+        self.options = options
+        self.run_id = uuid.uuid4().hex[:6]
+        self.rng = random.Random(options['seed'])
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.error_samples = []
+
+        self.stdout.write(
+            f'Database: {connection.vendor}, target: {options["url"] or "test client"}, '
+            f'{options["users"]} flows x {options["concurrency"]} threads, run {self.run_id}'
+        )
+        self._seed()
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for n in range(options['warmup']):
+                    self._flow(options['users'] + n, record=False)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    outcomes = list(pool.map(self._flow, range(options['users'])))
+                wall = time.perf_counter() - start
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+        report = self._report(wall, outcomes)
+        self._print(report)
+        if options['compare']:
+            self._compare(report, options['compare'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+    # Fixtures
+
+    def _seed(self):
+        with transaction.atomic():
+            self.category = Category.objects.create(name=f'Loadtest {self.run_id}')
+            self.juices = Juice.objects.bulk_create([
+                Juice(
+                    category=self.category, name=f'Loadtest {self.run_id} #{n}', description='-',
+                    price=f'{self.rng.randint(60, 180)}.00', image='juices/loadtest.png'
+                )
+                for n in range(self.options['products'])
+            ])
+            self.branch = Branch.objects.create(
+                name=f'Loadtest {self.run_id}', address='-', city='-', state='-', pincode='500001',
+                phone='0', email='loadtest@example.com', opening_time='00:00', closing_time='00:00'
+            )
+            BranchProduct.objects.bulk_create([
+                BranchProduct(branch=self.branch, product=juice) for juice in self.juices
+            ])
+            self.coupon = Coupon.objects.create(
+                code=f'LOAD{self.run_id}'.upper(), discount_type='percentage', discount_value='5'
+            )
+
+    def _cleanup(self):
+        prefix = f'loadtest-{self.run_id}-'
+        # Users first: their orders protect the seeded juices
+        User.objects.filter(email__startswith=prefix).delete()
+        OutboundEmail.objects.filter(to_email__startswith=prefix).delete()
+        self.coupon.delete()
+        self.branch.delete()
+        Juice.objects.filter(category=self.category).delete()
+        self.category.delete()
+
+    # One customer
+
+    def _flow(self, n, record=True):
+        """Run one customer's flow; returns True if every step succeeded"""
+        transport = _Live(self.options['url']) if self.options['url'] else _InProcess()
+        email = f'loadtest-{self.run_id}-{n}@example.com'
+        phone = f'9{int(self.run_id, 16) % 10 ** 4:04d}{n:05d}'
+        password = 'loadtest-pass-1'
+        juices = self.rng.sample(self.juices, min(self.options['items'], len(self.juices)))
+
+        step = lambda name, method, path, data=None, headers=None: self._step(
+            transport, name, method, path, data, headers, record
+        )
+        try:
+            registered = step('register', 'post', '/api/users/register/', {
+                'email': email, 'first_name': 'Load', 'last_name': 'Test', 'phone_number': phone,
+                'password': password, 'confirm_password': password
+            })
+            # The email OTP only exists in the database (the live server must share it)
+            email_otp = User.objects.filter(email=email).values_list('email_otp', flat=True).first()
+            step('verify_email', 'post', '/api/users/verify-email/', {'email': email, 'otp': email_otp})
+            step('verify_phone', 'post', '/api/users/verify-phone/', {
+                'phone_number': phone, 'otp': registered['phone_otp']
+            })
+            tokens = step('login', 'post', '/api/users/login/', {'email_or_phone': email, 'password': password})
+            transport.authenticate(tokens['access_token'])
+
+            address = step('add_address', 'post', '/api/addresses/', {
+                'label': 'Home', 'full_name': 'Load Test', 'phone_number': phone,
+                'address_line1': '1 Test Street', 'city': '-', 'state': '-', 'pincode': '500001'
+            })
+            for juice in juices:
+                step('add_to_cart', 'post', '/api/cart/add/', {'juice_id': juice.id, 'quantity': 2})
+            step('apply_coupon', 'post', '/api/cart/apply-coupon/', {'code': self.coupon.code})
+            placed = step('checkout', 'post', '/api/orders/checkout/', {
+                'payment_method': 'cod', 'address_id': address['id']
+            }, {'Idempotency-Key': str(uuid.uuid4())})
+
+            order_id = placed['order']['id']
+            order = step('verify_order', 'get', f'/api/orders/my-orders/{order_id}/')
+            if str(order.get('total_amount')) != str(placed['order']['total_amount']):
+                self._error('verify_order', 'mismatch', f'order {order_id} total differs', record)
+                return False
+            return True
+        except _StepFailed:
+            return False
+        except (KeyError, TypeError, ValueError) as e:
+            # A step answered 2xx with a body the flow cannot use
+            self._error('flow', 'unexpected_response', f'{type(e).__name__}: {e}', record)
+            return False
+        finally:
+            if not self.options['url']:
+                connection.close()
+
+    def _step(self, transport, name, method, path, data, headers, record):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            try:
+                status, content = transport.call(method, path, data, headers)
+            except OperationalError as e:
+                self._error(name, 'lock_wait' if _is_lock_error(str(e)) else 'database', str(e), record)
+                raise _StepFailed
+            except Exception as e:
+                self._error(name, 'exception', f'{type(e).__name__}: {e}', record)
+                raise _StepFailed
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if record:
+            with self.lock:
+                self.samples[name].append(elapsed)
+                if transport.counts_queries:
+                    self.queries[name].append(len(captured))
+
+        if status >= 400:
+            body = content.decode(errors='replace')[:200]
+            kind = 'lock_wait' if status >= 500 and _is_lock_error(body) else f'http_{status}'
+            self._error(name, kind, f'{method.upper()} {path} -> {status}: {body}', record)
+            raise _StepFailed
+        return json.loads(content) if content else {}
+
+    def _error(self, step, kind, message, record):
+        if not record:
+            raise CommandError(f'Warm-up failed at {step}: {message}')
+        with self.lock:
+            self.errors[step][kind] += 1
+            if len(self.error_samples) < 10:
+                self.error_samples.append(f'{step}: {message}')
+
+    # Reporting
+
+    def _report(self, wall, outcomes):
+        steps = {}
+        for name in STEPS:
+            samples = self.samples[name]
+            if not samples:
+                continue
+            queries = self.queries[name]
+            steps[name] = {
+                'requests': len(samples),
+                'errors': sum(self.errors[name].values()),
+                'p50_ms': round(_percentile(samples, 50), 2),
+                'p95_ms': round(_percentile(samples, 95), 2),
+                'p99_ms': round(_percentile(samples, 99), 2),
+                'max_ms': round(max(samples), 2),
+                'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+
+        errors = Counter()
+        for kinds in self.errors.values():
+            errors.update(kinds)
+        completed = sum(outcomes)
+        requests = sum(len(samples) for samples in self.samples.values())
+
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'target': self.options['url'] or 'test client',
+            'users': self.options['users'],
+            'concurrency': self.options['concurrency'],
+            'items': self.options['items'],
+            'wall_seconds': round(wall, 3),
+            'flows_completed': completed,
+            'flows_failed': len(outcomes) - completed,
+            'checkouts_per_second': round(len(self.samples['checkout']) / wall, 2),
+            'requests_per_second': round(requests / wall, 2),
+            'lock_wait_errors': errors['lock_wait'],
+            'errors': dict(errors),
+            'error_samples': self.error_samples,
+            'steps': steps,
+        }
+
+    def _print(self, report):
+        self.stdout.write(
+            f'{"step":<14}{"requests":>9}{"errors":>8}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"p99 ms":>10}{"queries":>9}'
+        )
+        for name, step in report['steps'].items():
+            queries = '-' if step['queries_mean'] is None else f'{step["queries_mean"]:.1f}'
+            self.stdout.write(
+                f'{name:<14}{step["requests"]:>9}{step["errors"]:>8}{step["p50_ms"]:10.2f}'
+                f'{step["p95_ms"]:10.2f}{step["p99_ms"]:10.2f}{queries:>9}'
+            )
+        self.stdout.write(
+            f'{report["flows_completed"]} flows completed, {report["flows_failed"]} failed in '
+            f'{report["wall_seconds"]:.2f}s: {report["checkouts_per_second"]:.1f} checkouts/s, '
+            f'{report["requests_per_second"]:.1f} requests/s, {report["lock_wait_errors"]} lock-wait errors'
+        )
+        for sample in report['error_samples']:
+            self.stdout.write(self.style.WARNING(f'  {sample}'))
+
+    def _compare(self, report, path):
+        with open(path) as f:
+            previous = json.load(f)
+        self.stdout.write(f'Compared with {previous.get("commit") or path}:')
+        self.stdout.write(
+            f'  checkouts/s {previous["checkouts_per_second"]:.1f} -> {report["checkouts_per_second"]:.1f}'
+        )
+        for name, step in report['steps'].items():
+            before = previous['steps'].get(name)
+            if not before:
+                continue
+            line = f'  {name:<14}p95 {before["p95_ms"]:8.2f} -> {step["p95_ms"]:8.2f} ms'
+            if step['queries_mean'] is not None and before.get('queries_mean') is not None:
+                line += f'   queries {before["queries_mean"]:.1f} -> {step["queries_mean"]:.1f}'
+            self.stdout.write(line)
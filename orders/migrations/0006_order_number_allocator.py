@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-16 22:18
+
+from django.db import migrations, models
+from django.db.models import Max
+
+# Kept in step with orders/numbering.py
+SEQUENCE = 'orders_order_number_seq'
+COUNTER_ID = 1
+
+
+def create_number_source(apps, schema_editor):
+    """Continue numbering after the highest existing order"""
+    Order = apps.get_model('orders', 'Order')
+    highest = Order.objects.aggregate(highest=Max('order_number'))['highest'] or 0
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE {SEQUENCE} START WITH {highest + 1}")
+    else:
+        OrderNumberCounter = apps.get_model('orders', 'OrderNumberCounter')
+        OrderNumberCounter.objects.create(pk=COUNTER_ID, last_number=highest)
+
+
+def drop_number_source(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_branch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_number_source, drop_number_source),
+    ]
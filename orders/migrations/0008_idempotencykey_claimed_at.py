@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the request running it started; an unfinished claim older than IDEMPOTENCY_LEASE can be taken over'),
+        ),
+    ]
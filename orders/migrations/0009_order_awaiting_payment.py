@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+def mark_unpaid_online_orders(apps, schema_editor):
+    """Take orders still waiting for an online payment out of the kitchen queues"""
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(
+        status='pending', payment__method='online', payment__status__in=('pending', 'failed')
+    ).update(awaiting_payment=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_idempotencykey_claimed_at'),
+        ('payments', '0002_payment_razorpay_order_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='awaiting_payment',
+            field=models.BooleanField(default=False, help_text='Placed for online payment that has not been captured yet'),
+        ),
+        migrations.RunPython(mark_unpaid_online_orders, migrations.RunPython.noop),
+    ]
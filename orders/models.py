@@ -1,7 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from products.models import Juice
-from decimal import Decimal
+from cart.pricing import compute_pricing, order_pricing
 
 
 class Order(models.Model):
@@ -88,6 +89,11 @@ class Order(models.Model):
         choices=STATUS_CHOICES,
         default='pending'
     )
+    # Online orders stay out of the kitchen queue until they are paid
+    awaiting_payment = models.BooleanField(
+        default=False,
+        help_text="Placed for online payment that has not been captured yet"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -101,38 +107,96 @@ class Order(models.Model):
         """Delivery fee + 18% GST"""
         return self.delivery_fee_base + self.delivery_gst
 
+    @property
+    def pricing(self):
+        """The stored money columns as a PricingBreakdown"""
+        return order_pricing(self)
+
     def calculate_totals(self):
         """Calculate all GST and totals"""
-        # Apply discount to subtotal first
-        discounted_subtotal = self.food_subtotal - self.discount
-        
-        # Calculate GST on discounted amount
-        self.food_gst = (discounted_subtotal * Decimal('0.05')).quantize(Decimal('0.01'))
-        self.delivery_gst = (self.delivery_fee_base * Decimal('0.18')).quantize(Decimal('0.01'))
-        
-        self.total_amount = (
-            discounted_subtotal + 
-            self.food_gst + 
-            self.delivery_fee_base + 
-            self.delivery_gst + 
-            self.platform_fee
+        pricing = compute_pricing(
+            self.food_subtotal,
+            discount=self.discount,
+            delivery_fee_base=self.delivery_fee_base,
+            platform_fee=self.platform_fee
         )
+        self.discount = pricing.discount
+        self.food_gst = pricing.food_gst
+        self.delivery_gst = pricing.delivery_gst
+        self.total_amount = pricing.grand_total
+
+    @property
+    def queue_branch_id(self):
+        """The branch whose kitchen queue this order counts towards, if any"""
+        from .routing import ACTIVE_STATUSES
+        if self.awaiting_payment or self.status not in ACTIVE_STATUSES:
+            return None
+        return self.branch_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        # Remembered so a save can move the order between branch queues (orders/signals.py)
+        if {'status', 'branch_id', 'awaiting_payment'} <= set(field_names):
+            order._loaded_queue_branch_id = order.queue_branch_id
+        return order
 
     def save(self, *args, **kwargs):
         """Override save to auto-assign sequential order number"""
         if not self.order_number:
-            # Get the highest order number and add 1
-            last_order = Order.objects.all().order_by('-order_number').first()
-            if last_order and last_order.order_number:
-                self.order_number = last_order.order_number + 1
-            else:
-                self.order_number = 1
+            from .numbering import next_order_number
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Order #{self.order_number} - {self.user.email} - ₹{self.total_amount}"
 
 
+class OrderNumberCounter(models.Model):
+    """
+    Last order number handed out, on databases without a native sequence.
+
+    Holds a single row; see orders/numbering.py.
+    """
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Last order number: {self.last_number}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A request made with an Idempotency-Key header and the response it got.
+
+    ``status_code`` stays empty while the first request is still running.
+    See orders/idempotency.py.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the method, path and body of the first request"
+    )
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the request running it started; an unfinished claim older than IDEMPOTENCY_LEASE can be taken over"
+    )
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(
         Order,
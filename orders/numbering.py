@@ -0,0 +1,102 @@
+"""
+Order number allocation.
+
+Numbers come from a native sequence on PostgreSQL and from a single
+OrderNumberCounter row elsewhere, bumped with one atomic UPDATE. Either
+way two checkouts can never read the same "highest number so far".
+
+With ORDER_NUMBER_BLOCK_SIZE above 1 each worker reserves a block of
+numbers at a time and hands them out from memory, so only one checkout
+per block touches the sequence or the counter row. Numbers still in a
+worker's block when it exits are never used.
+
+Sequence numbers survive a rollback (like any PostgreSQL sequence, a
+rolled-back checkout leaves a gap). The counter row does not: it rolls
+back with the checkout, so the rest of a block reserved from it only
+becomes available to other requests once that checkout has committed.
+"""
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+
+from .models import Order, OrderNumberCounter
+
+# Created by migration 0006
+SEQUENCE = 'orders_order_number_seq'
+COUNTER_ID = 1
+
+_lock = threading.Lock()
+
+# Reserved numbers not handed out yet, lowest first within each block
+_pool = deque()
+
+
+def _uses_sequence():
+    return connection.vendor == 'postgresql'
+
+
+def _reserve_from_sequence(count):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT nextval('{SEQUENCE}') FROM generate_series(1, %s)", [count])
+        return sorted(row[0] for row in cursor.fetchall())
+
+
+def _bump_counter(count):
+    """Add ``count`` to the counter row; returns the new value, or None without a row"""
+    counter = OrderNumberCounter.objects.filter(pk=COUNTER_ID)
+    if connection.features.can_return_columns_from_insert:
+        table = OrderNumberCounter._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET last_number = last_number + %s WHERE id = %s RETURNING last_number",
+                [count, COUNTER_ID]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # The UPDATE locks the row before it is read back
+    with transaction.atomic():
+        if not counter.update(last_number=F('last_number') + count):
+            return None
+        return counter.values_list('last_number', flat=True).get()
+
+
+def _reserve_from_counter(count):
+    last = _bump_counter(count)
+    if last is None:
+        # No row yet (e.g. the table was emptied): start after the highest order
+        highest = Order.objects.aggregate(highest=Max('order_number'))['highest'] or 0
+        OrderNumberCounter.objects.get_or_create(pk=COUNTER_ID, defaults={'last_number': highest})
+        last = _bump_counter(count)
+    return list(range(last - count + 1, last + 1))
+
+
+def _release(numbers):
+    with _lock:
+        _pool.extend(numbers)
+
+
+def next_order_number():
+    """The next order number for this worker"""
+    with _lock:
+        if _pool:
+            return _pool.popleft()
+
+    count = max(settings.ORDER_NUMBER_BLOCK_SIZE, 1)
+    if _uses_sequence():
+        number, *rest = _reserve_from_sequence(count)
+        _release(rest)
+    else:
+        number, *rest = _reserve_from_counter(count)
+        if rest:
+            transaction.on_commit(lambda: _release(rest))
+    return number
+
+
+def clear():
+    """Forget this worker's reserved numbers"""
+    with _lock:
+        _pool.clear()
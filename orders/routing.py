@@ -0,0 +1,167 @@
+"""
+Branch routing for new orders.
+
+Checkout used to hand every order to the first active branch. route_order()
+instead ranks the active branches for each order, best first by:
+
+1. whether the branch can make every item in the cart (products/availability.py);
+2. whether it is open right now (``opening_time``/``closing_time``, which may
+   span midnight);
+3. whether its queue is under ROUTING_MAX_QUEUE_DEPTH active orders;
+4. how closely its pincode matches the delivery pincode (longest common
+   prefix: same area, then same sorting district, then same region);
+5. the fewest active orders, then the lowest id.
+
+A branch failing a test is only used when no branch passes it, so an order
+is never refused for routing reasons.
+
+The active branches are held per process like the availability index and
+reloaded only when the catalog revision changes, which every Branch save or
+delete bumps (products/signals.py); like it, this needs the shared cache. Queue depths are counters in the shared
+cache, moved as orders are placed, progress and finish (orders/signals.py).
+An online order only joins its branch's queue once it is paid
+(``Order.awaiting_payment``), so abandoned payments never load a kitchen.
+A missing counter is recounted from the database, and counters expire after
+ROUTING_QUEUE_RESYNC seconds so drift from bulk ``update()`` calls heals on
+its own. A warm checkout therefore routes without any query.
+"""
+import copy
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from products.availability import unavailable_product_ids
+from products.cache import get_catalog_revision
+from products.models import Branch
+
+from .models import Order
+
+# Orders a kitchen still has to prepare or deliver
+ACTIVE_STATUSES = ('pending', 'confirmed', 'preparing', 'out_for_delivery')
+
+_lock = threading.Lock()
+
+# (revision, {branch_id: Branch}), swapped as a whole
+_table = (None, {})
+
+
+def _load():
+    return {branch.id: branch for branch in Branch.objects.filter(is_active=True).order_by('id')}
+
+
+def _branches():
+    global _table
+    revision = get_catalog_revision()
+    if _table[0] != revision:
+        with _lock:
+            # Another thread may have reloaded while we waited
+            if _table[0] != revision:
+                _table = (revision, _load())
+    return _table[1]
+
+
+def clear():
+    """Drop the loaded routing table; the next lookup reloads it"""
+    global _table
+    with _lock:
+        _table = (None, {})
+
+
+def active_branch(branch_id):
+    """The active branch with ``branch_id``, or None; raises ValueError for a malformed id"""
+    branch = _branches().get(int(branch_id))
+    # Callers attach it to an order, so never hand out the shared instance
+    return copy.copy(branch) if branch else None
+
+
+def is_open(branch, at):
+    """Whether ``branch`` takes orders at the time of day ``at``"""
+    opening, closing = branch.opening_time, branch.closing_time
+    if opening == closing:
+        return True
+    if opening < closing:
+        return opening <= at < closing
+    # Open past midnight
+    return at >= opening or at < closing
+
+
+def pincode_distance(branch_pincode, pincode):
+    """Digits of the six-digit pincode that do not match, counted from the left"""
+    if not pincode:
+        return 0
+    shared = 0
+    for ours, theirs in zip(branch_pincode.strip(), str(pincode).strip()):
+        if ours != theirs:
+            break
+        shared += 1
+    return 6 - min(shared, 6)
+
+
+def _queue_key(branch_id):
+    return f'orders:queue:{branch_id}'
+
+
+def queue_depths(branch_ids):
+    """Active orders per branch, recounting any branch whose counter is missing"""
+    keys = {_queue_key(branch_id): branch_id for branch_id in branch_ids}
+    cached = cache.get_many(keys)
+    depths = {keys[key]: max(depth, 0) for key, depth in cached.items()}
+
+    missing = [branch_id for branch_id in branch_ids if branch_id not in depths]
+    if missing:
+        counts = dict(
+            Order.objects.filter(branch_id__in=missing, status__in=ACTIVE_STATUSES, awaiting_payment=False)
+            .order_by().values_list('branch_id').annotate(Count('id'))
+        )
+        recounted = {branch_id: counts.get(branch_id, 0) for branch_id in missing}
+        cache.set_many(
+            {_queue_key(branch_id): depth for branch_id, depth in recounted.items()},
+            settings.ROUTING_QUEUE_RESYNC
+        )
+        depths.update(recounted)
+    return depths
+
+
+def adjust_queue(branch_id, delta):
+    """Move a branch's counter; a missing counter is left for the next recount"""
+    try:
+        cache.incr(_queue_key(branch_id), delta)
+    except ValueError:
+        pass
+
+
+def forget_queue(branch_id):
+    """Drop a branch's counter so the next lookup recounts it"""
+    cache.delete(_queue_key(branch_id))
+
+
+def rank(branches, product_ids, pincode=None, now=None):
+    """``branches`` best first for an order of ``product_ids`` delivered to ``pincode``"""
+    at = timezone.localtime(now).time()
+    depths = queue_depths([branch.id for branch in branches])
+    max_depth = settings.ROUTING_MAX_QUEUE_DEPTH
+
+    def key(branch):
+        depth = depths[branch.id]
+        return (
+            bool(unavailable_product_ids(branch.id, product_ids)),
+            not is_open(branch, at),
+            depth >= max_depth,
+            pincode_distance(branch.pincode, pincode),
+            depth,
+            branch.id,
+        )
+
+    return sorted(branches, key=key)
+
+
+def route_order(product_ids, pincode=None, now=None):
+    """The branch that should fulfil a new order, or None when no branch is active"""
+    branches = list(_branches().values())
+    if not branches:
+        return None
+    return copy.copy(rank(branches, product_ids, pincode, now)[0])
+
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from config.serializers import SparseFieldsetMixin
 from .models import Order, OrderItem
 
 
@@ -17,7 +18,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         )
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
@@ -37,7 +38,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'items'
         )
 
-class MyOrderListSerializer(serializers.ModelSerializer):
+class MyOrderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     total_items = serializers.SerializerMethodField()
     items = OrderItemSerializer(many=True, read_only=True)
     payment_method = serializers.SerializerMethodField()
@@ -75,7 +76,7 @@ class OrderItemDetailSerializer(serializers.ModelSerializer):
             'subtotal'
         )
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     payment_method = serializers.SerializerMethodField()
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Order
+from .routing import adjust_queue, forget_queue
+
+
+def order_saved(sender, instance, created, **kwargs):
+    """Move the order between branch queue counters once the save commits"""
+    before = None if created else instance.__dict__.get('_loaded_queue_branch_id', Ellipsis)
+    after = instance.queue_branch_id
+    instance._loaded_queue_branch_id = after
+
+    if before is Ellipsis:
+        # Not loaded from the database, so its previous queue is unknown: recount
+        if after:
+            transaction.on_commit(lambda: forget_queue(after))
+        return
+    if before != after:
+        if before:
+            transaction.on_commit(lambda: adjust_queue(before, -1))
+        if after:
+            transaction.on_commit(lambda: adjust_queue(after, 1))
+
+
+def order_deleted(sender, instance, **kwargs):
+    queue_branch_id = instance.queue_branch_id
+    if queue_branch_id:
+        transaction.on_commit(lambda: adjust_queue(queue_branch_id, -1))
+
+
+post_save.connect(order_saved, sender=Order, dispatch_uid='routing_order_save')
+post_delete.connect(order_deleted, sender=Order, dispatch_uid='routing_order_delete')
@@ -1,3 +1,574 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from coupons.models import Coupon
+from addresses.models import Address
+from payments import razorpay_utils
+from payments.razorpay_stub import RazorpayStubServer
+from products.models import Branch, BranchProduct, Category, Juice
+from users.models import User
+
+from . import numbering, routing
+from .email_utils import send_order_confirmation_email
+from .models import IdempotencyKey, Order, OrderNumberCounter
+
+
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class CheckoutQueryCountTests(TestCase):
+    """Checkout costs the same number of queries whatever the size of the cart"""
+
+    # savepoint, cart + coupon, items + juices, order number, order, order
+    # items, items read back, payment, clear items, clear coupon, release
+    QUERIES = 11
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='checkout@example.com', phone_number='9000000010', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Branch.objects.create(
+            name='Main', address='a', city='c', state='s', pincode='500001',
+            phone='1', email='main@example.com', opening_time='08:00', closing_time='22:00'
+        )
+        self.category = Category.objects.create(name='Fresh')
+        coupon = Coupon.objects.create(code='BULK5', discount_type='percentage', discount_value='5')
+        self.cart = Cart.objects.create(user=self.user, applied_coupon=coupon)
+
+    def fill_cart(self, lines):
+        juices = Juice.objects.bulk_create([
+            Juice(
+                category=self.category, name=f'Juice {n}', description='d',
+                price='40.00', image='juices/a.png'
+            )
+            for n in range(lines)
+        ])
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, juice=juice, quantity=2, price_at_added=juice.price)
+            for juice in juices
+        ])
+
+    def test_query_count_is_constant(self, send_email):
+        # Load the routing table and queue counters, as any earlier checkout would have
+        routing.route_order([])
+        for lines in (1, 10, 100):
+            with self.subTest(lines=lines):
+                self.fill_cart(lines)
+                with self.assertNumQueries(self.QUERIES):
+                    response = self.client.post(
+                        '/api/orders/checkout/', {'payment_method': 'cod'}, format='json'
+                    )
+                self.assertEqual(response.status_code, 201)
+                self.assertEqual(len(response.data['order']['items']), lines)
+                self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 0)
+                # The coupon is dropped on the first order; re-apply for the next size
+                self.cart.applied_coupon = Coupon.objects.get(code='BULK5')
+                self.cart.save()
+
+    def test_order_matches_cart(self, send_email):
+        self.fill_cart(3)
+        response = self.client.post('/api/orders/checkout/', {'payment_method': 'online'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(pk=response.data['order']['id'])
+        self.assertEqual(order.food_subtotal, Decimal('240.00'))
+        self.assertEqual(order.discount, Decimal('12.00'))
+        self.assertEqual(order.payment.amount, order.total_amount)
+        self.assertTrue(order.awaiting_payment)
+        self.assertEqual(
+            sorted(order.items.values_list('quantity', 'price_per_item')),
+            [(2, Decimal('40.00'))] * 3
+        )
+        # Online orders keep the cart until the payment is verified
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 3)
+
+    def test_broken_coupon_is_logged_and_dropped(self, send_email):
+        from cart.pricing import price_items
+
+        self.fill_cart(1)
+        with mock.patch(
+            'orders.checkout.price_items', side_effect=[ValueError('bad coupon'), price_items(self.cart.items.all())]
+        ), self.assertLogs('orders.checkout', 'ERROR') as logs:
+            response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().discount, Decimal('0.00'))
+        self.assertIn('bad coupon', logs.output[0])
+
+    def test_confirmation_email_is_queued(self, send_email):
+        from users.models import OutboundEmail
+
+        self.fill_cart(1)
+        send_email.side_effect = send_order_confirmation_email
+        with mock.patch('users.email_api.send_email_via_brevo_api') as brevo:
+            response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        brevo.assert_not_called()
+        email = OutboundEmail.objects.get(kind='order_confirmation')
+        self.assertIn(f"#{response.data['order']['order_number']}", email.subject)
+
+    def test_empty_cart_is_rejected(self, send_email):
+        response = self.client.post('/api/orders/checkout/', {'payment_method': 'cod'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderNumberTests(TestCase):
+    """Order numbers come from the allocator, not from the highest existing order"""
+
+    def setUp(self):
+        numbering.clear()
+        self.addCleanup(numbering.clear)
+        self.user = User.objects.create_user(
+            email='numbers@example.com', phone_number='9000000011', password='pass'
+        )
+
+    def place_order(self):
+        return Order.objects.create(user=self.user, food_subtotal='50.00')
+
+    def test_numbers_are_sequential(self):
+        numbers = [self.place_order().order_number for _ in range(3)]
+        self.assertEqual(numbers, [numbers[0], numbers[0] + 1, numbers[0] + 2])
+
+    def test_allocation_is_one_query(self):
+        with self.assertNumQueries(1):
+            numbering.next_order_number()
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=5)
+    def test_block_is_served_from_memory(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = numbering.next_order_number()
+        with self.assertNumQueries(0):
+            rest = [numbering.next_order_number() for _ in range(4)]
+        self.assertEqual(rest, list(range(first + 1, first + 5)))
+        with self.assertNumQueries(1):
+            self.assertEqual(numbering.next_order_number(), first + 5)
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=5)
+    def test_block_is_dropped_on_rollback(self):
+        # Not committed: the counter rolls back, so the rest of the block must not be used
+        first = numbering.next_order_number()
+        self.assertEqual(len(numbering._pool), 0)
+        self.assertGreater(numbering.next_order_number(), first)
+
+    def test_missing_counter_continues_after_highest_order(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('PostgreSQL numbers orders from a sequence')
+        self.place_order()
+        Order.objects.filter(user=self.user).update(order_number=41)
+        OrderNumberCounter.objects.all().delete()
+        self.assertEqual(self.place_order().order_number, 42)
+
+
+class OrderNumberConcurrencyTests(TransactionTestCase):
+    """Concurrent workers never share a number and leave no gaps but unused block tails"""
+
+    THREADS = 8
+    PER_THREAD = 25
+
+    def setUp(self):
+        numbering.clear()
+        self.addCleanup(numbering.clear)
+
+    def allocate(self):
+        # SQLite's shared in-memory test database fails at once on a locked
+        # table instead of waiting like a busy timeout; a failed UPDATE
+        # changed nothing, so waiting and trying again is safe
+        for _ in range(1000):
+            try:
+                return numbering.next_order_number()
+            except OperationalError:
+                time.sleep(0.001)
+        return numbering.next_order_number()
+
+    def allocate_concurrently(self):
+        start = threading.Barrier(self.THREADS)
+        allocated, errors = [], []
+
+        def worker():
+            try:
+                start.wait()
+                for _ in range(self.PER_THREAD):
+                    allocated.append(self.allocate())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return allocated
+
+    def assertUniqueWithoutGaps(self, allocated):
+        # Every reserved number was either handed out once or is still in the pool
+        reserved = allocated + list(numbering._pool)
+        self.assertEqual(len(reserved), len(set(reserved)))
+        self.assertEqual(sorted(reserved), list(range(min(reserved), max(reserved) + 1)))
+
+    def test_unique_numbers(self):
+        allocated = self.allocate_concurrently()
+        self.assertEqual(len(allocated), self.THREADS * self.PER_THREAD)
+        self.assertUniqueWithoutGaps(allocated)
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=7)
+    def test_unique_numbers_with_blocks(self):
+        allocated = self.allocate_concurrently()
+        self.assertEqual(len(allocated), self.THREADS * self.PER_THREAD)
+        self.assertUniqueWithoutGaps(allocated)
+
+
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class CheckoutIdempotencyTests(TestCase):
+    """A repeated Idempotency-Key replays the first checkout instead of placing another order"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='retry@example.com', phone_number='9000000012', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Branch.objects.create(
+            name='Main', address='a', city='c', state='s', pincode='500001',
+            phone='1', email='main@example.com', opening_time='08:00', closing_time='22:00'
+        )
+        juice = Juice.objects.create(
+            category=Category.objects.create(name='Fresh'), name='Orange', description='d',
+            price='40.00', image='juices/a.png'
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, juice=juice, quantity=3, price_at_added=juice.price)
+
+    def checkout(self, key='retry-1', method='cod'):
+        return self.client.post(
+            '/api/orders/checkout/', {'payment_method': method}, format='json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_duplicate_replays_first_response(self, send_email):
+        first = self.checkout()
+        self.assertEqual(first.status_code, 201)
+
+        with self.assertNumQueries(0):
+            again = self.checkout()
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        send_email.assert_called_once()
+
+    def test_replay_from_database_after_cache_loss(self, send_email):
+        first = self.checkout()
+        cache.clear()
+        again = self.checkout()
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self, send_email):
+        self.checkout()
+        self.assertEqual(self.checkout(method='online').status_code, 422)
+
+    def test_keys_are_per_user(self, send_email):
+        self.checkout()
+        other = User.objects.create_user(
+            email='other@example.com', phone_number='9000000013', password='pass'
+        )
+        self.client.force_authenticate(other)
+        # Same key, but this user has no cart: their request really runs
+        self.assertEqual(self.checkout().status_code, 404)
+
+    def test_in_flight_duplicate_conflicts(self, send_email):
+        # Leave the first request's claim unfinished, as if it were still running
+        with mock.patch('orders.idempotency._store'), mock.patch('orders.views.remember_response'):
+            self.checkout()
+        response = self.checkout()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_unsettled_key_is_not_run_unclaimed(self, send_email):
+        # Every INSERT collides with a claim that is gone again by the time it is read
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=IntegrityError) as create:
+            response = self.checkout()
+        self.assertEqual(create.call_count, 3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Order.objects.exists())
+
+    def test_killed_worker_releases_its_claim(self, send_email):
+        with mock.patch('orders.views.create_order', side_effect=SystemExit(1)):
+            with self.assertRaises(SystemExit):
+                self.checkout()
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.checkout().status_code, 201)
+
+    def test_abandoned_claim_is_taken_over_after_lease(self, send_email):
+        # Killed before the checkout committed, without a chance to release the key
+        with mock.patch('orders.views.create_order', side_effect=SystemExit(1)), \
+                mock.patch('orders.idempotency._release'):
+            with self.assertRaises(SystemExit):
+                self.checkout()
+        self.assertEqual(self.checkout().status_code, 409)
+
+        IdempotencyKey.objects.update(claimed_at=timezone.now() - timedelta(seconds=61))
+        response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.checkout().json(), response.json())
+
+    def test_committed_checkout_replays_without_final_store(self, send_email):
+        # Killed after the checkout committed but before the decorator stored the response
+        with mock.patch('orders.idempotency._store'):
+            first = self.checkout()
+        again = self.checkout()
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again['Idempotent-Replayed'], 'true')
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_keys_are_purged(self, send_email):
+        self.checkout()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys', stdout=mock.Mock())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+def _branch(name, pincode='500001', opening='08:00', closing='22:00'):
+    return Branch.objects.create(
+        name=name, address='a', city='c', state='s', pincode=pincode, phone='1',
+        email=f'{name.lower()}@example.com', opening_time=opening, closing_time=closing
+    )
+
+
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class OrderRoutingTests(TestCase):
+    """Orders go to the nearest open branch that stocks the cart and has room"""
+
+    def setUp(self):
+        cache.clear()
+        routing.clear()
+        self.user = User.objects.create_user(
+            email='routing@example.com', phone_number='9000000040', password='pass'
+        )
+        category = Category.objects.create(name='Fresh')
+        self.juice = Juice.objects.create(
+            category=category, name='Orange', description='d', price='40.00', image='juices/a.png'
+        )
+        self.noon = timezone.make_aware(datetime(2026, 1, 1, 12, 0))
+
+    def stock(self, *branches):
+        for branch in branches:
+            BranchProduct.objects.create(branch=branch, product=self.juice)
+
+    def order(self, branch, status='pending'):
+        return Order.objects.create(user=self.user, branch=branch, food_subtotal='40.00', status=status)
+
+    def test_prefers_branch_that_stocks_the_cart(self, send_email):
+        first, second = _branch('First'), _branch('Second')
+        self.stock(second)
+        self.assertEqual(routing.route_order([self.juice.id], now=self.noon), second)
+
+    def test_prefers_open_branch(self, send_email):
+        day = _branch('Day', opening='08:00', closing='20:00')
+        night = _branch('Night', opening='20:00', closing='04:00')
+        self.stock(day, night)
+        self.assertEqual(routing.route_order([self.juice.id], now=self.noon), day)
+        self.assertEqual(routing.route_order([self.juice.id], now=self.noon.replace(hour=1)), night)
+        # Nothing open: still placed, for the branch to make when it opens
+        self.assertIsNotNone(routing.route_order([self.juice.id], now=self.noon.replace(hour=5)))
+
+    def test_prefers_nearest_pincode(self, send_email):
+        far, district, area = _branch('Far', '400001'), _branch('District', '500072'), _branch('Area', '500081')
+        self.stock(far, district, area)
+        self.assertEqual(routing.route_order([self.juice.id], '500081', now=self.noon), area)
+        self.assertEqual(routing.route_order([self.juice.id], '500090', now=self.noon), district)
+        self.assertEqual(routing.route_order([self.juice.id], '400070', now=self.noon), far)
+
+    @override_settings(ROUTING_MAX_QUEUE_DEPTH=2)
+    def test_queue_depth_spreads_orders(self, send_email):
+        near, other = _branch('Near', '500081'), _branch('Other', '500072')
+        self.stock(near, other)
+        route = lambda: routing.route_order([self.juice.id], '500081', now=self.noon)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            busy = [self.order(near), self.order(near)]
+        self.assertEqual(routing.queue_depths([near.id, other.id]), {near.id: 2, other.id: 0})
+        self.assertEqual(route(), other)
+
+        # Delivering an order frees its slot
+        with self.captureOnCommitCallbacks(execute=True):
+            delivered = Order.objects.get(pk=busy[0].pk)
+            delivered.status = 'delivered'
+            delivered.save()
+        self.assertEqual(routing.queue_depths([near.id]), {near.id: 1})
+        self.assertEqual(route(), near)
+
+    def test_lost_counters_are_recounted(self, send_email):
+        branch = _branch('Main')
+        self.order(branch)
+        self.order(branch, status='delivered')
+        cache.clear()
+        self.assertEqual(routing.queue_depths([branch.id]), {branch.id: 1})
+
+    def test_unpaid_online_orders_stay_out_of_the_queue(self, send_email):
+        from payments.models import Payment
+        from payments.transitions import Transitions
+
+        branch = _branch('Main')
+        routing.queue_depths([branch.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            paid, abandoned = [
+                Order.objects.create(
+                    user=self.user, branch=branch, food_subtotal='40.00', total_amount='40.00',
+                    awaiting_payment=True
+                )
+                for _ in range(2)
+            ]
+            payments = [
+                Payment.objects.create(order=order, method='online', amount='40.00', razorpay_order_id=f'order_{n}')
+                for n, order in enumerate((paid, abandoned))
+            ]
+        self.assertEqual(routing.queue_depths([branch.id]), {branch.id: 0})
+
+        # Paid: confirmed and queued; the abandoned one only has its payment failed
+        with self.captureOnCommitCallbacks(execute=True):
+            transitions = Transitions()
+            transitions.complete(Payment.objects.select_related('order').get(pk=payments[0].pk), 'pay_1')
+            transitions.fail(Payment.objects.select_related('order').get(pk=payments[1].pk))
+            transitions.save()
+        self.assertEqual(routing.queue_depths([branch.id]), {branch.id: 1})
+        cache.clear()
+        self.assertEqual(routing.queue_depths([branch.id]), {branch.id: 1})
+        self.assertEqual(
+            Order.objects.get(pk=paid.pk).queue_branch_id, branch.id
+        )
+        self.assertIsNone(Order.objects.get(pk=abandoned.pk).queue_branch_id)
+
+    def test_follows_branch_changes(self, send_email):
+        first, second = _branch('First'), _branch('Second')
+        self.assertEqual(routing.route_order([], now=self.noon), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            first.is_active = False
+            first.save()
+        self.assertEqual(routing.route_order([], now=self.noon), second)
+        self.assertIsNone(routing.active_branch(first.id))
+
+    def test_checkout_routes_to_address(self, send_email):
+        _branch('Far', '400001')
+        near = _branch('Near', '500081')
+        address = Address.objects.create(
+            user=self.user, label='Home', full_name='R', phone_number='1', address_line1='a',
+            city='c', state='s', pincode='500081'
+        )
+        CartItem.objects.create(
+            cart=Cart.objects.create(user=self.user), juice=self.juice, quantity=1, price_at_added='40.00'
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(
+            '/api/orders/checkout/', {'payment_method': 'cod', 'address_id': address.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.get().branch, near)
+
+
+@mock.patch('orders.views.send_order_confirmation_email', return_value=True)
+class OnlineCheckoutTests(TestCase):
+    """An online checkout can create the Razorpay order in the same request"""
+
+    # The COD checkout without clearing the cart, plus recording the gateway order id
+    QUERIES = CheckoutQueryCountTests.QUERIES - 2 + 1
+
+    def setUp(self):
+        cache.clear()
+        self.stub = RazorpayStubServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings = override_settings(RAZORPAY_API_URL=self.stub.url, RAZORPAY_READ_TIMEOUT=1)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        razorpay_utils.reset_razorpay_client()
+        self.addCleanup(razorpay_utils.reset_razorpay_client)
+
+        self.user = User.objects.create_user(
+            email='online@example.com', phone_number='9000000014', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        _branch('Main')
+        juice = Juice.objects.create(
+            category=Category.objects.create(name='Fresh'), name='Orange', description='d',
+            price='40.00', image='juices/a.png'
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, juice=juice, quantity=3, price_at_added=juice.price)
+        routing.route_order([])
+
+    def checkout(self, **headers):
+        return self.client.post(
+            '/api/orders/checkout/', {'payment_method': 'online', 'create_gateway_order': True},
+            format='json', **headers
+        )
+
+    def test_gateway_order_comes_back_with_the_order(self, send_email):
+        with self.assertNumQueries(self.QUERIES):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+
+        order = Order.objects.get(pk=response.data['order']['id'])
+        gateway = response.data['razorpay']
+        self.assertEqual(order.payment.razorpay_order_id, gateway['razorpay_order_id'])
+        self.assertEqual(gateway['amount'], int(order.total_amount * 100))
+        self.assertEqual(gateway['currency'], 'INR')
+        self.assertEqual([(method, path) for method, path, _ in self.stub.requests], [('POST', '/v1/orders')])
+        # The cart stays until the payment is verified
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 1)
+
+    def test_gateway_failure_still_places_the_order(self, send_email):
+        self.stub.fail_status = 502
+        with self.assertLogs('orders.checkout', 'ERROR'):
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['razorpay'])
+        order = Order.objects.get(pk=response.data['order']['id'])
+        self.assertIsNone(order.payment.razorpay_order_id)
+
+        # What the client falls back to
+        self.stub.fail_status = None
+        fallback = self.client.post(
+            '/api/payments/razorpay/create-order/', {'order_id': order.id}, format='json'
+        )
+        self.assertEqual(fallback.status_code, 200)
+        order.payment.refresh_from_db()
+        self.assertEqual(order.payment.razorpay_order_id, fallback.data['razorpay_order_id'])
+
+    def test_replay_returns_the_same_gateway_order(self, send_email):
+        first = self.checkout(HTTP_IDEMPOTENCY_KEY='online-1')
+        again = self.checkout(HTTP_IDEMPOTENCY_KEY='online-1')
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cod_never_calls_the_gateway(self, send_email):
+        response = self.client.post(
+            '/api/orders/checkout/', {'payment_method': 'cod', 'create_gateway_order': True}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('razorpay', response.data)
+        self.assertEqual(self.stub.requests, [])
@@ -1,25 +1,63 @@
+import logging
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from django.conf import settings
 from django.db import transaction
 from rest_framework.generics import RetrieveAPIView
-from decimal import Decimal
 
-from cart.models import Cart, CartItem
-from .models import Order, OrderItem
+from cart.mutations import clear_cart
+from .models import Order
 from .serializers import OrderSerializer, MyOrderListSerializer, OrderDetailSerializer
 from .email_utils import send_order_confirmation_email
+from .idempotency import idempotent, remember_response
+from .checkout import (
+    attach_gateway_order, create_items, create_order, create_payment, load_cart, price_cart_items
+)
+from .routing import active_branch, route_order
+from payments.razorpay_utils import start_razorpay_order
+from products.availability import unavailable_product_ids
+
+logger = logging.getLogger(__name__)
 
 class CheckoutAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
+    # Set by place_order when an online checkout also creates the Razorpay order
+    gateway_order = None
+    payment = None
+
+    @idempotent
     def post(self, request):
-        from payments.models import Payment
-        
+        response = self.place_order(request)
+
+        # Committed; now collect the Razorpay order started during the writes.
+        # Without it the client falls back to /payments/razorpay/create-order/
+        if self.gateway_order is None:
+            return response
+        if response.status_code != status.HTTP_201_CREATED:
+            logger.warning(
+                f"Checkout for user {request.user.id} failed with {response.status_code} "
+                f"after starting a Razorpay order; it is left unused"
+            )
+            return response
+
+        razorpay_order = attach_gateway_order(self.payment, self.gateway_order)
+        response.data['razorpay'] = razorpay_order and {
+            "razorpay_order_id": razorpay_order['id'],
+            "amount": razorpay_order['amount'],
+            "currency": razorpay_order['currency'],
+            "key_id": settings.RAZORPAY_KEY_ID
+        }
+        return response
+
+    @transaction.atomic
+    def place_order(self, request):
         user = request.user
         payment_method = request.data.get('payment_method', 'cod')
+        create_gateway_order = str(request.data.get('create_gateway_order', '')).lower() in ('1', 'true')
 
         if payment_method not in ['cod', 'online']:
             return Response(
@@ -27,45 +65,51 @@ class CheckoutAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            cart = Cart.objects.get(user=user)
-        except Cart.DoesNotExist:
+        cart = load_cart(user)
+        if cart is None:
             return Response(
                 {"detail": "Cart not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cart_items = CartItem.objects.filter(cart=cart)
+        # Evaluated once: pricing, availability and the order lines share it
+        cart_items = list(cart.items.all())
 
-        if not cart_items.exists():
+        if not cart_items:
             return Response(
                 {"detail": "Cart is empty"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Calculate subtotal using price_at_added (cart prices)
-        food_subtotal = sum(
-            item.price_at_added * item.quantity for item in cart_items
-        )
-        
-        # Calculate coupon discount if applied
-        discount = 0
-        if cart.applied_coupon is not None:
-            try:
-                discount = cart.applied_coupon.calculate_discount(food_subtotal)
-            except Exception as e:
-                print(f"[ERROR] Coupon discount calculation failed: {str(e)}")
-                discount = 0
+        # Price the cart exactly as the cart page showed it (cart prices, coupon, fees)
+        pricing = price_cart_items(cart, cart_items)
 
-        # Assign order to first active branch
-        from products.models import Branch
+        # The customer's branch if given, else the best branch for this cart and address
+        branch_id = request.data.get('branch_id')
+        address_id = request.data.get('address_id')
         try:
-            branch = Branch.objects.filter(is_active=True).first()
+            if branch_id:
+                branch = active_branch(branch_id)
+            else:
+                pincode = None
+                if address_id:
+                    pincode = user.addresses.filter(id=address_id).values_list('pincode', flat=True).first()
+                branch = route_order([item.juice_id for item in cart_items], pincode)
+            if not branch and branch_id:
+                return Response(
+                    {"detail": "Branch not found"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             if not branch:
                 return Response(
                     {"detail": "No active branch found. Please contact administrator."},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+        except (ValueError, TypeError):
+            return Response(
+                {"detail": "Invalid branch_id or address_id"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             print(f"[ERROR] Branch fetch failed: {str(e)}")
             return Response(
@@ -73,20 +117,28 @@ class CheckoutAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # Calculate delivery fee (free if subtotal >= 99, otherwise 20)
-        # This matches the cart serializer logic to ensure payment amount consistency
-        delivery_fee_base = Decimal('0.00') if food_subtotal >= Decimal('99.00') else Decimal('20.00')
+        # A branch chosen by the customer must be able to make every item
+        if branch_id:
+            unavailable = unavailable_product_ids(branch.id, [item.juice_id for item in cart_items])
+            if unavailable:
+                return Response(
+                    {
+                        "detail": "Some items in your cart are not available at this branch",
+                        "unavailable_items": [
+                            {"juice_id": item.juice_id, "juice_name": item.juice.name}
+                            for item in cart_items if item.juice_id in unavailable
+                        ]
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        # Start the Razorpay order now so it overlaps the writes below
+        if payment_method == 'online' and create_gateway_order:
+            self.gateway_order = start_razorpay_order(pricing.grand_total)
 
         # Create order
         try:
-            order = Order.objects.create(
-                user=user,
-                branch=branch,
-                food_subtotal=food_subtotal,
-                delivery_fee_base=delivery_fee_base,
-                platform_fee=10,
-                discount=discount
-            )
+            order = create_order(user, branch, pricing, awaiting_payment=payment_method == 'online')
             print(f"[SUCCESS] Order created: ID={order.id}, Branch={branch.name}")
         except Exception as e:
             print(f"[ERROR] Order creation failed: {str(e)}")
@@ -99,14 +151,8 @@ class CheckoutAPIView(APIView):
 
         # Create order items
         try:
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    juice=item.juice,
-                    quantity=item.quantity,
-                    price_per_item=item.price_at_added
-                )
-            print(f"[SUCCESS] Created {cart_items.count()} order items")
+            create_items(order, cart_items)
+            print(f"[SUCCESS] Created {len(cart_items)} order items")
         except Exception as e:
             print(f"[ERROR] Order items creation failed: {str(e)}")
             import traceback
@@ -116,28 +162,9 @@ class CheckoutAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        # Calculate totals
-        try:
-            order.calculate_totals()
-            order.save()
-            print(f"[SUCCESS] Order totals calculated: Rs.{order.total_amount}")
-        except Exception as e:
-            print(f"[ERROR] Total calculation failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return Response(
-                {"detail": f"Total calculation error: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
         # Create payment
         try:
-            Payment.objects.create(
-                order=order,
-                method=payment_method,
-                amount=order.total_amount,
-                status='pending'
-            )
+            self.payment = create_payment(order, payment_method)
             print(f"[SUCCESS] Payment created: {payment_method}")
         except Exception as e:
             print(f"[ERROR] Payment creation failed: {str(e)}")
@@ -152,27 +179,22 @@ class CheckoutAPIView(APIView):
         # For online payments, cart will be cleared after successful payment verification
         if payment_method == 'cod':
             try:
-                cart_items.delete()
-                cart.applied_coupon = None
-                cart.save()
+                clear_cart(cart)
                 print(f"[SUCCESS] Cart cleared for COD order")
             except Exception as e:
                 print(f"[WARNING] Cart clearing failed: {str(e)}")
 
-        # Send order confirmation email (non-critical)
+        # Queue the order confirmation email; it is sent after the order commits
         try:
-            email_sent = send_order_confirmation_email(order, user)
-            if email_sent:
-                print(f"[SUCCESS] Order confirmation email sent to {user.email}")
-            else:
-                print(f"[WARNING] Email sending returned False for order #{order.id}")
+            send_order_confirmation_email(order, user)
+            print(f"[SUCCESS] Order confirmation email queued for {user.email}")
         except Exception as e:
             print(f"[WARNING] Email failed for order #{order.id}: {str(e)}")
 
         # Serialize and return
         try:
-            serializer = OrderSerializer(order)
-            return Response(
+            serializer = OrderSerializer(order, context={'request': request})
+            response = Response(
                 {
                     "message": "Order placed successfully",
                     "order": serializer.data,
@@ -187,6 +209,10 @@ class CheckoutAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        # Committed with the order: a retry replays it even if this worker dies before answering
+        remember_response(request, response)
+        return response
+
 class MyOrdersAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -212,7 +238,14 @@ class MyOrdersAPIView(APIView):
         elif status_filter == 'cancelled':
             orders = orders.filter(status='cancelled')
 
-        serializer = MyOrderListSerializer(orders, many=True)
+        # Only join what the requested fieldset will actually render
+        fields = MyOrderListSerializer.requested_field_names(request)
+        if 'items' in fields or 'total_items' in fields:
+            orders = orders.prefetch_related('items__juice')
+        if 'payment_method' in fields:
+            orders = orders.select_related('payment')
+
+        serializer = MyOrderListSerializer(orders, many=True, context={'request': request})
 
         return Response({
             "count": orders.count(),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, WebhookEvent
 
 
 @admin.register(Payment)
@@ -21,3 +21,17 @@ class PaymentAdmin(admin.ModelAdmin):
         updated = queryset.filter(status='pending').update(status='failed')
         self.message_user(request, f'{updated} payment(s) marked as failed.')
     mark_as_failed.short_description = 'Mark selected as Failed'
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event', 'event_id', 'outcome', 'received_at', 'processed_at')
+    list_filter = ('event', 'outcome')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event', 'payload', 'received_at', 'processed_at', 'outcome', 'error')
+    actions = ['process_again']
+
+    def process_again(self, request, queryset):
+        updated = queryset.update(processed_at=None, outcome='', error='')
+        self.message_user(request, f'{updated} webhook event(s) queued for processing.')
+    process_again.short_description = 'Process selected events again'
@@ -0,0 +1,28 @@
+"""
+Payment gateway interface.
+
+Code that asks the gateway about payments goes through get_gateway(), which
+builds the class named by the PAYMENT_GATEWAY setting, so tests and
+benchmarks can swap in a local fake.
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class PaymentGateway:
+    """What the payment jobs need from a gateway"""
+
+    def order_payments(self, gateway_order_id):
+        """Payment attempts on a gateway order, as dicts with at least ``id`` and ``status``"""
+        raise NotImplementedError
+
+
+class RazorpayGateway(PaymentGateway):
+    def order_payments(self, gateway_order_id):
+        from .razorpay_utils import fetch_order_payments
+
+        return fetch_order_payments(gateway_order_id)
+
+
+def get_gateway():
+    return import_string(settings.PAYMENT_GATEWAY)()
@@ -0,0 +1,53 @@
+import select
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from payments.webhooks import CHANNEL, drain
+
+
+class Command(BaseCommand):
+    help = 'Apply stored Razorpay webhook events (runs until stopped; see payments/webhooks.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Apply everything stored, then exit')
+        parser.add_argument('--batch-size', type=int, help='Events applied per transaction (WEBHOOK_WORKER_BATCH_SIZE)')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Seconds between inbox checks when idle (WEBHOOK_WORKER_POLL_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        poll_interval = options['poll_interval'] or settings.WEBHOOK_WORKER_POLL_INTERVAL
+
+        if options['once']:
+            processed = drain(batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} webhook events'))
+            return
+
+        self.stdout.write(f'Webhook worker started (batch {batch_size or settings.WEBHOOK_WORKER_BATCH_SIZE})')
+        try:
+            while True:
+                processed = drain(batch_size)
+                if processed:
+                    self.stdout.write(f'Processed {processed} webhook events')
+                self._wait(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Webhook worker stopped')
+
+    def _wait(self, timeout):
+        """Sleep until a webhook is stored (PostgreSQL NOTIFY) or ``timeout`` passes"""
+        if connection.vendor != 'postgresql':
+            time.sleep(timeout)
+            return
+
+        # LISTEN is idempotent; repeating it survives a reconnect
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        raw = connection.connection
+        if select.select([raw], [], [], timeout)[0]:
+            raw.poll()
+            raw.notifies.clear()
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from payments.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Settle stale pending online payments by asking the payment gateway what happened '
+        '(see payments/reconcile.py). Safe to run repeatedly, e.g. from a scheduler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-after', type=int,
+            help='Only payments pending for longer than this many seconds (RECONCILE_STALE_AFTER)'
+        )
+        parser.add_argument('--batch-size', type=int, help='Payments settled per transaction (RECONCILE_BATCH_SIZE)')
+        parser.add_argument('--concurrency', type=int, help='Parallel gateway lookups (RECONCILE_CONCURRENCY)')
+        parser.add_argument('--limit', type=int, help='Stop after this many payments')
+
+    def handle(self, *args, **options):
+        stats = reconcile(
+            stale_after=options['stale_after'],
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            limit=options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {stats.get('scanned', 0)} payments in {stats['seconds']:.2f}s: "
+            f"{stats.get('completed', 0)} completed, {stats.get('failed', 0)} failed, "
+            f"{stats.get('refunded', 0)} refunded, {stats.get('unchanged', 0)} unchanged, "
+            f"{stats.get('gateway_errors', 0)} gateway errors"
+        ))
+        self.stdout.write(
+            f"{stats['rows_per_second']:.1f} rows/s, {stats.get('gateway_calls', 0)} gateway calls "
+            f"at {stats['gateway_calls_per_second']:.1f} calls/s"
+        )
@@ -53,3 +53,31 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment #{self.id} - Order #{self.order.id} - {self.method} - {self.status}"
+
+
+class WebhookEvent(models.Model):
+    """
+    A Razorpay webhook delivery, stored as received and applied later by
+    ``manage.py process_webhooks``. One row per Razorpay event id, so
+    redeliveries are dropped at insert. See payments/webhooks.py.
+    """
+    OUTCOME_CHOICES = (
+        ('applied', 'Applied'),
+        ('ignored', 'Ignored'),
+        ('unmatched', 'No matching payment'),
+        ('failed', 'Failed'),
+    )
+
+    event_id = models.CharField(max_length=100, unique=True, help_text="X-Razorpay-Event-Id")
+    event = models.CharField(max_length=50, help_text="Event type, e.g. payment.captured")
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'received_at'])]
+
+    def __str__(self):
+        return f"{self.event} {self.event_id} ({self.outcome or 'pending'})"
@@ -0,0 +1,144 @@
+"""
+Local stand-in for the Razorpay orders API.
+
+Serves ``POST /v1/orders`` and ``GET /v1/orders/<id>/payments`` on
+127.0.0.1, optionally after a delay or with a forced error status, so
+timeouts, the circuit breaker and tail latency can be exercised without
+network access or keys:
+
+    with RazorpayStubServer(latency=0.05) as stub:
+        settings.RAZORPAY_API_URL = stub.url
+        ...
+    stub.latency = 2          # every later response is slow
+    stub.fail_status = 502    # every later response is an error
+    stub.payments['order_x'] = [{'id': 'pay_1', 'status': 'captured'}]
+    stub.requests, stub.connections
+
+Nothing is charged anywhere.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive; without TCP_NODELAY
+    # the separate header and body writes stall on delayed ACKs when reused
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        with self.server.lock:
+            self.server.requests.append((method, self.path, body))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if self.server.fail_status:
+            status, reply = self.server.fail_status, {
+                'error': {'code': 'SERVER_ERROR', 'description': 'Stub failure'}
+            }
+        elif self.headers.get('Authorization') is None:
+            status, reply = 401, {
+                'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Authentication failed'}
+            }
+        elif method == 'POST' and parts == ['v1', 'orders']:
+            status, reply = 200, {
+                'id': f'order_{uuid.uuid4().hex[:14]}', 'entity': 'order', 'amount': body.get('amount'),
+                'currency': body.get('currency', 'INR'), 'status': 'created', 'notes': body.get('notes', {})
+            }
+        elif method == 'GET' and len(parts) == 4 and parts[:2] == ['v1', 'orders'] and parts[3] == 'payments':
+            items = self.server.payments.get(parts[2], [])
+            status, reply = 200, {'entity': 'collection', 'count': len(items), 'items': items}
+        else:
+            status, reply = 400, {
+                'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The requested URL was not found on the server.'}
+            }
+
+        payload = json.dumps(reply).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and hung up while we slept
+            self.close_connection = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RazorpayStubServer:
+    """Runs the stub on a free local port in a background thread"""
+
+    def __init__(self, latency=0.0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.fail_status = None
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.connections = 0
+        self.server.payments = {}
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def latency(self):
+        return self.server.latency
+
+    @latency.setter
+    def latency(self, seconds):
+        self.server.latency = seconds
+
+    @property
+    def fail_status(self):
+        return self.server.fail_status
+
+    @fail_status.setter
+    def fail_status(self, status):
+        self.server.fail_status = status
+
+    @property
+    def payments(self):
+        """Gateway order id -> payment attempts returned for it"""
+        return self.server.payments
+
+    @property
+    def requests(self):
+        """(method, path, JSON body) received so far"""
+        return self.server.requests
+
+    @property
+    def connections(self):
+        """TCP connections accepted so far"""
+        return self.server.connections
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,13 +1,213 @@
+"""
+Razorpay API access.
+
+The client is built on first use, not at import, so processes that never
+take a payment never pay for it. It is shared by the whole process:
+
+- one ``requests.Session`` with a pool of RAZORPAY_POOL_SIZE connections,
+  kept alive between calls and threads;
+- every request gets (RAZORPAY_CONNECT_TIMEOUT, RAZORPAY_READ_TIMEOUT), so
+  a stalled gateway can no longer hold a web worker indefinitely;
+- a circuit breaker. After RAZORPAY_BREAKER_THRESHOLD consecutive gateway
+  failures (timeouts, connection errors, 5xx) calls fail at once with
+  GatewayUnavailable for RAZORPAY_BREAKER_RESET seconds. Then one call is
+  let through to test the gateway, and it closes the breaker if it works.
+
+Every call's latency is recorded; gateway_stats() summarises the recent
+ones per call and slow or failed calls are logged.
+
+start_razorpay_order() makes the create-order call on a shared pool of
+RAZORPAY_POOL_SIZE threads and returns a Future, so checkout can write the
+order while Razorpay answers. Those threads only make HTTP calls and never
+touch the database.
+
+payments/razorpay_stub.py serves the same endpoints locally for tests.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 import razorpay
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Gateway responses that say nothing about our request, only about the gateway
+GATEWAY_ERRORS = (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError)
+
+# Latency samples kept per call name
+STATS_WINDOW = 1000
+
+
+class GatewayUnavailable(Exception):
+    """Raised instead of calling Razorpay while the circuit breaker is open"""
+
+
+class _TimeoutSession(requests.Session):
+    """A session that gives every request a timeout unless the caller set one"""
+
+    def __init__(self, timeout, pool_size):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(*args, **kwargs)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker; while open, one trial call is allowed per ``reset_after`` seconds"""
+
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                # Half-open: this caller probes, the rest keep failing fast until it reports back
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.error(f"Razorpay circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+_lock = threading.Lock()
+_client = None
+_breaker = None
+_executor = None
+_latencies = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+_errors = defaultdict(int)
+
+
+def get_razorpay_client():
+    """The process-wide Razorpay client, created on first use"""
+    global _client, _breaker
+    if _client is None:
+        with _lock:
+            if _client is None:
+                session = _TimeoutSession(
+                    (settings.RAZORPAY_CONNECT_TIMEOUT, settings.RAZORPAY_READ_TIMEOUT),
+                    settings.RAZORPAY_POOL_SIZE
+                )
+                _breaker = CircuitBreaker(settings.RAZORPAY_BREAKER_THRESHOLD, settings.RAZORPAY_BREAKER_RESET)
+                _client = razorpay.Client(
+                    session=session,
+                    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+                    base_url=settings.RAZORPAY_API_URL
+                )
+    return _client
 
-razorpay_client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+
+def get_breaker():
+    get_razorpay_client()
+    return _breaker
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.RAZORPAY_POOL_SIZE, thread_name_prefix='razorpay'
+                )
+    return _executor
+
+
+def reset_razorpay_client():
+    """Drop the shared client, breaker, threads and stats; the next call rebuilds them from settings"""
+    global _client, _breaker, _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        if _client is not None:
+            _client.session.close()
+        _client = None
+        _breaker = None
+        _executor = None
+        _latencies.clear()
+        _errors.clear()
+
+
+def call_gateway(name, func, *args, **kwargs):
+    """Run one Razorpay API call through the circuit breaker, recording its latency"""
+    breaker = get_breaker()
+    if not breaker.allow():
+        _errors[name] += 1
+        raise GatewayUnavailable(f"Razorpay is unavailable, not calling {name}")
+
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except GATEWAY_ERRORS as e:
+        breaker.failure()
+        _errors[name] += 1
+        logger.warning(f"Razorpay {name} failed after {(time.perf_counter() - start) * 1000:.0f} ms: {e}")
+        raise
+    except Exception:
+        # The gateway answered (e.g. BadRequestError): our request was wrong, the gateway is fine
+        breaker.success()
+        _errors[name] += 1
+        raise
+    finally:
+        _latencies[name].append((time.perf_counter() - start) * 1000)
+
+    breaker.success()
+    return result
+
+
+def gateway_stats():
+    """Per call name: calls, errors and p50/p95/p99/max latency in ms over the recent window"""
+    stats = {}
+    for name, samples in list(_latencies.items()):
+        ordered = sorted(samples)
+        if not ordered:
+            continue
+        pick = lambda pct: round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 2)
+        stats[name] = {
+            'calls': len(ordered),
+            'errors': _errors[name],
+            'p50_ms': pick(50),
+            'p95_ms': pick(95),
+            'p99_ms': pick(99),
+            'max_ms': round(ordered[-1], 2),
+        }
+    return stats
 
 
 def create_razorpay_order(amount):
     """Create a Razorpay order"""
     amount_in_paise = int(amount * 100)
-    
+
     order_data = {
         'amount': amount_in_paise,
         'currency': 'INR',
@@ -16,9 +216,21 @@ def create_razorpay_order(amount):
             'platform': 'PeelOJuice'
         }
     }
-    
-    order = razorpay_client.order.create(data=order_data)
-    return order
+
+    client = get_razorpay_client()
+    return call_gateway('order.create', client.order.create, data=order_data)
+
+
+def start_razorpay_order(amount):
+    """create_razorpay_order() on a background thread; returns a Future of the order"""
+    get_razorpay_client()
+    return _get_executor().submit(create_razorpay_order, amount)
+
+
+def fetch_order_payments(razorpay_order_id):
+    """Payment attempts on a Razorpay order"""
+    client = get_razorpay_client()
+    return call_gateway('order.payments', client.order.payments, razorpay_order_id)['items']
 
 
 def verify_razorpay_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
@@ -27,9 +239,17 @@ def verify_razorpay_signature(razorpay_order_id, razorpay_payment_id, razorpay_s
         'razorpay_payment_id': razorpay_payment_id,
         'razorpay_signature': razorpay_signature
     }
-    
+
     try:
-        razorpay_client.utility.verify_payment_signature(params_dict)
+        get_razorpay_client().utility.verify_payment_signature(params_dict)
         return True
     except razorpay.errors.SignatureVerificationError:
         return False
+
+
+def verify_webhook_signature(body, signature, secret):
+    try:
+        get_razorpay_client().utility.verify_webhook_signature(body, signature, secret)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,128 @@
+"""
+Reconciliation of online payments nobody finished.
+
+An online payment stays pending if the browser closes before the verify
+step runs and the webhook never arrives. ``manage.py reconcile_payments``
+asks the gateway what happened to each such payment and settles it.
+
+- Stale payments (pending, with a gateway order, older than
+  RECONCILE_STALE_AFTER seconds) are read in id order, RECONCILE_BATCH_SIZE
+  at a time. Each batch starts after the last id seen, so a long run never
+  re-reads or skips rows as others change.
+- The gateway orders of a batch are looked up in parallel on at most
+  RECONCILE_CONCURRENCY threads. The threads only make HTTP calls and
+  never touch the database.
+- Each batch is settled in one transaction. Rows still pending are
+  re-read (and locked where the database can), and are completed or
+  failed through payments/transitions.py with bulk updates. A payment the
+  verify step or a webhook settled in the meantime is left alone.
+
+A payment with a captured attempt is completed, and also refunded if that
+attempt has been fully refunded. One whose attempts all failed is failed.
+Anything else (no attempt yet, or only authorized) stays pending for the
+next run. Gateway errors skip the row and are counted.
+"""
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .gateway import get_gateway
+from .models import Payment
+from .transitions import Transitions
+
+logger = logging.getLogger(__name__)
+
+
+def settle(attempts):
+    """What the attempts on one gateway order decide: ('completed', attempt), ('failed', None) or None"""
+    for attempt in attempts:
+        if attempt.get('status') in ('captured', 'refunded'):
+            return 'completed', attempt
+    if attempts and all(attempt.get('status') == 'failed' for attempt in attempts):
+        return 'failed', None
+    return None
+
+
+def _lookup(gateway, gateway_order_id):
+    try:
+        return gateway.order_payments(gateway_order_id)
+    except Exception as e:
+        return e
+
+
+def _apply(verdicts, stats):
+    with transaction.atomic():
+        payments = Payment.objects.select_related('order').filter(id__in=verdicts, status='pending')
+        if connection.features.has_select_for_update:
+            payments = payments.select_for_update()
+
+        transitions = Transitions()
+        for payment in payments:
+            status, attempt = verdicts.pop(payment.id)
+            if status == 'failed':
+                transitions.fail(payment)
+                stats['failed'] += 1
+                continue
+            transitions.complete(payment, attempt['id'])
+            stats['completed'] += 1
+            if attempt['status'] == 'refunded' and transitions.refund(payment, int(attempt.get('amount_refunded', 0))):
+                stats['refunded'] += 1
+        transitions.save()
+
+    # Settled elsewhere while we asked the gateway
+    stats['unchanged'] += len(verdicts)
+
+
+def reconcile(gateway=None, stale_after=None, batch_size=None, concurrency=None, limit=None):
+    """Settle stale pending online payments; returns counts and rates"""
+    gateway = gateway or get_gateway()
+    stale_after = settings.RECONCILE_STALE_AFTER if stale_after is None else stale_after
+    batch_size = batch_size or settings.RECONCILE_BATCH_SIZE
+    concurrency = concurrency or settings.RECONCILE_CONCURRENCY
+
+    stale = Payment.objects.filter(
+        method='online',
+        status='pending',
+        razorpay_order_id__isnull=False,
+        created_at__lt=timezone.now() - timedelta(seconds=stale_after)
+    ).order_by('id')
+
+    stats = Counter()
+    start = time.perf_counter()
+    last_id = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while limit is None or stats['scanned'] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - stats['scanned'])
+            batch = list(stale.filter(id__gt=last_id).values_list('id', 'razorpay_order_id')[:size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            stats['scanned'] += len(batch)
+
+            results = pool.map(lambda row: _lookup(gateway, row[1]), batch)
+            verdicts = {}
+            for (payment_id, gateway_order_id), result in zip(batch, results):
+                stats['gateway_calls'] += 1
+                if isinstance(result, Exception):
+                    stats['gateway_errors'] += 1
+                    logger.warning(f"Gateway lookup for {gateway_order_id} failed: {result}")
+                    continue
+                verdict = settle(result)
+                if verdict:
+                    verdicts[payment_id] = verdict
+                else:
+                    stats['unchanged'] += 1
+            if verdicts:
+                _apply(verdicts, stats)
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['scanned'] / elapsed, 1) if elapsed else 0
+    stats['gateway_calls_per_second'] = round(stats['gateway_calls'] / elapsed, 1) if elapsed else 0
+    return dict(stats)
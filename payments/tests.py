@@ -1,3 +1,319 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import Cart, CartItem
+from orders.models import Order
+from products.models import Category, Juice
+from users.models import User
+
+from . import razorpay_utils, reconcile, webhooks
+from .gateway import PaymentGateway, RazorpayGateway
+from .razorpay_stub import RazorpayStubServer
+from .models import Payment, WebhookEvent
+
+
+@mock.patch('payments.razorpay_utils.create_razorpay_order')
+class CreateRazorpayOrderIdempotencyTests(TestCase):
+    """A repeated Idempotency-Key does not create a second gateway order"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='payer@example.com', phone_number='9000000020', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.order = Order.objects.create(user=self.user, food_subtotal='100.00', total_amount='115.00')
+
+    def create_order(self, key):
+        return self.client.post(
+            '/api/payments/razorpay/create-order/', {'order_id': self.order.id}, format='json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_duplicate_replays_gateway_order(self, create_razorpay_order):
+        create_razorpay_order.side_effect = [
+            {'id': f'order_{n}', 'amount': 11500, 'currency': 'INR'} for n in (1, 2)
+        ]
+        first = self.create_order('pay-1')
+        again = self.create_order('pay-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(create_razorpay_order.call_count, 1)
+        self.assertEqual(Payment.objects.get(order=self.order).razorpay_order_id, 'order_1')
+
+    def test_gateway_failure_releases_key(self, create_razorpay_order):
+        create_razorpay_order.side_effect = [
+            Exception('gateway down'), {'id': 'order_1', 'amount': 11500, 'currency': 'INR'}
+        ]
+        self.assertEqual(self.create_order('pay-2').status_code, 500)
+        retry = self.create_order('pay-2')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data['razorpay_order_id'], 'order_1')
+
+
+def _event(kind, event_id, **entities):
+    return {'event': kind, 'payload': {name: {'entity': entity} for name, entity in entities.items()}}, event_id
+
+
+class WebhookInboxTests(TestCase):
+    """Webhooks are stored once and applied in batches by the worker"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='hook@example.com', phone_number='9000000050', password='pass'
+        )
+        self.order = Order.objects.create(user=self.user, food_subtotal='100.00', total_amount='115.00')
+        self.payment = Payment.objects.create(
+            order=self.order, method='online', amount='115.00', razorpay_order_id='order_1'
+        )
+
+    def post(self, event, event_id, **headers):
+        body = json.dumps(event)
+        return APIClient().post(
+            '/api/payments/razorpay/webhook/', body, content_type='application/json',
+            HTTP_X_RAZORPAY_EVENT_ID=event_id, **headers
+        )
+
+    def captured(self, event_id='evt_1', order_id='order_1'):
+        return _event('payment.captured', event_id, payment={'id': 'pay_1', 'order_id': order_id})
+
+    def test_delivery_is_stored_once_and_not_applied_inline(self):
+        for _ in range(3):
+            self.assertEqual(self.post(*self.captured()).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().event, 'payment.captured')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+
+    @override_settings(RAZORPAY_WEBHOOK_SECRET='whsec')
+    def test_signature_is_checked(self):
+        event, event_id = self.captured()
+        self.assertEqual(self.post(event, event_id, HTTP_X_RAZORPAY_SIGNATURE='bad').status_code, 400)
+        signature = hmac.new(b'whsec', json.dumps(event).encode(), hashlib.sha256).hexdigest()
+        self.assertEqual(self.post(event, event_id, HTTP_X_RAZORPAY_SIGNATURE=signature).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_capture_completes_payment_and_confirms_order(self):
+        juice = Juice.objects.create(
+            category=Category.objects.create(name='Fresh'), name='Orange', description='d',
+            price='40.00', image='juices/a.png'
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, juice=juice, quantity=1, price_at_added='40.00')
+
+        self.post(*_event('payment.failed', 'evt_0', payment={'id': 'pay_0', 'order_id': 'order_1'}))
+        self.post(*self.captured())
+        self.post(*self.captured('evt_2', order_id='order_unknown'))
+        self.post(*_event('payment.authorized', 'evt_3', payment={'id': 'pay_1', 'order_id': 'order_1'}))
+
+        with self.assertNumQueries(7):
+            # savepoint, events, payments + orders, payments, orders, events, release
+            self.assertEqual(webhooks.process_batch(), 4)
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((self.payment.status, self.payment.transaction_id), ('completed', 'pay_1'))
+        self.assertIsNotNone(self.payment.paid_at)
+        self.assertEqual(self.order.status, 'confirmed')
+        # A late capture must not wipe a cart built since; clearing is the verify step's job
+        self.assertTrue(CartItem.objects.filter(cart=cart).exists())
+        self.assertEqual(
+            dict(WebhookEvent.objects.values_list('event_id', 'outcome')),
+            {'evt_0': 'applied', 'evt_1': 'applied', 'evt_2': 'unmatched', 'evt_3': 'ignored'}
+        )
+        self.assertEqual(webhooks.process_batch(), 0)
+
+    def test_late_failure_does_not_undo_capture(self):
+        self.post(*self.captured())
+        self.post(*_event('payment.failed', 'evt_2', payment={'id': 'pay_0', 'order_id': 'order_1'}))
+        webhooks.drain(batch_size=1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+
+    def test_full_refund_cancels_order(self):
+        self.post(*self.captured())
+        self.post(*_event('refund.processed', 'evt_2', refund={'payment_id': 'pay_1', 'amount': 5000}))
+        self.post(*_event('refund.processed', 'evt_3', refund={'payment_id': 'pay_1', 'amount': 11500}))
+        webhooks.drain()
+
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual((self.payment.status, self.order.status), ('refunded', 'cancelled'))
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt_2').outcome, 'ignored')
+
+    def test_malformed_event_is_failed_not_retried(self):
+        self.post({'event': 'payment.captured', 'payload': {}}, 'evt_1')
+        self.assertEqual(self.post([], 'evt_2').status_code, 400)
+        call_command('process_webhooks', '--once', stdout=mock.Mock())
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.outcome, 'failed')
+        self.assertIn('Malformed', event.error)
+
+
+class FakeGateway(PaymentGateway):
+    """Answers from ``attempts`` (gateway order id -> attempts, or an exception to raise)"""
+    attempts = {}
+
+    def __init__(self):
+        self.calls = []
+
+    def order_payments(self, gateway_order_id):
+        self.calls.append(gateway_order_id)
+        result = self.attempts[gateway_order_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class ReconcilePaymentsTests(TestCase):
+    """Stale pending online payments are settled from what the gateway reports"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='late@example.com', phone_number='9000000060', password='pass'
+        )
+        FakeGateway.attempts = {}
+
+    def pending(self, gateway_order_id, attempts=(), minutes_old=30, method='online'):
+        order = Order.objects.create(user=self.user, food_subtotal='100.00', total_amount='115.00')
+        payment = Payment.objects.create(
+            order=order, method=method, amount='115.00', razorpay_order_id=gateway_order_id
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_old))
+        FakeGateway.attempts[gateway_order_id] = attempts
+        return payment
+
+    def status(self, payment):
+        payment.refresh_from_db()
+        payment.order.refresh_from_db()
+        return payment.status, payment.order.status
+
+    def test_stale_payments_are_settled(self):
+        captured = self.pending('order_1', [{'id': 'pay_0', 'status': 'failed'}, {'id': 'pay_1', 'status': 'captured'}])
+        failed = self.pending('order_2', [{'id': 'pay_2', 'status': 'failed'}])
+        authorized = self.pending('order_3', [{'id': 'pay_3', 'status': 'authorized'}])
+        erroring = self.pending('order_4', ConnectionError('timed out'))
+        refunded = self.pending('order_5', [{'id': 'pay_5', 'status': 'refunded', 'amount_refunded': 11500}])
+        fresh = self.pending('order_6', minutes_old=1)
+        cod = self.pending('order_7', method='cod')
+
+        gateway = FakeGateway()
+        stats = reconcile.reconcile(gateway, batch_size=2, concurrency=3)
+
+        self.assertEqual(sorted(gateway.calls), ['order_1', 'order_2', 'order_3', 'order_4', 'order_5'])
+        self.assertEqual(self.status(captured), ('completed', 'confirmed'))
+        self.assertEqual(captured.transaction_id, 'pay_1')
+        self.assertEqual(self.status(failed), ('failed', 'pending'))
+        self.assertEqual(self.status(refunded), ('refunded', 'cancelled'))
+        for untouched in (authorized, erroring, fresh, cod):
+            self.assertEqual(self.status(untouched), ('pending', 'pending'))
+        self.assertEqual(
+            Counter({key: stats[key] for key in ('scanned', 'completed', 'failed', 'refunded', 'unchanged', 'gateway_errors')}),
+            Counter(scanned=5, completed=2, failed=1, refunded=1, unchanged=1, gateway_errors=1)
+        )
+        self.assertEqual(stats['gateway_calls'], 5)
+
+    def test_payment_settled_meanwhile_is_left_alone(self):
+        payment = self.pending('order_1')
+        Payment.objects.filter(pk=payment.pk).update(status='completed')
+        stats = Counter()
+        reconcile._apply({payment.pk: ('failed', None)}, stats)
+        self.assertEqual(self.status(payment)[0], 'completed')
+        self.assertEqual(stats['unchanged'], 1)
+
+    @override_settings(PAYMENT_GATEWAY='payments.tests.FakeGateway')
+    def test_command_stops_at_limit(self):
+        for n in range(3):
+            self.pending(f'order_{n}', [{'id': f'pay_{n}', 'status': 'captured'}])
+        out = StringIO()
+        call_command('reconcile_payments', '--limit', '2', '--batch-size', '1', stdout=out)
+        self.assertIn('Checked 2 payments', out.getvalue())
+        self.assertIn('calls/s', out.getvalue())
+        self.assertEqual(Payment.objects.filter(status='completed').count(), 2)
+
+
+class RazorpayClientTests(TestCase):
+    """The shared Razorpay client is lazy, keeps its connection, times out and trips its breaker"""
+
+    def setUp(self):
+        self.stub = RazorpayStubServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings = override_settings(
+            RAZORPAY_API_URL=self.stub.url, RAZORPAY_READ_TIMEOUT=0.2,
+            RAZORPAY_BREAKER_THRESHOLD=2, RAZORPAY_BREAKER_RESET=60
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        razorpay_utils.reset_razorpay_client()
+        self.addCleanup(razorpay_utils.reset_razorpay_client)
+
+    def test_client_is_built_on_first_use_and_reused(self):
+        self.assertIsNone(razorpay_utils._client)
+        for _ in range(3):
+            order = razorpay_utils.create_razorpay_order(Decimal('115.00'))
+            self.assertEqual((order['amount'], order['currency']), (11500, 'INR'))
+        self.assertEqual(len(self.stub.requests), 3)
+        self.assertEqual(self.stub.connections, 1)
+        self.assertEqual(razorpay_utils.gateway_stats()['order.create']['calls'], 3)
+
+    def test_slow_gateway_times_out_then_fails_fast(self):
+        self.stub.latency = 1
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                razorpay_utils.create_razorpay_order(Decimal('115.00'))
+        self.assertTrue(razorpay_utils.get_breaker().is_open)
+
+        start = time.perf_counter()
+        with self.assertRaises(razorpay_utils.GatewayUnavailable):
+            razorpay_utils.create_razorpay_order(Decimal('115.00'))
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(len(self.stub.requests), 2)
+        self.assertEqual(razorpay_utils.gateway_stats()['order.create']['errors'], 3)
+
+    def test_breaker_closes_after_successful_probe(self):
+        self.stub.fail_status = 502
+        for _ in range(2):
+            with self.assertRaises(razorpay_utils.razorpay.errors.ServerError):
+                razorpay_utils.create_razorpay_order(Decimal('115.00'))
+        breaker = razorpay_utils.get_breaker()
+        self.assertTrue(breaker.is_open)
+
+        self.stub.fail_status = None
+        breaker.opened_at -= 60
+        self.assertIn('id', razorpay_utils.create_razorpay_order(Decimal('115.00')))
+        self.assertFalse(breaker.is_open)
+
+    def test_open_breaker_answers_503(self):
+        user = User.objects.create_user(email='rzp@example.com', phone_number='9000000070', password='pass')
+        order = Order.objects.create(user=user, food_subtotal='100.00', total_amount='115.00')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        self.stub.fail_status = 500
+        for _ in range(3):
+            response = client.post('/api/payments/razorpay/create-order/', {'order_id': order.id}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_gateway_lists_order_payments(self):
+        self.stub.payments['order_1'] = [{'id': 'pay_1', 'status': 'captured'}]
+        self.assertEqual(RazorpayGateway().order_payments('order_1'), [{'id': 'pay_1', 'status': 'captured'}])
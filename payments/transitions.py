@@ -0,0 +1,100 @@
+"""
+Payment state changes applied in bulk.
+
+The webhook worker (payments/webhooks.py) and the reconciliation job
+(payments/reconcile.py) both learn about many payments at once. They record
+each change on a Transitions object, which only touches the instances in
+memory, then call save() inside their transaction to write everything with
+one bulk update per table.
+
+The rules are the same whichever source reports the change:
+
+- completing works from pending or failed (a retry on the same gateway
+  order can succeed after a failed attempt), confirms a pending order and
+  puts it in its branch's kitchen queue (orders/routing.py). The cart
+  is left alone: only the verify step clears it, because a webhook or a
+  reconciliation run can arrive hours later, when the customer may have
+  filled a new cart;
+- failing only applies to a payment that is still pending;
+- a refund of the full amount refunds a completed payment and cancels an
+  undelivered order, as a refund from the dashboard does.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order
+from orders.routing import adjust_queue
+
+from .models import Payment
+
+
+class Transitions:
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self.payments = {}
+        self.orders = {}
+        self.freed_branches = []
+        self.queued_branches = []
+
+    def _changed(self, payment):
+        payment.updated_at = self.now
+        self.payments[payment.pk] = payment
+
+    def _set_order_status(self, order, status):
+        order.status = status
+        order.updated_at = self.now
+        self.orders[order.pk] = order
+
+    def complete(self, payment, transaction_id):
+        """Returns False when there is nothing to change"""
+        if payment.status not in ('pending', 'failed'):
+            return False
+        payment.status = 'completed'
+        payment.transaction_id = transaction_id
+        payment.paid_at = payment.paid_at or self.now
+        self._changed(payment)
+
+        order = payment.order
+        if order.status == 'pending':
+            self._set_order_status(order, 'confirmed')
+        if order.awaiting_payment:
+            order.awaiting_payment = False
+            order.updated_at = self.now
+            self.orders[order.pk] = order
+            if order.queue_branch_id:
+                self.queued_branches.append(order.queue_branch_id)
+        return True
+
+    def fail(self, payment):
+        if payment.status != 'pending':
+            return False
+        payment.status = 'failed'
+        self._changed(payment)
+        return True
+
+    def refund(self, payment, amount_paise):
+        # Partial refunds leave the payment completed
+        if payment.status != 'completed' or amount_paise < payment.amount * 100:
+            return False
+        payment.status = 'refunded'
+        self._changed(payment)
+
+        order = payment.order
+        if order.status not in ('delivered', 'cancelled'):
+            if order.queue_branch_id:
+                self.freed_branches.append(order.queue_branch_id)
+            self._set_order_status(order, 'cancelled')
+        return True
+
+    def save(self):
+        """Write every recorded change; call inside the caller's transaction"""
+        if self.payments:
+            Payment.objects.bulk_update(
+                self.payments.values(), ['status', 'transaction_id', 'paid_at', 'updated_at']
+            )
+        if self.orders:
+            Order.objects.bulk_update(self.orders.values(), ['status', 'awaiting_payment', 'updated_at'])
+        for branch_id in self.freed_branches:
+            transaction.on_commit(lambda branch_id=branch_id: adjust_queue(branch_id, -1))
+        for branch_id in self.queued_branches:
+            transaction.on_commit(lambda branch_id=branch_id: adjust_queue(branch_id, 1))
@@ -5,8 +5,10 @@ from rest_framework import status
 from django.utils import timezone
 from django.conf import settings
 
+from orders.idempotency import idempotent
 from .models import Payment
 from .serializers import PaymentSerializer
+from .webhooks import receive
 
 
 class ConfirmCODPaymentAPIView(APIView):
@@ -82,8 +84,9 @@ class GetPaymentDetailsAPIView(APIView):
 class CreateRazorpayOrderAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        from .razorpay_utils import create_razorpay_order
+        from .razorpay_utils import GatewayUnavailable, create_razorpay_order
         from orders.models import Order
         
         order_id = request.data.get('order_id')
@@ -135,6 +138,12 @@ class CreateRazorpayOrderAPIView(APIView):
                 status=status.HTTP_200_OK
             )
 
+        except GatewayUnavailable as e:
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(settings.RAZORPAY_BREAKER_RESET)}
+            )
         except Exception as e:
             return Response(
                 {"detail": f"Failed to create Razorpay order: {str(e)}"},
@@ -179,18 +188,18 @@ class VerifyRazorpayPaymentAPIView(APIView):
             payment.paid_at = timezone.now()
             payment.save()
             
-            # Update order status to confirmed after successful payment
+            # Update order status to confirmed after successful payment;
+            # only now does it join its branch's kitchen queue
             payment.order.status = 'confirmed'
+            payment.order.awaiting_payment = False
             payment.order.save()
             
             # Clear cart after successful online payment
             # This ensures cart is only cleared when payment actually succeeds
-            from cart.models import Cart, CartItem
+            from cart.models import Cart
+            from cart.mutations import clear_cart
             try:
-                cart = Cart.objects.get(user=request.user)
-                CartItem.objects.filter(cart=cart).delete()
-                cart.applied_coupon = None
-                cart.save()
+                clear_cart(Cart.objects.get(user=request.user))
             except Cart.DoesNotExist:
                 pass  # Cart already cleared or doesn't exist
 
@@ -216,40 +225,28 @@ class RazorpayWebhookAPIView(APIView):
     permission_classes = []
 
     def post(self, request):
-        from .razorpay_utils import razorpay_client
-        
+        from .razorpay_utils import verify_webhook_signature
+
         webhook_secret = getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', None)
         webhook_signature = request.headers.get('X-Razorpay-Signature')
         webhook_body = request.body
 
-        if webhook_secret:
-            try:
-                razorpay_client.utility.verify_webhook_signature(
-                    webhook_body.decode('utf-8'),
-                    webhook_signature,
-                    webhook_secret
-                )
-            except:
-                return Response(
-                    {"detail": "Invalid signature"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-        event = request.data
-        
-        if event.get('event') == 'payment.captured':
-            payment_entity = event.get('payload', {}).get('payment', {}).get('entity', {})
-            razorpay_order_id = payment_entity.get('order_id')
-            razorpay_payment_id = payment_entity.get('id')
+        if webhook_secret and not verify_webhook_signature(
+            webhook_body.decode('utf-8'), webhook_signature, webhook_secret
+        ):
+            return Response(
+                {"detail": "Invalid signature"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            try:
-                payment = Payment.objects.get(razorpay_order_id=razorpay_order_id)
-                payment.transaction_id = razorpay_payment_id
-                payment.status = 'completed'
-                payment.paid_at = timezone.now()
-                payment.save()
-            except Payment.DoesNotExist:
-                pass
+        # Store and acknowledge; `manage.py process_webhooks` applies it (see payments/webhooks.py)
+        try:
+            receive(webhook_body, request.headers.get('X-Razorpay-Event-Id'))
+        except ValueError:
+            return Response(
+                {"detail": "Invalid payload"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         return Response({"status": "ok"}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,155 @@
+"""
+Razorpay webhook inbox.
+
+The webhook view only checks the signature and stores the delivery with
+receive(): one INSERT that ignores an event id already stored, then 200.
+Razorpay redelivers until it gets a fast 2xx, so a slow handler used to
+turn every incident into a retry storm on the web workers.
+
+``manage.py process_webhooks`` applies the inbox in batches, oldest first.
+Each batch runs in one transaction. It locks its events (skipping rows
+another worker holds, where the database can), loads the payments they
+refer to in one query, and works out the new states in memory. Then it
+writes them back with one bulk update each for payments, orders and
+events. The state changes (payments/transitions.py) are:
+
+- ``payment.captured`` / ``order.paid``: complete the payment;
+- ``payment.failed``: fail it;
+- ``refund.processed``: refund it, if the refund is for the full amount.
+
+Any other event is stored and marked ignored. Events for payments we do not
+have are marked unmatched, and malformed ones failed, so the inbox can be
+inspected in the admin and an event re-queued from there.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Payment, WebhookEvent
+from .transitions import Transitions
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel the worker LISTENs on
+CHANNEL = 'razorpay_webhooks'
+
+CAPTURE_EVENTS = ('payment.captured', 'order.paid')
+
+
+def _notify():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {CHANNEL}")
+
+
+def receive(body, event_id=None):
+    """Store a verified webhook body; a redelivered event id is dropped. Raises ValueError for bad JSON"""
+    event = json.loads(body)
+    if not isinstance(event, dict):
+        raise ValueError('Webhook body is not an object')
+
+    WebhookEvent.objects.bulk_create([
+        WebhookEvent(
+            # Razorpay always sends the header; hashing the body keeps replays of the same body out
+            event_id=event_id or hashlib.sha256(body).hexdigest(),
+            event=str(event.get('event', ''))[:50],
+            payload=event
+        )
+    ], ignore_conflicts=True)
+    transaction.on_commit(_notify)
+
+
+def _entity(payload, name):
+    return payload['payload'][name]['entity']
+
+
+def _parse(payload):
+    """(new payment status, lookup field, lookup value, detail) for an event, or None"""
+    kind = payload.get('event')
+    if kind in CAPTURE_EVENTS:
+        payment = _entity(payload, 'payment')
+        return 'completed', 'razorpay_order_id', payment['order_id'], payment['id']
+    if kind == 'payment.failed':
+        payment = _entity(payload, 'payment')
+        return 'failed', 'razorpay_order_id', payment['order_id'], payment['id']
+    if kind == 'refund.processed':
+        refund = _entity(payload, 'refund')
+        return 'refunded', 'transaction_id', refund['payment_id'], int(refund['amount'])
+    return None
+
+
+def process_batch(batch_size=None):
+    """Apply up to ``batch_size`` stored events in one transaction; returns how many were handled"""
+    with transaction.atomic():
+        pending = WebhookEvent.objects.filter(processed_at__isnull=True).order_by('received_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending[:batch_size or settings.WEBHOOK_WORKER_BATCH_SIZE])
+        if not events:
+            return 0
+
+        changes = {}
+        for event in events:
+            try:
+                changes[event.id] = _parse(event.payload)
+            except (KeyError, TypeError, ValueError) as e:
+                event.outcome = 'failed'
+                event.error = f'Malformed payload: {e!r}'
+
+        lookups = [change for change in changes.values() if change]
+        order_ids = {value for _, field, value, _ in lookups if field == 'razorpay_order_id'}
+        transaction_ids = {value for _, field, value, _ in lookups if field == 'transaction_id'}
+        payments = Payment.objects.select_related('order').filter(
+            Q(razorpay_order_id__in=order_ids) | Q(transaction_id__in=transaction_ids)
+        ) if lookups else []
+        index = {'razorpay_order_id': {}, 'transaction_id': {}}
+        for payment in payments:
+            index['razorpay_order_id'][payment.razorpay_order_id] = payment
+            index['transaction_id'][payment.transaction_id] = payment
+
+        transitions = Transitions()
+        for event in events:
+            event.processed_at = transitions.now
+            if event.outcome:
+                continue
+            change = changes[event.id]
+            if change is None:
+                event.outcome = 'ignored'
+                continue
+            status, field, value, detail = change
+            payment = index[field].get(value)
+            if payment is None:
+                event.outcome = 'unmatched'
+                continue
+            if status == 'completed':
+                applied = transitions.complete(payment, detail)
+            elif status == 'failed':
+                applied = transitions.fail(payment)
+            else:
+                applied = transitions.refund(payment, detail)
+            event.outcome = 'applied' if applied else 'ignored'
+            if payment.transaction_id:
+                # A refund later in the batch finds a payment captured earlier in it
+                index['transaction_id'][payment.transaction_id] = payment
+
+        transitions.save()
+        WebhookEvent.objects.bulk_update(events, ['processed_at', 'outcome', 'error'])
+
+    for event in events:
+        if event.outcome in ('unmatched', 'failed'):
+            logger.warning(f"Webhook {event.event} {event.event_id} {event.outcome}: {event.error or 'no payment'}")
+    return len(events)
+
+
+def drain(batch_size=None):
+    """Apply batches until the inbox is empty; returns how many events were handled"""
+    total = 0
+    while True:
+        processed = process_batch(batch_size)
+        if not processed:
+            return total
+        total += processed
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import Category, Juice, Branch, BranchProduct
+from .cache import bump_catalog_revision
 
 
 @admin.register(Category)
@@ -11,12 +13,14 @@ class CategoryAdmin(admin.ModelAdmin):
     actions = ['activate_categories', 'deactivate_categories']
 
     def activate_categories(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = queryset.update(is_active=True, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} category(ies) activated.')
     activate_categories.short_description = 'Activate selected categories'
 
     def deactivate_categories(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = queryset.update(is_active=False, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} category(ies) deactivated.')
     deactivate_categories.short_description = 'Deactivate selected categories'
 
@@ -43,22 +47,26 @@ class JuiceAdmin(admin.ModelAdmin):
     ]
 
     def mark_as_available(self, request, queryset):
-        updated = queryset.update(is_available=True)
+        updated = queryset.update(is_available=True, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} juice(s) marked as available.')
     mark_as_available.short_description = 'Mark selected as Available'
 
     def mark_as_unavailable(self, request, queryset):
-        updated = queryset.update(is_available=False)
+        updated = queryset.update(is_available=False, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} juice(s) marked as unavailable.')
     mark_as_unavailable.short_description = 'Mark selected as Unavailable'
 
     def activate_juices(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = queryset.update(is_active=True, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} juice(s) activated.')
     activate_juices.short_description = 'Activate selected juices'
 
     def deactivate_juices(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = queryset.update(is_active=False, updated_at=timezone.now())
+        bump_catalog_revision()
         self.message_user(request, f'{updated} juice(s) deactivated.')
     deactivate_juices.short_description = 'Deactivate selected juices'
 
@@ -0,0 +1,83 @@
+"""
+Per-process index of which products each branch has available.
+
+The whole BranchProduct table is loaded with one query into a dict of
+branch id -> frozenset of product ids the first time it is needed, and is
+reloaded only when the catalog revision changes. Every save or delete of
+a BranchProduct bumps that revision (products/signals.py), so lookups are
+set-membership checks.
+
+The revision lives in the default cache, so workers only see each other's
+bumps when that cache is shared (REDIS_URL). With the per-process LocMemCache
+a change made in one worker leaves the others enforcing their old index;
+``manage.py check --deploy`` flags that setup (products/checks.py).
+
+The index mirrors ``BranchProduct.is_available`` only; callers combine it
+with ``Juice.is_active`` / ``Branch.is_active`` as they already do.
+
+It answers membership checks. Querysets that are paginated or otherwise
+narrowed in SQL filter with ``available_at()`` instead, so the database
+does the join and no list of product ids is bound as query parameters.
+"""
+import threading
+from collections import defaultdict
+
+from django.db.models import Exists, OuterRef
+
+from .cache import get_catalog_revision
+from .models import BranchProduct
+
+_lock = threading.Lock()
+
+# (revision, {branch_id: frozenset(product_ids)}), swapped as a whole
+_index = (None, {})
+
+
+def _load():
+    branches = defaultdict(set)
+    rows = BranchProduct.objects.filter(is_available=True).order_by().values_list('branch_id', 'product_id')
+    for branch_id, product_id in rows.iterator():
+        branches[branch_id].add(product_id)
+    return {branch_id: frozenset(ids) for branch_id, ids in branches.items()}
+
+
+def _branches():
+    global _index
+    revision = get_catalog_revision()
+    if _index[0] != revision:
+        with _lock:
+            # Another thread may have reloaded while we waited
+            if _index[0] != revision:
+                _index = (revision, _load())
+    return _index[1]
+
+
+def available_product_ids(branch_id):
+    """Product ids marked available at ``branch_id``"""
+    return _branches().get(int(branch_id), frozenset())
+
+
+def is_available(branch_id, product_id):
+    return int(product_id) in available_product_ids(branch_id)
+
+
+def unavailable_product_ids(branch_id, product_ids):
+    """The subset of ``product_ids`` not available at ``branch_id``, in the given order"""
+    available = available_product_ids(branch_id)
+    return [product_id for product_id in product_ids if product_id not in available]
+
+
+def available_at(branch_id):
+    """Condition for a Juice queryset: marked available at ``branch_id``, checked in SQL"""
+    return Exists(BranchProduct.objects.filter(
+        branch_id=branch_id,
+        product=OuterRef('pk'),
+        is_available=True
+    ))
+
+
+def clear():
+    """Drop the loaded index; the next lookup reloads it"""
+    global _index
+    with _lock:
+        _index = (None, {})
@@ -0,0 +1,244 @@
+"""
+Versioned cache for the public catalog endpoints.
+
+Every payload is stored together with the catalog revision it was built
+from. Saving or deleting a Juice, Category, Branch or BranchProduct bumps
+the revision (see products/signals.py), so older payloads simply stop
+matching instead of having to be deleted one key at a time.
+
+The same revision doubles as the HTTP validator for conditional GETs, so an
+unchanged collection is answered with 304 before any query or serialization.
+Last-Modified only has whole seconds, so the stored modification time is a
+whole second that every bump moves forward by at least one.
+"""
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+logger = logging.getLogger(__name__)
+
+CATALOG_REVISION_KEY = 'catalog:revision'
+CATALOG_MODIFIED_KEY = 'catalog:modified'
+
+# Query parameters that change the body of a catalog response
+CATALOG_CACHE_PARAMS = ('category_id', 'page', 'page_size', 'cursor', 'fields', 'expand')
+
+
+def _seed_revision():
+    # Seed from the clock so a revision lost to cache eviction never goes backwards
+    now = time.time()
+    cache.add(CATALOG_MODIFIED_KEY, math.ceil(now), None)
+    cache.add(CATALOG_REVISION_KEY, int(now * 1000), None)
+    return cache.get(CATALOG_REVISION_KEY)
+
+
+def get_catalog_revision():
+    """Return the current catalog revision number"""
+    revision = cache.get(CATALOG_REVISION_KEY)
+    if revision is None:
+        revision = _seed_revision()
+    return revision
+
+
+def _bump_revision():
+    # An edit in the same second as the last one must still beat If-Modified-Since
+    previous = cache.get(CATALOG_MODIFIED_KEY) or 0
+    cache.set(CATALOG_MODIFIED_KEY, max(math.ceil(time.time()), int(previous) + 1), None)
+    try:
+        cache.incr(CATALOG_REVISION_KEY)
+    except ValueError:
+        _seed_revision()
+
+
+def bump_catalog_revision():
+    """Invalidate every cached catalog payload once the current transaction commits"""
+    transaction.on_commit(_bump_revision)
+
+
+def _catalog_state(request):
+    # Memoized per request: the ETag and Last-Modified checks share one lookup
+    state = getattr(request, '_catalog_state', None)
+    if state is None:
+        found = cache.get_many([CATALOG_REVISION_KEY, CATALOG_MODIFIED_KEY])
+        if len(found) < 2:
+            _seed_revision()
+            found = cache.get_many([CATALOG_REVISION_KEY, CATALOG_MODIFIED_KEY])
+        state = (found.get(CATALOG_REVISION_KEY), found.get(CATALOG_MODIFIED_KEY))
+        request._catalog_state = state
+    return state
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Collection validator: changes whenever anything in the catalog changes"""
+    revision, _ = _catalog_state(request)
+    return f'"catalog-{revision}"' if revision is not None else None
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    _, modified = _catalog_state(request)
+    if modified is None:
+        return None
+    return datetime.fromtimestamp(modified, tz=dt_timezone.utc)
+
+
+def _juice_state(request, pk):
+    # One indexed lookup of the juice and category timestamps
+    if not hasattr(request, '_juice_state'):
+        from .models import Juice
+
+        request._juice_state = Juice.objects.filter(
+            pk=pk, is_active=True
+        ).values_list('updated_at', 'category__updated_at').first()
+    return request._juice_state
+
+
+def juice_etag(request, pk, *args, **kwargs):
+    """Per-resource validator for a single juice"""
+    state = _juice_state(request, pk)
+    if state is None:
+        return None
+    return f'"juice-{pk}-{int(max(state).timestamp() * 1000000)}"'
+
+
+def juice_last_modified(request, pk, *args, **kwargs):
+    state = _juice_state(request, pk)
+    return max(state) if state else None
+
+
+def conditional_get(etag_func, last_modified_func, vary=()):
+    """
+    Decorate an APIView.get with ETag/Last-Modified handling.
+
+    Matching If-None-Match/If-Modified-Since requests get a 304 before the
+    view body runs. Responses are marked no-cache so browsers revalidate
+    instead of guessing a freshness lifetime. Headers in ``vary`` are added
+    to Vary on every response, 304s included, for views whose validator
+    depends on them.
+    """
+    conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            view = conditional(lambda req, *a, **kw: method(self, req, *a, **kw))
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            if vary:
+                patch_vary_headers(response, vary)
+            return response
+        return wrapper
+    return decorator
+
+
+def catalog_params(request, **params):
+    """Cache-key parameters for a request: URL kwargs plus the whitelisted query string"""
+    for name in CATALOG_CACHE_PARAMS:
+        params[name] = request.query_params.get(name)
+    # Paginated payloads contain absolute next/previous links
+    params['host'] = request.get_host()
+    return params
+
+
+def _payload_key(endpoint, params):
+    query = '&'.join(
+        f'{name}={value}'
+        for name, value in sorted(params.items())
+        if value is not None
+    )
+    digest = hashlib.sha1(query.encode('utf-8')).hexdigest()
+    return f'catalog:{endpoint}:{digest}'
+
+
+def get_cached_payload(endpoint, build, **params):
+    """
+    Return the payload for ``endpoint`` from the cache, building it on a miss.
+
+    The revision and the payload are fetched in a single cache round trip.
+    ``build`` may return None (e.g. unknown branch), which is never cached.
+    """
+    key = _payload_key(endpoint, params)
+    found = cache.get_many([CATALOG_REVISION_KEY, key])
+    revision = found.get(CATALOG_REVISION_KEY)
+    entry = found.get(key)
+
+    if revision is not None and entry is not None and entry[0] == revision:
+        return entry[1]
+
+    if revision is None:
+        revision = _seed_revision()
+
+    payload = build()
+    if payload is not None:
+        cache.set(key, (revision, payload), settings.CATALOG_CACHE_TIMEOUT)
+    return payload
+
+
+def warm_catalog_cache(host=None):
+    """
+    Pre-build the first page of every catalog endpoint and each branch menu.
+
+    Runs the real views through a request factory, so the cached payloads
+    are byte-for-byte what a customer request would have produced.
+    Returns the number of payloads built.
+    """
+    from rest_framework.test import APIRequestFactory
+
+    from .models import Branch, Category
+    from .views import (
+        BranchListAPIView,
+        BranchMenuAPIView,
+        BranchProductsAPIView,
+        CategoryListAPIView,
+        JuiceListAPIView,
+    )
+
+    host = host or settings.CATALOG_CACHE_WARMUP_HOST or settings.ALLOWED_HOSTS[0]
+    factory = APIRequestFactory(HTTP_HOST=host)
+
+    category_ids = list(Category.objects.filter(is_active=True).values_list('id', flat=True))
+    branch_ids = list(Branch.objects.filter(is_active=True).values_list('id', flat=True))
+
+    # Home asks for the plain first page, Menu for the first keyset page
+    first_pages = [{}, {'cursor': ''}]
+    first_pages += [{'cursor': '', 'category_id': category_id} for category_id in category_ids]
+
+    targets = [
+        (CategoryListAPIView, '/api/products/categories/', {}, {}),
+        (BranchListAPIView, '/api/products/branches/', {}, {}),
+    ]
+    for branch_id in branch_ids:
+        targets.append((
+            BranchMenuAPIView,
+            f'/api/products/branches/{branch_id}/menu/',
+            {},
+            {'branch_id': branch_id},
+        ))
+    for query in first_pages:
+        targets.append((JuiceListAPIView, '/api/products/juices/', query, {}))
+        for branch_id in branch_ids:
+            targets.append((
+                BranchProductsAPIView,
+                f'/api/products/branches/{branch_id}/products/',
+                query,
+                {'branch_id': branch_id},
+            ))
+
+    warmed = 0
+    for view_class, path, query, kwargs in targets:
+        response = view_class.as_view()(factory.get(path, query), **kwargs)
+        if response.status_code == 200:
+            warmed += 1
+        else:
+            logger.warning(f"Catalog warm-up got {response.status_code} for {path}")
+
+    logger.info(f"Catalog cache warmed with {warmed} payloads")
+    return warmed
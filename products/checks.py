@@ -0,0 +1,29 @@
+"""
+System checks for settings the catalog relies on.
+
+Run with ``manage.py check --deploy``.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """The catalog revision must be visible to every worker"""
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_BACKENDS:
+        return []
+    return [
+        Warning(
+            "The default cache is per-process, so catalog revisions are not shared between workers.",
+            hint=(
+                "Set REDIS_URL. Otherwise a catalog or availability change made in one worker "
+                "never invalidates the others' cached pages, availability index or routing table."
+            ),
+            id='products.W001',
+        )
+    ]
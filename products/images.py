@@ -0,0 +1,39 @@
+"""
+Cloudinary delivery URLs for product images.
+
+A URL only depends on the stored image path and the requested width, so
+each one is built once per process and memoized.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+
+# Widths offered to the browser through srcset
+IMAGE_WIDTHS = (200, 400, 800)
+THUMBNAIL_WIDTH = 400
+DETAIL_WIDTH = 1200
+
+
+@lru_cache(maxsize=4096)
+def _build_url(cloud_name, image_path, width):
+    # Older uploads were stored with a 'media/' prefix Cloudinary doesn't know about
+    if image_path.startswith('media/'):
+        image_path = image_path[len('media/'):]
+    base = f"https://res.cloudinary.com/{cloud_name}/image/upload"
+    if width is None:
+        return f"{base}/{image_path}"
+    return f"{base}/w_{width},c_limit,f_auto,q_auto/{image_path}"
+
+
+def image_url(image, width=None):
+    """Cloudinary URL for an ImageField value, bounded to ``width`` pixels if given"""
+    if not image:
+        return None
+    return _build_url(settings.CLOUDINARY_STORAGE['CLOUD_NAME'], str(image), width)
+
+
+def image_srcset(image, widths=IMAGE_WIDTHS):
+    """Map of '<width>w' descriptors to URLs, ready for an <img srcset>"""
+    if not image:
+        return None
+    return {f'{width}w': image_url(image, width) for width in widths}
@@ -0,0 +1,134 @@
+import json
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from config.middleware import brotli, compress
+from config.renderers import ORJSONRenderer
+from orders.models import Order, OrderItem
+from orders.serializers import MyOrderListSerializer
+from products.models import Category, Juice
+from products.serializers import JuiceListSerializer, JuiceSerializer
+
+
+def _best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare encode time and wire size of the stock DRF JSON renderer against '
+        'the orjson renderer with gzip/brotli, over catalog, cart and my-orders payloads. '
+        'Fixtures are created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=124)
+        parser.add_argument('--cart-items', type=int, default=12)
+        parser.add_argument('--orders', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _payloads(self, options):
+        rng = random.Random(options['seed'])
+
+        category = Category.objects.create(name=f'Benchmark {time.time()}')
+        Juice.objects.bulk_create([
+            Juice(
+                category=category,
+                name=f'Benchmark Juice {i}',
+                description='Cold pressed with seasonal fruit and a squeeze of lime.',
+                long_description='Made fresh every morning. ' * 8,
+                ingredients='orange, carrot, ginger, lime',
+                features=['No added sugar', 'Cold pressed', 'Vegan'],
+                benefits=['Immunity', 'Hydration'],
+                price=rng.randint(40, 250),
+                nutrition_calories=rng.randint(60, 240),
+                image='juices/benchmark.png',
+            )
+            for i in range(options['products'])
+        ])
+        juices = list(Juice.objects.filter(category=category).select_related('category').order_by('id'))
+
+        user = get_user_model().objects.create_user(
+            email=f'benchmark-{time.time()}@example.com',
+            phone_number=str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+            password=None,
+        )
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, juice=juice, quantity=rng.randint(1, 3), price_at_added=juice.price)
+            for juice in rng.sample(juices, min(options['cart_items'], len(juices)))
+        ])
+
+        for _ in range(options['orders']):
+            order = Order(user=user, food_subtotal=0, delivery_fee_base=0)
+            order.save()
+            items = [
+                OrderItem(order=order, juice=juice, quantity=rng.randint(1, 3), price_per_item=juice.price)
+                for juice in rng.sample(juices, 3)
+            ]
+            OrderItem.objects.bulk_create(items)
+            order.food_subtotal = sum(item.subtotal for item in items)
+            order.calculate_totals()
+            order.save()
+
+        cart = Cart.objects.prefetch_related('items__juice').get(pk=cart.pk)
+        orders = Order.objects.filter(user=user).prefetch_related('items__juice').order_by('-created_at')
+
+        return {
+            'catalog list': JuiceListSerializer(juices, many=True).data,
+            'catalog detail': JuiceSerializer(juices, many=True).data,
+            'cart': CartSerializer(cart).data,
+            'my-orders': MyOrderListSerializer(orders, many=True).data,
+        }
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+
+        self.stdout.write(f'Database: {connection.vendor}, brotli: {"yes" if brotli else "not installed"}')
+        self.stdout.write(
+            f'{"payload":<16}{"stock ms":>10}{"orjson ms":>11}{"speedup":>9}'
+            f'{"stock B":>10}{"orjson B":>10}{"gzip B":>9}{"br B":>9}{"gzip ms":>9}{"br ms":>8}'
+        )
+
+        with transaction.atomic():
+            payloads = self._payloads(options)
+
+            for label, data in payloads.items():
+                stock_body = stock.render(data)
+                fast_body = fast.render(data)
+                if json.loads(stock_body) != json.loads(fast_body):
+                    self.stderr.write(f'{label}: orjson output differs from the stock renderer')
+
+                stock_ms = _best_of(repeat, lambda: stock.render(data))
+                fast_ms = _best_of(repeat, lambda: fast.render(data))
+                gzip_ms = _best_of(repeat, lambda: compress_string(fast_body))
+                gzip_size = len(compress_string(fast_body))
+                if brotli:
+                    br_ms = f'{_best_of(repeat, lambda: compress(fast_body, "br")):8.2f}'
+                    br_size = f'{len(compress(fast_body, "br")):9d}'
+                else:
+                    br_ms, br_size = f'{"-":>8}', f'{"-":>9}'
+
+                self.stdout.write(
+                    f'{label:<16}{stock_ms:10.2f}{fast_ms:11.2f}{stock_ms / fast_ms:8.1f}x'
+                    f'{len(stock_body):10d}{len(fast_body):10d}{gzip_size:9d}{br_size}'
+                    f'{gzip_ms:9.2f}{br_ms}'
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,131 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from products.models import Branch, BranchProduct, Category, Juice
+from products.search import rebuild_search_index, search_juice_ids
+
+FRUITS = [
+    'mango', 'orange', 'apple', 'pineapple', 'watermelon', 'papaya', 'guava',
+    'pomegranate', 'banana', 'strawberry', 'kiwi', 'grape', 'lemon', 'mint',
+    'carrot', 'beetroot', 'cucumber', 'spinach', 'ginger', 'coconut',
+]
+STYLES = ['juice', 'smoothie', 'shake', 'cooler', 'punch', 'lassi', 'blend', 'detox']
+WORDS = [
+    'fresh', 'cold', 'pressed', 'organic', 'sweet', 'tangy', 'creamy', 'rich',
+    'vitamin', 'protein', 'fiber', 'summer', 'tropical', 'classic', 'spiced',
+]
+
+
+def _vocabulary(rng, size):
+    # Pseudo-words stand in for the long tail of names a real catalog has
+    syllables = ['ka', 'lo', 'mi', 'ra', 'te', 'su', 'na', 'vo', 'pi', 'de', 'zu', 'ho']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(3, 4))))
+    return sorted(words)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark catalog search against a synthetic catalog. '
+        'Everything runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _time(self, queries, func):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            func(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def _report(self, label, samples):
+        self.stdout.write(
+            f'{label:<28} p50={_percentile(samples, 50):8.2f}ms '
+            f'p95={_percentile(samples, 95):8.2f}ms '
+            f'mean={statistics.mean(samples):8.2f}ms'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        total = options['products']
+        vocabulary = _vocabulary(rng, options['vocabulary'])
+
+        self.stdout.write(f'Database: {connection.vendor}, catalog size: {total}')
+
+        with transaction.atomic():
+            category = Category.objects.create(name=f'Benchmark {time.time()}')
+            branch = Branch.objects.create(
+                name='Benchmark', address='-', city='-', state='-', pincode='000000',
+                phone='0', email='bench@example.com',
+                opening_time='00:00', closing_time='23:59',
+            )
+
+            start = time.perf_counter()
+            juices = []
+            for i in range(total):
+                fruit_a, fruit_b = rng.sample(FRUITS, 2)
+                style = rng.choice(STYLES)
+                juices.append(Juice(
+                    category=category,
+                    name=f'{rng.choice(vocabulary).title()} {fruit_a.title()} {fruit_b.title()} {style.title()}',
+                    description=' '.join(rng.sample(WORDS, 4) + rng.sample(vocabulary, 3)),
+                    ingredients=f'{fruit_a}, {fruit_b}',
+                    features=rng.sample(WORDS, 2),
+                    price=rng.randint(40, 250),
+                    image='juices/benchmark.png',
+                ))
+            Juice.objects.bulk_create(juices, batch_size=2000)
+
+            juice_ids = Juice.objects.filter(category=category).values_list('id', flat=True)
+            BranchProduct.objects.bulk_create(
+                [BranchProduct(branch=branch, product_id=pk) for pk in juice_ids if pk % 2],
+                batch_size=2000
+            )
+            rebuild_search_index()
+            self.stdout.write(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+            # Selective terms hit ~0.1% of the catalog, broad ones ~10%
+            query_sets = {
+                'selective': [rng.choice(vocabulary) for _ in range(options['queries'])],
+                'broad': [
+                    rng.choice([rng.choice(FRUITS), f'{rng.choice(FRUITS)} {rng.choice(STYLES)}'])
+                    for _ in range(options['queries'])
+                ],
+            }
+
+            def icontains(query):
+                return list(
+                    Juice.objects.filter(
+                        Q(name__icontains=query) | Q(description__icontains=query),
+                        is_active=True
+                    ).values_list('id', flat=True)[:20]
+                )
+
+            for label, queries in query_sets.items():
+                self.stdout.write(f'\n{label} queries ({len(queries)})')
+                self._report('icontains scan', self._time(queries, icontains))
+                self._report('indexed search', self._time(queries, search_juice_ids))
+                self._report(
+                    'indexed search + branch',
+                    self._time(queries, lambda q: search_juice_ids(q, branch_id=branch.id))
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.cache import warm_catalog_cache
+
+
+class Command(BaseCommand):
+    help = 'Pre-build the cached catalog payloads (categories, branches, first menu pages)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            help='Host the cached pagination links should point at (defaults to CATALOG_CACHE_WARMUP_HOST)'
+        )
+
+    def handle(self, *args, **options):
+        warmed = warm_catalog_cache(host=options.get('host'))
+        self.stdout.write(self.style.SUCCESS(f'Catalog cache warmed: {warmed} payloads'))
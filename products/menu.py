@@ -0,0 +1,82 @@
+"""
+Branch "menu bundle": everything the Menu page needs for first paint.
+
+One payload holds the categories, every product available at the branch in
+compact form and the catalog version it was built from, so the client can
+filter by category locally. It is built with a fixed number of queries
+(branch, categories, products), rendered to JSON once and gzipped once;
+the cached bytes are served as-is on every request.
+"""
+import gzip
+
+from rest_framework import serializers
+
+from config.renderers import dumps
+
+from .availability import available_at
+from .cache import get_catalog_revision
+from .images import THUMBNAIL_WIDTH, image_srcset, image_url
+from .models import Branch, Category, Juice
+
+MENU_GZIP_LEVEL = 9
+
+
+class MenuJuiceSerializer(serializers.ModelSerializer):
+    """Compact product row; the category is sent once, in ``categories``"""
+    image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Juice
+        fields = [
+            'id',
+            'name',
+            'price',
+            'description',
+            'image',
+            'image_srcset',
+            'is_available',
+            'category_id',
+        ]
+
+    def get_image(self, obj):
+        return image_url(obj.image, THUMBNAIL_WIDTH)
+
+    def get_image_srcset(self, obj):
+        return image_srcset(obj.image)
+
+
+def build_branch_menu(branch_id):
+    """Return the menu payload for an active branch, or None if there is none"""
+    branch = Branch.objects.filter(id=branch_id, is_active=True).only('id', 'name').first()
+    if branch is None:
+        return None
+
+    products = Juice.objects.filter(available_at(branch.id), is_active=True).only(
+        'id', 'name', 'price', 'description', 'image', 'is_available', 'category_id'
+    ).order_by('id')
+    products = MenuJuiceSerializer(products, many=True).data
+
+    # Only offer filters that match at least one product here
+    stocked = {product['category_id'] for product in products}
+    categories = [
+        {'id': category_id, 'name': name}
+        for category_id, name in Category.objects.filter(is_active=True).values_list('id', 'name')
+        if category_id in stocked
+    ]
+
+    return {
+        'version': get_catalog_revision(),
+        'branch': {'id': branch.id, 'name': branch.name},
+        'categories': categories,
+        'products': products,
+    }
+
+
+def encode_menu(payload):
+    """Render a menu payload to JSON and gzip bytes, ready to be cached"""
+    body = dumps(payload)
+    return {
+        'json': body,
+        'gzip': gzip.compress(body, compresslevel=MENU_GZIP_LEVEL),
+    }
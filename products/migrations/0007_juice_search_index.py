@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Kept in step with products/search.py
+FTS_TABLE = 'products_juice_fts'
+
+POSTGRES_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(ingredients, '')), 'B') ||
+    setweight(jsonb_to_tsvector('english', coalesce(features, '[]'::jsonb), '["string"]'), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE products_juice ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX products_juice_search_vector_gin "
+            "ON products_juice USING GIN (search_vector)"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+            "USING fts5(name, description, ingredients, features)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, ingredients, features) "
+            "SELECT id, name, description, ingredients, "
+            "(SELECT group_concat(value, ' ') FROM json_each(features)) FROM products_juice"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS products_juice_search_vector_gin")
+        schema_editor.execute("ALTER TABLE products_juice DROP COLUMN IF EXISTS search_vector")
+    elif vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_category_updated_at_juice_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
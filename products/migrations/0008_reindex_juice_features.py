@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# Kept in step with FTS_ROWS_SQL in products/search.py
+FTS_TABLE = 'products_juice_fts'
+
+
+def reindex_features(apps, schema_editor):
+    # 0007 used to index features as their raw JSON text; store their words
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, description, ingredients, features) "
+        "SELECT id, name, description, ingredients, "
+        "(SELECT group_concat(value, ' ') FROM json_each(features)) FROM products_juice"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_juice_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,164 @@
+"""
+Full-text search over the juice catalog.
+
+PostgreSQL: products_juice carries a stored, generated ``search_vector``
+tsvector column with a GIN index (migration 0007).
+SQLite: an FTS5 table ``products_juice_fts`` whose rowid is the juice id,
+kept in sync by the Juice signals in products/signals.py.
+Any other backend falls back to a plain icontains scan.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Juice, BranchProduct
+
+FTS_TABLE = 'products_juice_fts'
+
+# Relative weight of each indexed column (name, description, ingredients, features)
+SQLITE_BM25_WEIGHTS = '10.0, 4.0, 4.0, 2.0'
+
+# The one definition of an FTS row, shared by index_juice() and
+# rebuild_search_index(): features are indexed as their words, not as the
+# stored JSON text, whose \uXXXX escapes would not match a search
+FTS_ROWS_SQL = f"""
+    INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, description, ingredients, features)
+    SELECT id, name, description, ingredients,
+           (SELECT group_concat(value, ' ') FROM json_each(features))
+    FROM {Juice._meta.db_table}
+"""
+
+
+def _terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def _sqlite_match(terms):
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _postgres_match(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _fallback_filter(terms):
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(name__icontains=term) |
+            Q(description__icontains=term) |
+            Q(ingredients__icontains=term)
+        )
+    return condition
+
+
+def search_juice_ids(query, branch_id=None, limit=20, offset=0):
+    """Return ids of active juices matching ``query``, best match first"""
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    juice_table = Juice._meta.db_table
+    branch_table = BranchProduct._meta.db_table
+    vendor = connection.vendor
+
+    if vendor not in ('postgresql', 'sqlite'):
+        juices = Juice.objects.filter(_fallback_filter(terms), is_active=True)
+        if branch_id:
+            juices = juices.filter(
+                branch_availability__branch_id=branch_id,
+                branch_availability__is_available=True
+            )
+        return list(juices.order_by('id').values_list('id', flat=True)[offset:offset + limit])
+
+    branch_sql = ''
+    params = []
+    if vendor == 'postgresql':
+        sql = f"""
+            SELECT j.id FROM {juice_table} j
+            WHERE j.search_vector @@ to_tsquery('english', %s) AND j.is_active
+        """
+        params.append(_postgres_match(terms))
+        order_sql = "ORDER BY ts_rank(j.search_vector, to_tsquery('english', %s)) DESC, j.id"
+        order_params = [_postgres_match(terms)]
+    else:
+        sql = f"""
+            SELECT j.id FROM {FTS_TABLE}
+            JOIN {juice_table} j ON j.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND j.is_active
+        """
+        params.append(_sqlite_match(terms))
+        order_sql = f"ORDER BY bm25({FTS_TABLE}, {SQLITE_BM25_WEIGHTS}), j.id"
+        order_params = []
+
+    if branch_id:
+        branch_sql = f"""
+            AND EXISTS (
+                SELECT 1 FROM {branch_table} bp
+                WHERE bp.product_id = j.id AND bp.branch_id = %s AND bp.is_available
+            )
+        """
+        params.append(branch_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"{sql} {branch_sql} {order_sql} LIMIT %s OFFSET %s",
+            params + order_params + [limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_juices(query, branch_id=None, limit=20, offset=0, queryset=None):
+    """Return matching Juice objects in rank order"""
+    ids = search_juice_ids(query, branch_id=branch_id, limit=limit, offset=offset)
+    if queryset is None:
+        queryset = Juice.objects.select_related('category')
+    juices = queryset.in_bulk(ids)
+    return [juices[pk] for pk in ids if pk in juices]
+
+
+def filter_by_search(queryset, query):
+    """Restrict a Juice queryset to search matches (unranked), using the index"""
+    terms = _terms(query)
+    if not terms:
+        return queryset
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {Juice._meta.db_table} WHERE search_vector @@ to_tsquery('english', %s)",
+            [_postgres_match(terms)]
+        ))
+    if vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [_sqlite_match(terms)]
+        ))
+    return queryset.filter(_fallback_filter(terms))
+
+
+def index_juice(juice):
+    """Write one juice into the SQLite FTS table (PostgreSQL indexes itself)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"{FTS_ROWS_SQL} WHERE id = %s", [juice.pk])
+
+
+def unindex_juice(juice_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [juice_id])
+
+
+def rebuild_search_index():
+    """Re-fill the SQLite FTS table from products_juice, e.g. after bulk_create()"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(FTS_ROWS_SQL)
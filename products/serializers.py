@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from config.serializers import SparseFieldsetMixin
+from .images import DETAIL_WIDTH, THUMBNAIL_WIDTH, image_srcset, image_url
 from .models import Category, Juice, Branch
 
 class BranchSerializer(serializers.ModelSerializer):
@@ -17,20 +19,20 @@ class CategoryMiniSerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name']
 
-class JuiceSerializer(serializers.ModelSerializer):
+class JuiceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category = CategoryMiniSerializer(read_only=True)
     image = serializers.SerializerMethodField()
     
+    image_srcset = serializers.SerializerMethodField()
+
+    # Pixel bound for `image`; list serializers override this with a thumbnail
+    image_width = DETAIL_WIDTH
+
     def get_image(self, obj):
-        if obj.image:
-            # Get the image name/path
-            image_path = str(obj.image)
-            # Remove 'media/' prefix if present  
-            if image_path.startswith('media/'):
-                image_path = image_path.replace('media/', '', 1)
-            # Return proper Cloudinary URL
-            return f"https://res.cloudinary.com/dxizjczfh/image/upload/{image_path}"
-        return None
+        return image_url(obj.image, self.image_width)
+
+    def get_image_srcset(self, obj):
+        return image_srcset(obj.image)
 
     class Meta:
         model = Juice
@@ -41,6 +43,7 @@ class JuiceSerializer(serializers.ModelSerializer):
             'description',
             'long_description',
             'image',
+            'image_srcset',
             'is_available',
             'category',
             'net_quantity_ml',
@@ -54,4 +57,36 @@ class JuiceSerializer(serializers.ModelSerializer):
             'nutrition_protein',
             'ingredients',
             'allergen_info'
-        ]
\ No newline at end of file
+        ]
+
+    @classmethod
+    def slim_queryset(cls, queryset, request=None):
+        """Fetch only the columns the requested fields render (QuerySet.only())"""
+        columns = ['id']
+        for name in cls.requested_field_names(request):
+            if name == 'category':
+                queryset = queryset.select_related('category')
+                columns += ['category', 'category__name']
+            elif name == 'image_srcset':
+                columns.append('image')
+            elif name != 'id':
+                columns.append(name)
+        return queryset.only(*columns)
+
+
+class JuiceListSerializer(JuiceSerializer):
+    """Compact juice card for list endpoints; use ?expand= or ?fields= for more"""
+
+    image_width = THUMBNAIL_WIDTH
+
+    class Meta(JuiceSerializer.Meta):
+        default_fields = [
+            'id',
+            'name',
+            'price',
+            'description',
+            'image',
+            'image_srcset',
+            'is_available',
+            'category',
+        ]
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+
+from .cache import bump_catalog_revision
+from .models import Category, Juice, Branch, BranchProduct
+from .search import index_juice, unindex_juice
+
+
+def catalog_changed(sender, **kwargs):
+    """Any write to a catalog model invalidates the cached catalog payloads"""
+    bump_catalog_revision()
+
+
+for model in (Category, Juice, Branch, BranchProduct):
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+
+
+def juice_saved(sender, instance, **kwargs):
+    """Keep the SQLite full-text index in step with the juice row"""
+    index_juice(instance)
+
+
+def juice_deleted(sender, instance, **kwargs):
+    unindex_juice(instance.pk)
+
+
+post_save.connect(juice_saved, sender=Juice, dispatch_uid='juice_search_index_save')
+post_delete.connect(juice_deleted, sender=Juice, dispatch_uid='juice_search_index_delete')
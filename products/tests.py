@@ -1,3 +1,522 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from config import middleware
+from config.middleware import CompressionMiddleware
+from config.renderers import ORJSONParser, ORJSONRenderer, dumps
+
+from . import availability
+from .cache import get_catalog_revision
+from .checks import check_shared_cache
+from .images import DETAIL_WIDTH, THUMBNAIL_WIDTH, _build_url
+from .models import Branch, BranchProduct, Category, Juice
+from .search import rebuild_search_index, search_juice_ids
+from .serializers import JuiceListSerializer, JuiceSerializer
+
+
+def _branch(name):
+    return Branch.objects.create(
+        name=name, address='a', city='c', state='s', pincode='500001',
+        phone='1', email=f'{name.lower()}@example.com', opening_time='08:00', closing_time='22:00'
+    )
+
+
+def _juice(category, name, description='d', **fields):
+    return Juice.objects.create(
+        category=category, name=name, description=description, price='40.00',
+        image='juices/a.png', **fields
+    )
+
+
+class CatalogCacheTests(TestCase):
+    """Catalog payloads are cached under the revision they were built from"""
+
+    def setUp(self):
+        cache.clear()
+        availability.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Fresh')
+        self.juice = _juice(self.category, 'Orange')
+
+    def test_cached_payload_is_served_without_queries(self):
+        first = self.client.get('/api/products/juices/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/juices/')
+        self.assertEqual(second.json(), first.json())
+
+    def test_catalog_write_rebuilds_the_payload(self):
+        self.client.get('/api/products/juices/')
+        revision = get_catalog_revision()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.juice.name = 'Blood Orange'
+            self.juice.save()
+
+        self.assertGreater(get_catalog_revision(), revision)
+        response = self.client.get('/api/products/juices/')
+        self.assertEqual(response.json()['results'][0]['name'], 'Blood Orange')
+
+    def test_revision_is_bumped_only_on_commit(self):
+        revision = get_catalog_revision()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.juice.save()
+        self.assertEqual(get_catalog_revision(), revision)
+        self.assertTrue(callbacks)
+
+    def test_unknown_branch_is_not_cached(self):
+        self.assertEqual(self.client.get('/api/products/branches/999/products/').status_code, 404)
+        branch = Branch.objects.create(
+            id=999, name='Late', address='a', city='c', state='s', pincode='500001',
+            phone='1', email='late@example.com', opening_time='08:00', closing_time='22:00'
+        )
+        BranchProduct.objects.create(branch=branch, product=self.juice)
+        self.assertEqual(self.client.get('/api/products/branches/999/products/').status_code, 200)
+
+
+class CatalogPaginationTests(TestCase):
+    """Page-number and keyset pagination on the list endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        availability.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        self.juices = [_juice(category, name) for name in ('Apple', 'Beet', 'Carrot')]
+        self.branch = _branch('Main')
+        for juice in self.juices[:2]:
+            BranchProduct.objects.create(branch=self.branch, product=juice)
+        BranchProduct.objects.create(branch=self.branch, product=self.juices[2], is_available=False)
+
+    def test_cursor_pages_walk_the_whole_list(self):
+        response = self.client.get('/api/products/juices/', {'cursor': '', 'page_size': 2})
+        page = response.json()
+        self.assertNotIn('count', page)
+        self.assertEqual([item['id'] for item in page['results']], [j.id for j in self.juices[:2]])
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual([item['id'] for item in page['results']], [self.juices[2].id])
+        self.assertIsNone(page['next'])
+
+    def test_page_number_pagination_stays_the_default(self):
+        page = self.client.get('/api/products/juices/', {'page_size': 2}).json()
+        self.assertEqual(page['count'], 3)
+        self.assertEqual(len(page['results']), 2)
+
+    def test_branch_products_lists_only_available_products(self):
+        page = self.client.get(f'/api/products/branches/{self.branch.id}/products/').json()
+        self.assertEqual(page['count'], 2)
+        self.assertEqual([item['id'] for item in page['results']], [j.id for j in self.juices[:2]])
+
+    def test_branch_products_pages_in_sql(self):
+        url = f'/api/products/branches/{self.branch.id}/products/'
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(url, {'page_size': 1}).json()
+        self.assertEqual([item['id'] for item in page['results']], [self.juices[0].id])
+
+        # Only the requested page of juices is read, joined to availability in SQL
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT "products_juice"."id"')]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('LIMIT 1', reads[0])
+        self.assertIn('EXISTS', reads[0])
+        self.assertNotIn('"products_juice"."id" IN', reads[0])
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified validators answer unchanged reads with 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        self.juice = _juice(category, 'Orange')
+
+    def test_unchanged_catalog_answers_304(self):
+        response = self.client.get('/api/products/juices/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/juices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(
+            '/api/products/juices/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_write_changes_the_etag(self):
+        etag = self.client.get('/api/products/juices/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.juice.save()
+
+        response = self.client.get('/api/products/juices/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edit_within_the_same_second_is_not_a_304(self):
+        with mock.patch('products.cache.time.time', return_value=1_700_000_000.2):
+            last_modified = self.client.get('/api/products/juices/')['Last-Modified']
+        self.assertEqual(
+            self.client.get('/api/products/juices/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304
+        )
+
+        with mock.patch('products.cache.time.time', return_value=1_700_000_000.7):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.juice.save()
+            response = self.client.get('/api/products/juices/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_juice_detail_validator_follows_the_row(self):
+        url = f'/api/products/juices/{self.juice.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.juice.price = '42.00'
+        self.juice.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SparseFieldsetTests(TestCase):
+    """The slim list card and ?fields= / ?expand= on the list endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        self.juice = _juice(category, 'Apple', ingredients='Apple pulp')
+
+    def test_list_card_leaves_out_detail_fields(self):
+        card = self.client.get('/api/products/juices/').json()['results'][0]
+        self.assertNotIn('ingredients', card)
+        self.assertNotIn('benefits', card)
+        self.assertEqual(card['category'], {'id': self.juice.category_id, 'name': 'Fresh'})
+
+        detail = self.client.get(f'/api/products/juices/{self.juice.id}/').json()
+        self.assertEqual(detail['ingredients'], 'Apple pulp')
+
+    def test_fields_trims_the_body(self):
+        page = self.client.get('/api/products/juices/', {'fields': 'id,name'}).json()
+        self.assertEqual(page['results'][0], {'id': self.juice.id, 'name': 'Apple'})
+
+    def test_expand_adds_to_the_default_card(self):
+        plain = self.client.get('/api/products/juices/').json()['results'][0]
+        expanded = self.client.get('/api/products/juices/', {'expand': 'ingredients'}).json()['results'][0]
+        self.assertEqual(expanded['ingredients'], 'Apple pulp')
+        self.assertEqual(set(expanded) - set(plain), {'ingredients'})
+
+
+class SearchTests(TestCase):
+    """The SQLite FTS5 index, its ranking and the branch filter"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        self.in_description = _juice(category, 'Sunrise', description='Orange with a little mango')
+        self.in_name = _juice(category, 'Mango Cooler')
+        self.other = _juice(category, 'Watermelon')
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(search_juice_ids('mango'), [self.in_name.id, self.in_description.id])
+
+    def test_terms_match_as_prefixes(self):
+        self.assertEqual(search_juice_ids('water'), [self.other.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.other.name = 'Kiwi Punch'
+        self.other.save()
+        self.assertEqual(search_juice_ids('kiwi'), [self.other.id])
+        self.assertEqual(search_juice_ids('watermelon'), [])
+
+        self.other.delete()
+        self.assertEqual(search_juice_ids('kiwi'), [])
+
+    def test_features_index_the_same_on_save_and_rebuild(self):
+        # Stored as JSON, "Açaí" is "A\u00e7a\u00ed"; the index must hold the words
+        self.other.features = ['Açaí blend']
+        self.other.save()
+        self.assertEqual(search_juice_ids('açaí'), [self.other.id])
+
+        rebuild_search_index()
+        self.assertEqual(search_juice_ids('açaí'), [self.other.id])
+        self.assertEqual(search_juice_ids('mango'), [self.in_name.id, self.in_description.id])
+
+    def test_inactive_juices_are_not_found(self):
+        self.in_name.is_active = False
+        self.in_name.save()
+        self.assertEqual(search_juice_ids('mango'), [self.in_description.id])
+
+    def test_branch_filter_keeps_available_products(self):
+        branch = _branch('Main')
+        BranchProduct.objects.create(branch=branch, product=self.in_description)
+        BranchProduct.objects.create(branch=branch, product=self.in_name, is_available=False)
+        self.assertEqual(search_juice_ids('mango', branch_id=branch.id), [self.in_description.id])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        self.assertEqual(search_juice_ids('(mango" -'), [self.in_name.id, self.in_description.id])
+        self.assertEqual(search_juice_ids('*'), [])
+
+    def test_endpoint_pages_results(self):
+        response = self.client.get('/api/products/search/', {'q': 'mango', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['has_more'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.in_name.id])
+
+        response = self.client.get('/api/products/search/', {'q': 'mango', 'limit': 1, 'offset': 1})
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.in_description.id])
+
+    def test_endpoint_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/products/search/').status_code, 400)
+        response = self.client.get('/api/products/search/', {'q': 'mango', 'branch_id': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CLOUDINARY_STORAGE={'CLOUD_NAME': 'demo'})
+class ImageURLTests(TestCase):
+    """Width-bounded Cloudinary variants for list, detail and srcset"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        self.juice = _juice(category, 'Orange')
+
+    def variant(self, width, path='juices/a.png'):
+        return f'https://res.cloudinary.com/demo/image/upload/w_{width},c_limit,f_auto,q_auto/{path}'
+
+    def test_list_card_gets_the_thumbnail(self):
+        card = JuiceListSerializer(self.juice).data
+        self.assertEqual(THUMBNAIL_WIDTH, 400)
+        self.assertEqual(card['image'], self.variant(400))
+        self.assertEqual(card['image_srcset'], {
+            '200w': self.variant(200), '400w': self.variant(400), '800w': self.variant(800),
+        })
+
+        card = self.client.get('/api/products/juices/').json()['results'][0]
+        self.assertEqual(card['image'], self.variant(400))
+
+    def test_detail_gets_the_large_image(self):
+        self.assertEqual(DETAIL_WIDTH, 1200)
+        self.assertEqual(JuiceSerializer(self.juice).data['image'], self.variant(1200))
+
+        detail = self.client.get(f'/api/products/juices/{self.juice.id}/').json()
+        self.assertEqual(detail['image'], self.variant(1200))
+
+    def test_legacy_media_prefix_is_dropped(self):
+        self.juice.image = 'media/juices/old.png'
+        self.assertEqual(JuiceListSerializer(self.juice).data['image'], self.variant(400, 'juices/old.png'))
+
+    def test_urls_are_memoized(self):
+        JuiceListSerializer(self.juice).data
+        hits = _build_url.cache_info().hits
+        JuiceListSerializer(self.juice).data
+        # image plus the three srcset widths
+        self.assertEqual(_build_url.cache_info().hits - hits, 4)
+
+
+class BranchMenuTests(TestCase):
+    """The pre-compressed menu bundle"""
+
+    def setUp(self):
+        cache.clear()
+        availability.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Fresh')
+        Category.objects.create(name='Empty')
+        self.juice = _juice(category, 'Orange')
+        self.branch = _branch('Main')
+        BranchProduct.objects.create(branch=self.branch, product=self.juice)
+        self.url = f'/api/products/branches/{self.branch.id}/menu/'
+
+    def test_menu_lists_stocked_categories_and_products(self):
+        menu = self.client.get(self.url).json()
+        self.assertEqual(menu['branch'], {'id': self.branch.id, 'name': 'Main'})
+        self.assertEqual([product['id'] for product in menu['products']], [self.juice.id])
+        self.assertEqual([category['name'] for category in menu['categories']], ['Fresh'])
+        self.assertEqual(menu['version'], get_catalog_revision())
+
+    def test_gzip_body_is_the_same_menu(self):
+        identity = self.client.get(self.url)
+        self.assertFalse(identity.has_header('Content-Encoding'))
+
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), identity.json())
+
+    def test_products_are_filtered_in_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT "products_juice"."id"')]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('EXISTS', reads[0])
+
+    def test_built_once_per_revision(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_gzip_body_has_a_weak_etag(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(self.client.get(self.url)['ETag'].startswith('"'))
+
+    def test_each_encoding_revalidates_with_its_own_etag(self):
+        identity = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        for etag, encoding in ((identity['ETag'], ''), (compressed['ETag'], 'gzip')):
+            with self.subTest(encoding=encoding):
+                response = self.client.get(
+                    self.url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING=encoding
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_unknown_branch(self):
+        self.assertEqual(self.client.get('/api/products/branches/999/menu/').status_code, 404)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_types_render_like_drf(self):
+        data = {
+            'price': Decimal('45.50'),
+            'at': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            'label': gettext_lazy('Fresh'),
+            1: 'non-string key',
+        }
+        self.assertEqual(
+            json.loads(dumps(data)),
+            {'price': 45.5, 'at': '2026-01-02T03:04:05Z', 'label': 'Fresh', '1': 'non-string key'}
+        )
+
+    def test_renderer(self):
+        renderer = ORJSONRenderer()
+        self.assertEqual(renderer.render(None), b'')
+        self.assertEqual(renderer.render({'a': [1, 2]}), b'{"a":[1,2]}')
+        self.assertIn(b'\n  ', renderer.render({'a': 1}, 'application/json; indent=2'))
+
+    def test_parser(self):
+        from io import BytesIO
+
+        parser = ORJSONParser()
+        self.assertEqual(parser.parse(BytesIO(b'{"quantity": 2}')), {'quantity': 2})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"quantity": '))
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_LENGTH=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    body = {'items': [{'name': 'Orange', 'price': 45.5}] * 20}
+
+    def process(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response).process_response(request, response)
+
+    def test_large_json_is_gzipped(self):
+        response = JsonResponse(self.body)
+        response['ETag'] = '"catalog-1"'
+        response = self.process(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"catalog-1"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_brotli_is_preferred_when_available(self):
+        if middleware.brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.process(JsonResponse(self.body), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(middleware.brotli.decompress(response.content)), self.body)
+
+    def test_gzip_without_brotli(self):
+        with mock.patch.object(middleware, 'brotli', None):
+            response = self.process(JsonResponse(self.body), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_identity_response_still_varies(self):
+        response = self.process(JsonResponse(self.body), '')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_other_and_encoded_bodies_pass_through(self):
+        small = self.process(JsonResponse({'ok': True}))
+        html = self.process(HttpResponse('x' * 500, content_type='text/html'))
+        encoded = HttpResponse(b'already', content_type='application/json')
+        encoded['Content-Encoding'] = 'gzip'
+        encoded = self.process(encoded)
+
+        for response in (small, html, encoded):
+            self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(encoded.content, b'already')
+
+
+class AvailabilityIndexTests(TestCase):
+    """The per-process index reloads when, and only when, the revision moves"""
+
+    def setUp(self):
+        cache.clear()
+        availability.clear()
+        category = Category.objects.create(name='Fresh')
+        self.juice = _juice(category, 'Orange')
+        self.branch = _branch('Main')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.line = BranchProduct.objects.create(branch=self.branch, product=self.juice)
+
+    def test_lookups_reuse_the_loaded_index(self):
+        self.assertTrue(availability.is_available(self.branch.id, self.juice.id))
+        with self.assertNumQueries(0):
+            self.assertEqual(availability.available_product_ids(self.branch.id), {self.juice.id})
+            self.assertEqual(availability.available_product_ids(self.branch.id + 1), frozenset())
+
+    def test_committed_change_reloads_the_index(self):
+        self.assertTrue(availability.is_available(self.branch.id, self.juice.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.line.is_available = False
+            self.line.save()
+
+        self.assertFalse(availability.is_available(self.branch.id, self.juice.id))
+        self.assertEqual(
+            availability.unavailable_product_ids(str(self.branch.id), [self.juice.id]), [self.juice.id]
+        )
+
+    def test_delete_reloads_the_index(self):
+        self.assertTrue(availability.is_available(self.branch.id, self.juice.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.line.delete()
+        self.assertFalse(availability.is_available(self.branch.id, self.juice.id))
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_warns(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['products.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    }})
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CategoryListAPIView, JuiceListAPIView, JuiceDetailAPIView, BranchListAPIView, BranchProductsAPIView
+from .views import CategoryListAPIView, JuiceListAPIView, JuiceDetailAPIView, BranchListAPIView, BranchProductsAPIView, BranchMenuAPIView, JuiceSearchAPIView
 from .views_admin import (
     ToggleJuiceAvailabilityAPIView,
     ToggleJuiceActiveAPIView,
@@ -10,10 +10,12 @@ urlpatterns = [
     path('categories/', CategoryListAPIView.as_view(), name='category-list'),
     path('juices/', JuiceListAPIView.as_view(), name='juice-list'),
     path('juices/<int:pk>/', JuiceDetailAPIView.as_view(), name='juice-detail'),
+    path('search/', JuiceSearchAPIView.as_view(), name='juice-search'),
     
     # Branch APIs
     path('branches/', BranchListAPIView.as_view(), name='branch-list'),
     path('branches/<int:branch_id>/products/', BranchProductsAPIView.as_view(), name='branch-products'),
+    path('branches/<int:branch_id>/menu/', BranchMenuAPIView.as_view(), name='branch-menu'),
     
     # Admin APIs
     path('admin/juices/<int:pk>/toggle-availability/', ToggleJuiceAvailabilityAPIView.as_view(), name='toggle-juice-availability'),
@@ -1,54 +1,100 @@
+import re
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
-from .models import Juice, Category, Branch, BranchProduct
-from .serializers import JuiceSerializer, CategorySerializer, BranchSerializer
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from django.http import HttpResponse
+from .models import Juice, Category, Branch
+from .serializers import JuiceSerializer, JuiceListSerializer, CategorySerializer, BranchSerializer
+from .search import search_juices
+from .availability import available_at
+from .menu import build_branch_menu, encode_menu
+from .cache import (
+    get_cached_payload,
+    catalog_params,
+    conditional_get,
+    catalog_etag,
+    catalog_last_modified,
+    juice_etag,
+    juice_last_modified,
+)
 from django.shortcuts import get_object_or_404
 
 class CategoryListAPIView(APIView):
 
+    @conditional_get(catalog_etag, catalog_last_modified)
     def get(self, request):
-        categories = Category.objects.filter(is_active=True)
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            categories = Category.objects.filter(is_active=True)
+            return CategorySerializer(categories, many=True).data
+
+        data = get_cached_payload('categories', build)
+        return Response(data, status=status.HTTP_200_OK)
 
 class JuicePagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+class JuiceCursorPagination(CursorPagination):
+    """Keyset pagination on id - no OFFSET scan and no COUNT(*)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = 'id'
+
+def get_juice_paginator(request):
+    """Opt into keyset pagination with ?cursor= (an empty value starts at the first page)"""
+    if 'cursor' in request.query_params:
+        return JuiceCursorPagination()
+    return JuicePagination()
+
 class JuiceListAPIView(APIView):
     pagination_class = JuicePagination
 
+    @conditional_get(catalog_etag, catalog_last_modified)
     def get(self, request):
-        category_id = request.query_params.get('category_id')
+        def build():
+            category_id = request.query_params.get('category_id')
+
+            juices = JuiceListSerializer.slim_queryset(
+                Juice.objects.filter(is_active=True), request
+            ).order_by('id')
 
-        juices = Juice.objects.filter(is_active=True)
+            if category_id:
+                juices = juices.filter(category_id=category_id)
 
-        if category_id:
-            juices = juices.filter(category_id=category_id)
+            paginator = get_juice_paginator(request)
+            paginated_juices = paginator.paginate_queryset(juices, request)
+            serializer = JuiceListSerializer(
+                paginated_juices, many=True, context={'request': request}
+            )
+            return paginator.get_paginated_response(serializer.data).data
 
-        paginator = JuicePagination()
-        paginated_juices = paginator.paginate_queryset(juices, request)
-        serializer = JuiceSerializer(paginated_juices, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        return Response(get_cached_payload('juices', build, **catalog_params(request)))
 
 
 class JuiceDetailAPIView(APIView):
 
+    @conditional_get(juice_etag, juice_last_modified)
     def get(self, request, pk):
-        juice = get_object_or_404(Juice, pk=pk, is_active=True)
-        serializer = JuiceSerializer(juice)
-        return Response(serializer.data)
+        def build():
+            juice = get_object_or_404(Juice.objects.select_related('category'), pk=pk, is_active=True)
+            return JuiceSerializer(juice, context={'request': request}).data
+
+        return Response(get_cached_payload('juice-detail', build, **catalog_params(request, pk=pk)))
 
 
 class BranchListAPIView(APIView):
     """Get all active branches"""
+    @conditional_get(catalog_etag, catalog_last_modified)
     def get(self, request):
-        branches = Branch.objects.filter(is_active=True).order_by('city', 'name')
-        serializer = BranchSerializer(branches, many=True)
-        return Response(serializer.data)
+        def build():
+            branches = Branch.objects.filter(is_active=True).order_by('city', 'name')
+            return BranchSerializer(branches, many=True).data
+
+        return Response(get_cached_payload('branches', build))
 
 
 
@@ -57,32 +103,122 @@ class BranchProductsAPIView(APIView):
     """Get all available products for a specific branch with pagination"""
     pagination_class = JuicePagination
     
+    @conditional_get(catalog_etag, catalog_last_modified)
     def get(self, request, branch_id):
-        try:
-            branch = Branch.objects.get(id=branch_id, is_active=True)
-        except Branch.DoesNotExist:
+        def build():
+            try:
+                branch = Branch.objects.get(id=branch_id, is_active=True)
+            except Branch.DoesNotExist:
+                return None
+
+            # Get only products available at this branch; paginated in SQL
+            products = JuiceListSerializer.slim_queryset(
+                Juice.objects.filter(available_at(branch.id), is_active=True), request
+            ).order_by('id')
+
+            # Filter by category if provided
+            category_id = request.query_params.get('category_id')
+            if category_id:
+                products = products.filter(category_id=category_id)
+
+            # Apply pagination
+            paginator = get_juice_paginator(request)
+            paginated_products = paginator.paginate_queryset(products, request)
+            serializer = JuiceListSerializer(
+                paginated_products, many=True, context={'request': request}
+            )
+
+            return paginator.get_paginated_response(serializer.data).data
+
+        data = get_cached_payload(
+            'branch-products', build, **catalog_params(request, branch_id=branch_id)
+        )
+        if data is None:
             return Response(
                 {'error': 'Branch not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Get only available products at this branch
-        branch_products = BranchProduct.objects.filter(
-            branch=branch,
-            is_available=True,
-            product__is_active=True
-        ).select_related('product', 'product__category')
-        
-        # Filter by category if provided
-        category_id = request.query_params.get('category_id')
-        if category_id:
-            branch_products = branch_products.filter(product__category_id=category_id)
-        
-        products = [bp.product for bp in branch_products]
-        
-        # Apply pagination
-        paginator = JuicePagination()
-        paginated_products = paginator.paginate_queryset(products, request)
-        serializer = JuiceSerializer(paginated_products, many=True)
-        
-        return paginator.get_paginated_response(serializer.data)
+        return Response(data)
+
+
+_gzip = re.compile(r'\bgzip\b')
+
+
+def _accepts_gzip(request):
+    return _gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')) is not None
+
+
+def menu_etag(request, *args, **kwargs):
+    """The catalog ETag, weakened for the gzip body as config/middleware.py does (RFC 9110 8.8.3)"""
+    etag = catalog_etag(request)
+    return f'W/{etag}' if etag and _accepts_gzip(request) else etag
+
+
+class BranchMenuAPIView(APIView):
+    """Categories and every available product of a branch in one pre-compressed response"""
+
+    @conditional_get(menu_etag, catalog_last_modified, vary=('Accept-Encoding',))
+    def get(self, request, branch_id):
+        def build():
+            payload = build_branch_menu(branch_id)
+            return encode_menu(payload) if payload is not None else None
+
+        encoded = get_cached_payload('branch-menu', build, branch_id=branch_id)
+        if encoded is None:
+            return Response(
+                {'error': 'Branch not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if _accepts_gzip(request):
+            response = HttpResponse(encoded['gzip'], content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(encoded['json'], content_type='application/json')
+        return response
+
+
+class JuiceSearchAPIView(APIView):
+    """Ranked full-text search over active juices, optionally limited to a branch"""
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Search query (q) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+            offset = int(request.query_params.get('offset', 0))
+            branch_id = request.query_params.get('branch_id')
+            branch_id = int(branch_id) if branch_id else None
+        except ValueError:
+            return Response(
+                {'error': 'limit, offset and branch_id must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if limit < 1 or offset < 0:
+            return Response(
+                {'error': 'limit must be positive and offset non-negative'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Fetch one extra row to know whether another page exists
+        juices = search_juices(
+            query,
+            branch_id=branch_id,
+            limit=limit + 1,
+            offset=offset,
+            queryset=JuiceListSerializer.slim_queryset(Juice.objects.all(), request)
+        )
+        serializer = JuiceListSerializer(
+            juices[:limit], many=True, context={'request': request}
+        )
+        return Response({
+            'query': query,
+            'has_more': len(juices) > limit,
+            'results': serializer.data,
+        })
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from django.utils import timezone
+from .models import OutboundEmail, User
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -61,3 +62,19 @@ class UserAdmin(BaseUserAdmin):
         self.message_user(request, f'{updated} user(s) OTP lock reset.')
     reset_otp_lock.short_description = 'Reset OTP lock for selected users'
 
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} email(s) queued for another try.')
+    retry_now.short_description = 'Retry selected emails now'
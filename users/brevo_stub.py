@@ -0,0 +1,93 @@
+"""
+Local stand-in for the Brevo transactional email API.
+
+Accepts ``POST /v3/smtp/email`` on 127.0.0.1 and answers like Brevo does,
+optionally after a fixed delay, so email throughput can be measured and
+tested without network access or an API key:
+
+    with BrevoStubServer(latency=0.02) as stub:
+        settings.BREVO_API_URL = stub.url
+        ...
+    stub.requests, stub.connections
+
+Nothing is delivered anywhere.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive; without TCP_NODELAY
+    # the separate header and body writes stall on delayed ACKs when reused
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.server.lock:
+            self.server.requests.append(body)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.path.rstrip('/') != '/v3/smtp/email':
+            status, reply = 404, {'code': 'not_found', 'message': 'Invalid URL'}
+        elif self.headers.get('api-key') in (None, ''):
+            status, reply = 401, {'code': 'unauthorized', 'message': 'Key not found'}
+        elif 'messageVersions' in body:
+            status, reply = 201, {'messageIds': [f'<{uuid.uuid4()}@stub>' for _ in body['messageVersions']]}
+        else:
+            status, reply = 201, {'messageId': f'<{uuid.uuid4()}@stub>'}
+
+        payload = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BrevoStubServer:
+    """Runs the stub on a free local port in a background thread"""
+
+    def __init__(self, latency=0.0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.connections = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/v3'
+
+    @property
+    def requests(self):
+        """JSON bodies received so far"""
+        return self.server.requests
+
+    @property
+    def connections(self):
+        """TCP connections accepted so far"""
+        return self.server.connections
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -3,12 +3,61 @@ Brevo API email sending utility.
 Uses HTTP API instead of SMTP to bypass Railway's SMTP port blocking.
 """
 import logging
-from decouple import config
+import threading
+from collections import defaultdict
+from email.utils import parseaddr
+
 import sib_api_v3_sdk
+from django.conf import settings
 from sib_api_v3_sdk.rest import ApiException
 
 logger = logging.getLogger(__name__)
 
+# Brevo accepts at most this many message versions in one call
+MAX_MESSAGE_VERSIONS = 1000
+
+_client_lock = threading.Lock()
+_client = None
+
+
+def get_brevo_client():
+    """
+    The process-wide Brevo client, created on first use.
+
+    One ApiClient means one urllib3 pool, so connections to Brevo are kept
+    alive and reused across emails and worker threads.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                configuration = sib_api_v3_sdk.Configuration()
+                configuration.api_key['api-key'] = settings.BREVO_API_KEY
+                configuration.host = settings.BREVO_API_URL
+                configuration.connection_pool_maxsize = settings.BREVO_POOL_SIZE
+                _client = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+    return _client
+
+
+def reset_brevo_client():
+    """Drop the shared client; the next send builds a new one from settings"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def _sender():
+    name, email = parseaddr(settings.DEFAULT_FROM_EMAIL)
+    return {"name": name or "PeelOJuice", "email": email}
+
+
+def _send(send_smtp_email):
+    return get_brevo_client().send_transac_email(
+        send_smtp_email,
+        _request_timeout=(settings.BREVO_CONNECT_TIMEOUT, settings.BREVO_READ_TIMEOUT)
+    )
+
+
 def send_email_via_brevo_api(to_email, subject, text_content, html_content=None):
     """
     Send email using Brevo's HTTP API instead of SMTP.
@@ -23,33 +72,13 @@ def send_email_via_brevo_api(to_email, subject, text_content, html_content=None)
         tuple: (success: bool, message: str)
     """
     try:
-        # Configure API key authorization
-        configuration = sib_api_v3_sdk.Configuration()
-        configuration.api_key['api-key'] = config('BREVO_API_KEY')
-        
-        # Create an instance of the API class
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-        
-        # Set up sender
-        sender = {
-            "name": "PeelOJuice",
-            "email": config('DEFAULT_FROM_EMAIL', default='peelojuice0@gmail.com')
-        }
-        
-        # Set up recipient
-        to = [{"email": to_email}]
-        
-        # Create email  payload
-        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-            to=to,
-            sender=sender,
+        api_response = _send(sib_api_v3_sdk.SendSmtpEmail(
+            to=[{"email": to_email}],
+            sender=_sender(),
             subject=subject,
             text_content=text_content,
             html_content=html_content or text_content
-        )
-        
-        # Send email
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        ))
         
         logger.info(f"Email sent successfully via Brevo API to {to_email}. Message ID: {api_response.message_id}")
         return True, f"Email sent successfully (ID: {api_response.message_id})"
@@ -64,9 +93,60 @@ def send_email_via_brevo_api(to_email, subject, text_content, html_content=None)
         return False, error_msg
 
 
+def _send_versions(messages):
+    """One API call for messages that share their content, one message version each"""
+    _, _, text_content, html_content = messages[0]
+    try:
+        _send(sib_api_v3_sdk.SendSmtpEmail(
+            sender=_sender(),
+            subject=messages[0][1],
+            text_content=text_content,
+            html_content=html_content or text_content,
+            message_versions=[
+                sib_api_v3_sdk.SendSmtpEmailMessageVersions(to=[{"email": to_email}], subject=subject)
+                for to_email, subject, _, _ in messages
+            ]
+        ))
+        return [(True, f"Email sent successfully in a batch of {len(messages)}")] * len(messages)
+    except ApiException as e:
+        error_msg = f"Brevo API error: {e}"
+    except Exception as e:
+        error_msg = f"Unexpected error sending email: {str(e)}"
+    logger.error(f"Batch of {len(messages)} emails failed: {error_msg}")
+    return [(False, error_msg)] * len(messages)
+
+
+def send_emails_via_brevo_api(messages):
+    """
+    Send many emails with as few API calls as possible.
+
+    ``messages`` is a list of ``(to_email, subject, text_content, html_content)``.
+    Messages with the same content go out together as message versions of one
+    call (each with its own recipient and subject); the rest are sent one by
+    one over the shared client.
+
+    Returns a ``(success, message)`` pair per message, in order.
+    """
+    groups = defaultdict(list)
+    for index, (to_email, subject, text_content, html_content) in enumerate(messages):
+        groups[(text_content, html_content or '')].append(index)
+
+    results = [None] * len(messages)
+    for indexes in groups.values():
+        for start in range(0, len(indexes), MAX_MESSAGE_VERSIONS):
+            chunk = indexes[start:start + MAX_MESSAGE_VERSIONS]
+            if len(chunk) == 1:
+                outcomes = [send_email_via_brevo_api(*messages[chunk[0]])]
+            else:
+                outcomes = _send_versions([messages[index] for index in chunk])
+            for index, outcome in zip(chunk, outcomes):
+                results[index] = outcome
+    return results
+
+
 def send_otp_email_api(email, otp, purpose="verification"):
     """
-    Send OTP email using Brevo API.
+    Queue an OTP email in the outbox (see users/outbox.py).
     
     Args:
         email: Recipient email
@@ -74,7 +154,7 @@ def send_otp_email_api(email, otp, purpose="verification"):
         purpose: "verification", "password_reset", or "resend"
         
     Returns:
-        bool: True if sent successfully, False otherwise
+        bool: True once the email is queued
     """
     subject_map = {
         "verification": "Verify your email - PeelOJuice",
@@ -126,12 +206,9 @@ PeelOJuice Team
     subject = subject_map.get(purpose, "Your OTP - PeelOJuice")
     message = message_map.get(purpose, f"Your OTP is: {otp}")
     
-    logger.info(f"Attempting to send {purpose} email to {email} via Brevo API")
-    success, result_msg = send_email_via_brevo_api(email, subject, message)
-    
-    if success:
-        logger.info(f"Successfully sent {purpose} email to {email}")
-    else:
-        logger.error(f"Failed to send {purpose} email to {email}: {result_msg}")
-    
-    return success
+    # Delivered by the email worker, so the request never waits on Brevo
+    from .outbox import enqueue_email
+
+    enqueue_email(email, subject, message, kind=f"otp_{purpose}")
+    logger.info(f"Queued {purpose} email to {email}")
+    return True
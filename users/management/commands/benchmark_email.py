@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import sib_api_v3_sdk
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.brevo_stub import BrevoStubServer
+from users.email_api import reset_brevo_client, send_email_via_brevo_api, send_emails_via_brevo_api
+
+
+def _legacy_send(url, to_email, subject, text_content):
+    # What send_email_via_brevo_api used to do: a new configuration, client and pool per email
+    configuration = sib_api_v3_sdk.Configuration()
+    configuration.api_key['api-key'] = 'stub'
+    configuration.host = url
+    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+    api_instance.send_transac_email(sib_api_v3_sdk.SendSmtpEmail(
+        to=[{"email": to_email}],
+        sender={"name": "PeelOJuice", "email": "bench@example.com"},
+        subject=subject,
+        text_content=text_content,
+        html_content=text_content
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure email throughput against a local Brevo stub server: a new client per '
+        'email (old behaviour), the pooled client, the pooled client over threads, and '
+        'batched message versions. Nothing leaves the machine.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.01, help='Stub response delay in seconds')
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        count = options['emails']
+        messages = [
+            (f'user{n}@example.com', f'Your order #{n}', 'Thanks for your order!', None)
+            for n in range(count)
+        ]
+
+        self.stdout.write(f'{count} emails, stub latency {options["latency"] * 1000:.0f} ms')
+        self.stdout.write(f'{"mode":<24}{"seconds":>9}{"emails/s":>10}{"requests":>10}{"connections":>13}')
+
+        runs = [
+            ('client per email', lambda url: [_legacy_send(url, *message[:3]) for message in messages]),
+            ('pooled client', lambda url: [send_email_via_brevo_api(*message) for message in messages]),
+            (f'pooled x{options["concurrency"]} threads', lambda url: list(
+                ThreadPoolExecutor(options['concurrency']).map(
+                    lambda message: send_email_via_brevo_api(*message), messages
+                )
+            )),
+            ('message versions', lambda url: send_emails_via_brevo_api(messages)),
+        ]
+
+        for label, run in runs:
+            with BrevoStubServer(latency=options['latency']) as stub:
+                with override_settings(BREVO_API_URL=stub.url, BREVO_API_KEY='stub',
+                                       BREVO_POOL_SIZE=max(options['concurrency'], 1)):
+                    reset_brevo_client()
+                    start = time.perf_counter()
+                    run(stub.url)
+                    elapsed = time.perf_counter() - start
+                    reset_brevo_client()
+
+                self.stdout.write(
+                    f'{label:<24}{elapsed:9.3f}{count / elapsed:10.0f}'
+                    f'{len(stub.requests):10d}{stub.connections:13d}'
+                )
@@ -0,0 +1,56 @@
+import select
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users.outbox import CHANNEL, drain
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox (runs until stopped; see users/outbox.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send everything that is due, then exit')
+        parser.add_argument('--batch-size', type=int, help='Emails claimed per batch (EMAIL_WORKER_BATCH_SIZE)')
+        parser.add_argument('--concurrency', type=int, help='Parallel sends per batch (EMAIL_WORKER_CONCURRENCY)')
+        parser.add_argument(
+            '--poll-interval', type=float,
+            help='Seconds between outbox checks when idle (EMAIL_WORKER_POLL_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        concurrency = options['concurrency']
+        poll_interval = options['poll_interval'] or settings.EMAIL_WORKER_POLL_INTERVAL
+
+        if options['once']:
+            sent = drain(batch_size, concurrency)
+            self.stdout.write(self.style.SUCCESS(f'Processed {sent} emails'))
+            return
+
+        self.stdout.write(f'Email worker started (batch {batch_size or settings.EMAIL_WORKER_BATCH_SIZE}, '
+                          f'concurrency {concurrency or settings.EMAIL_WORKER_CONCURRENCY})')
+        try:
+            while True:
+                processed = drain(batch_size, concurrency)
+                if processed:
+                    self.stdout.write(f'Processed {processed} emails')
+                self._wait(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Email worker stopped')
+
+    def _wait(self, timeout):
+        """Sleep until an email is queued (PostgreSQL NOTIFY) or ``timeout`` passes"""
+        if connection.vendor != 'postgresql':
+            time.sleep(timeout)
+            return
+
+        # LISTEN is idempotent; repeating it survives a reconnect
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        raw = connection.connection
+        if select.select([raw], [], [], timeout)[0]:
+            raw.poll()
+            raw.notifies.clear()
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
@@ -73,3 +74,39 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     def __str__(self):
         return self.email
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in the outbox, written in the same transaction as the
+    change that triggered it and delivered by ``manage.py run_email_worker``.
+    See users/outbox.py.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    kind = models.CharField(max_length=50, blank=True, help_text="What the email is for, e.g. order_confirmation")
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    text_content = models.TextField()
+    html_content = models.TextField(blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the email is next due; while sending, when its lease runs out"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.kind or 'email'} to {self.to_email} ({self.status})"
@@ -0,0 +1,148 @@
+"""
+Transactional email outbox.
+
+Request handlers never call the email provider. enqueue_email() adds an
+OutboundEmail row in the caller's transaction, so an email exists exactly
+when the order or OTP it is about was committed, and the request returns
+without waiting on any HTTP call. Once the transaction commits the worker
+is woken up (NOTIFY on PostgreSQL; elsewhere it polls).
+
+``manage.py run_email_worker`` delivers the outbox:
+
+- it claims up to EMAIL_WORKER_BATCH_SIZE due emails at a time and leases
+  them, skipping rows another worker has locked where the database can;
+- emails in a batch that share their content go out in one API call (see
+  users/email_api.py); the rest are sent over at most
+  EMAIL_WORKER_CONCURRENCY threads;
+- failures are retried with exponential backoff, and an email that has
+  failed EMAIL_MAX_ATTEMPTS times is marked dead and kept for inspection.
+
+An email whose worker died mid-send is due again once its lease runs out.
+"""
+import logging
+import random
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel the worker LISTENs on
+CHANNEL = 'email_outbox'
+
+
+def _notify():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {CHANNEL}")
+
+
+def enqueue_email(to_email, subject, text_content, html_content='', kind=''):
+    """Add an email to the outbox as part of the current transaction"""
+    email = OutboundEmail.objects.create(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        text_content=text_content,
+        html_content=html_content or ''
+    )
+    transaction.on_commit(_notify)
+    return email
+
+
+def claim_batch(limit):
+    """Lease up to ``limit`` due emails to this worker, oldest first"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status__in=('pending', 'sending'),
+            next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status='sending',
+            next_attempt_at=now + timedelta(seconds=settings.EMAIL_WORKER_LEASE)
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def deliver(emails):
+    """Send emails through the provider in as few calls as possible; returns (success, message) each"""
+    from .email_api import send_emails_via_brevo_api
+
+    try:
+        return send_emails_via_brevo_api([
+            (email.to_email, email.subject, email.text_content, email.html_content)
+            for email in emails
+        ])
+    except Exception as e:
+        return [(False, str(e))] * len(emails)
+
+
+def retry_delay(attempts):
+    """Backoff before the next try after ``attempts`` failures, with 10% jitter"""
+    delay = min(settings.EMAIL_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.EMAIL_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(1, 1.1))
+
+
+def _record(email, success, message, now):
+    email.attempts += 1
+    if success:
+        email.status = 'sent'
+        email.sent_at = now
+        email.last_error = ''
+    elif email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = 'dead'
+        email.last_error = message
+        logger.error(f"Giving up on email #{email.id} to {email.to_email} after {email.attempts} attempts: {message}")
+    else:
+        email.status = 'pending'
+        email.last_error = message
+        email.next_attempt_at = now + retry_delay(email.attempts)
+        logger.warning(f"Email #{email.id} to {email.to_email} failed, retrying: {message}")
+
+
+def process_batch(batch_size=None, concurrency=None):
+    """Claim and send one batch; returns how many emails were attempted"""
+    emails = claim_batch(batch_size or settings.EMAIL_WORKER_BATCH_SIZE)
+    if not emails:
+        return 0
+
+    # Emails with the same content share one API call; the groups are spread over the threads
+    groups = defaultdict(list)
+    for email in emails:
+        groups[(email.text_content, email.html_content)].append(email)
+    chunks = list(groups.values())
+
+    workers = min(concurrency or settings.EMAIL_WORKER_CONCURRENCY, len(chunks))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(deliver, chunks))
+
+    now = timezone.now()
+    for chunk, outcomes in zip(chunks, results):
+        for email, (success, message) in zip(chunk, outcomes):
+            _record(email, success, message, now)
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return len(emails)
+
+
+def drain(batch_size=None, concurrency=None):
+    """Send batches until nothing is due; returns how many emails were attempted"""
+    total = 0
+    while True:
+        processed = process_batch(batch_size, concurrency)
+        if not processed:
+            return total
+        total += processed
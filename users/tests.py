@@ -1,3 +1,152 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import email_api, outbox
+from .brevo_stub import BrevoStubServer
+from .models import OutboundEmail, User
+
+
+@mock.patch('users.email_api.send_email_via_brevo_api', return_value=(True, 'ok'))
+class RegisterOutboxTests(TestCase):
+    """Registering and OTP requests queue email instead of calling Brevo"""
+
+    def register(self):
+        return APIClient().post('/api/users/register/', {
+            'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+            'phone_number': '9000000030', 'password': 'longpass1', 'confirm_password': 'longpass1'
+        }, format='json')
+
+    def test_register_queues_otp_email(self, send):
+        response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('email_otp', response.data)
+        send.assert_not_called()
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.kind, email.to_email, email.status), ('otp_verification', 'new@example.com', 'pending'))
+        self.assertIn(User.objects.get().email_otp, email.text_content)
+
+    def test_password_reset_queues_otp_email(self, send):
+        User.objects.create_user(email='reset@example.com', phone_number='9000000031', password='pass')
+        response = APIClient().post(
+            '/api/users/password-reset/request/', {'email_or_phone': 'reset@example.com'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        send.assert_not_called()
+        self.assertEqual(OutboundEmail.objects.get().kind, 'otp_password_reset')
+
+
+def _outcomes(outcome):
+    return lambda messages: [outcome] * len(messages)
+
+
+@override_settings(EMAIL_MAX_ATTEMPTS=3, EMAIL_RETRY_BASE_DELAY=30, EMAIL_RETRY_MAX_DELAY=60)
+@mock.patch('users.email_api.send_emails_via_brevo_api')
+class EmailWorkerTests(TestCase):
+    """The worker sends due emails in batches, backs off on failure and dead-letters"""
+
+    def queue(self, count=1):
+        return [
+            outbox.enqueue_email(f'user{n}@example.com', 'Hello', 'Body', kind='test')
+            for n in range(count)
+        ]
+
+    def test_batch_is_sent(self, send):
+        send.side_effect = _outcomes((True, 'ok'))
+        self.queue(5)
+        outbox.enqueue_email('other@example.com', 'Hi', 'Another body')
+        self.assertEqual(outbox.process_batch(batch_size=3, concurrency=2), 3)
+        self.assertEqual(outbox.drain(), 3)
+        # Same content goes out together, whatever the recipient
+        self.assertEqual(sorted(len(call.args[0]) for call in send.call_args_list), [1, 2, 3])
+        self.assertEqual(OutboundEmail.objects.filter(status='sent', attempts=1).count(), 6)
+
+    def test_failure_backs_off_then_dead_letters(self, send):
+        send.side_effect = _outcomes((False, 'Brevo API error'))
+        email, = self.queue()
+
+        outbox.process_batch()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'Brevo API error'))
+        self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=29))
+        # Not due yet
+        self.assertEqual(outbox.process_batch(), 0)
+
+        for _ in range(2):
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            outbox.process_batch()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('dead', 3))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), 0)
+
+    def test_exceptions_count_as_failures(self, send):
+        send.side_effect = ConnectionError('timed out')
+        self.queue()
+        outbox.process_batch()
+        self.assertEqual(OutboundEmail.objects.get().last_error, 'timed out')
+
+    def test_expired_lease_is_reclaimed(self, send):
+        send.side_effect = _outcomes((True, 'ok'))
+        self.queue()
+        # Claimed by a worker that then died
+        outbox.claim_batch(10)
+        self.assertEqual(outbox.process_batch(), 0)
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), 1)
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    def test_run_once_command(self, send):
+        send.side_effect = _outcomes((True, 'ok'))
+        self.queue(2)
+        call_command('run_email_worker', '--once', stdout=mock.Mock())
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+
+class BrevoClientTests(TestCase):
+    """The shared Brevo client reuses its connection and batches shared content"""
+
+    def setUp(self):
+        self.stub = BrevoStubServer()
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__, None, None, None)
+        settings = override_settings(BREVO_API_URL=self.stub.url, BREVO_API_KEY='test-key')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        email_api.reset_brevo_client()
+        self.addCleanup(email_api.reset_brevo_client)
+
+    def test_connection_is_reused(self):
+        for n in range(5):
+            success, _ = email_api.send_email_via_brevo_api(f'user{n}@example.com', 'Hi', 'Body')
+            self.assertTrue(success)
+        self.assertEqual(len(self.stub.requests), 5)
+        self.assertEqual(self.stub.connections, 1)
+        self.assertEqual(self.stub.requests[0]['to'], [{'email': 'user0@example.com'}])
+
+    def test_shared_content_is_one_call(self):
+        messages = [(f'user{n}@example.com', f'Order #{n}', 'Thanks!', None) for n in range(3)]
+        messages.append(('solo@example.com', 'OTP', 'Your OTP is 123456', None))
+
+        results = email_api.send_emails_via_brevo_api(messages)
+        self.assertTrue(all(success for success, _ in results))
+        self.assertEqual(len(self.stub.requests), 2)
+        batch = self.stub.requests[0]
+        self.assertEqual(
+            [(version['to'][0]['email'], version['subject']) for version in batch['messageVersions']],
+            [(f'user{n}@example.com', f'Order #{n}') for n in range(3)]
+        )
+
+    @override_settings(BREVO_API_KEY='')
+    def test_api_errors_are_reported(self):
+        email_api.reset_brevo_client()
+        results = email_api.send_emails_via_brevo_api([
+            ('a@example.com', 'Hi', 'Body', None), ('b@example.com', 'Hi', 'Body', None)
+        ])
+        self.assertEqual([success for success, _ in results], [False, False])
+        self.assertIn('Brevo API error', results[0][1])
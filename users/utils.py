@@ -63,12 +63,13 @@ def generate_password_reset_otp(user):
     ])
     
     try:
-        send_otp_email(user.email, otp, purpose="password_reset")
+        email_sent = send_otp_email_api(user.email, otp, purpose="password_reset")
     except Exception as e:
         # Log the error but don't fail the password reset process
         print(f"Failed to send password reset email: {e}")
+        email_sent = False
     
-    return otp
+    return otp, email_sent
 
 
 
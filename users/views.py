@@ -3,12 +3,14 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.views import LoginView, LogoutView
+from django.db import transaction
 from django.shortcuts import redirect
 from django.views import View
 from .utils import generate_email_otp, generate_phone_otp, generate_password_reset_otp
 from rest_framework_simplejwt.tokens import RefreshToken
 from .views_verify import is_otp_expired
 
+from .models import User
 from .serializers import RegisterSerializer, UserSerializer
 
 from rest_framework.permissions import IsAuthenticated
@@ -28,6 +30,7 @@ class ProfileAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class RegisterAPIView(APIView):
+    @transaction.atomic
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():